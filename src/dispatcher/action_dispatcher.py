@@ -1,13 +1,27 @@
 from PyQt6 import QtCore
 
+import collections
 import logging
 import queue
 import datetime
 import enum
+import math
+import threading
+import time
+import typing
 
 from dispatcher import base_action, thread_action
+from dispatcher import action_tracer
+from dispatcher import action_future
+from dispatcher import timer_queue
+from dispatcher import resource_admission
+from dispatcher import dependency_graph
+from dispatcher import demand_release
+from dispatcher import pipeline
 from dispatcher import worker_signal
 from dispatcher import action_worker
+from dispatcher import action_watchdog
+from dispatcher import update_coalescer
 from dispatcher import dispatcher_consts
 
 
@@ -23,6 +37,9 @@ class ActionDispatcher(QtCore.QObject):
     signal_immediate_queue_contents_changed = QtCore.pyqtSignal()
     signal_demand_queue_contents_changed = QtCore.pyqtSignal()
     signal_series_queue_contents_changed = QtCore.pyqtSignal()
+    signal_timer_queue_contents_changed = QtCore.pyqtSignal()
+    signal_lane_status_changed = QtCore.pyqtSignal()
+    signal_resource_usage_changed = QtCore.pyqtSignal(str, float, float)
 
     signal_thread_status_changed = QtCore.pyqtSignal(int)
     signal_thread_action_changed = QtCore.pyqtSignal(int)
@@ -32,6 +49,15 @@ class ActionDispatcher(QtCore.QObject):
     signal_all_threads_shutdown = QtCore.pyqtSignal()
 
     signal_dispatcher_created_action = QtCore.pyqtSignal(base_action.BaseAction)
+    # one notification per dispatch() expansion: the parent and all of its new children. the children are also
+    # announced one by one on signal_dispatcher_created_action
+    signal_dispatcher_created_actions = QtCore.pyqtSignal(base_action.BaseAction, list)
+    signal_action_finalized = QtCore.pyqtSignal(base_action.BaseAction)
+    # coalesced display updates: every action whose state changed since the last flush, once each
+    signal_actions_changed = QtCore.pyqtSignal(list)
+
+    # carries calls made from other threads onto the coordinator thread
+    _signal_call = QtCore.pyqtSignal(object)
 
     class DispatcherStatus(enum.IntEnum):
 
@@ -44,15 +70,47 @@ class ActionDispatcher(QtCore.QObject):
         SHUTDOWN = 5
 
     def __init__(self, *args, **kwargs):
-        parent = kwargs.get('parent', None)
+        use_coordinator: bool = kwargs.get('coordinator_thread', False)
+        # an object with a parent cannot be moved to another thread
+        parent = None if use_coordinator else kwargs.get('parent', None)
         super().__init__(parent=parent)
         self.dispatcher_status: ActionDispatcher.DispatcherStatus = ActionDispatcher.DispatcherStatus.UNINT
         self.num_parallel_threads = kwargs.get('num_parallel_threads', dispatcher_consts.NUM_PARALLEL_THREADS)
+        # drop each child's payload once its parent has run process_children
+        self.release_payloads: bool = kwargs.get('release_payloads', False)
+        # batchable actions each worker takes from its queue at once; 1 keeps one action per queue operation
+        self.worker_batch_size: int = kwargs.get('worker_batch_size', dispatcher_consts.WORKER_BATCH_SIZE)
+        # records a timeline of queueing, work and waits for export as a chrome trace; off unless one is given
+        self.tracer: action_tracer.ActionTracer = kwargs.get('tracer', None)
 
         # define queues
         self.immediate_queue = queue.PriorityQueue()
-        self.demand_queue = queue.Queue()
+        # (priority, action) like the worker queues; released by start_demand_queue within the limits below
+        self.demand_queue = queue.PriorityQueue()
         self.series_queue = queue.PriorityQueue()
+        self.timer_queue = timer_queue.TimerQueue()
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.on_timer_queue_due)
+
+        # serialization lanes: the action currently holding each key and the actions waiting behind it
+        self.lane_owner_dict: dict[typing.Hashable, base_action.BaseAction] = {}
+        self.lane_waiting_dict: dict[typing.Hashable, collections.deque[base_action.BaseAction]] = {}
+
+        # how fast the demand queue is released: at most max_in_flight unfinished, at most rate per second
+        self.demand = demand_release.DemandRelease(max_in_flight=kwargs.get('demand_max_in_flight', None),
+                                                   rate=kwargs.get('demand_rate', 0.0),
+                                                   burst=kwargs.get('demand_burst', None))
+        self._demand_wakeup: timer_queue.TimerEntry = None
+        self._releasing_demand: bool = False
+
+        # resources such as memory or connections; actions declaring costs are only queued when capacity allows
+        self.admission = resource_admission.ResourceAdmission(kwargs.get('resource_capacity', None))
+        if dispatcher_consts.RESOURCE_PIPELINE_THREADS not in self.admission.capacity:
+            self.admission.set_capacity(dispatcher_consts.RESOURCE_PIPELINE_THREADS, self.num_parallel_threads)
+
+        # explicit prerequisites between actions beyond parent/child and follow_up_action
+        self.dependencies = dependency_graph.DependencyGraph()
 
         # define the threads for workers
         self.parallel_thread_pool = QtCore.QThreadPool()
@@ -63,17 +121,106 @@ class ActionDispatcher(QtCore.QObject):
         # initialize the status dictionary of the worker threads
         self.thread_status_dict: dict[int, dispatcher_consts.ThreadStatus] = {}
         self.thread_action_dict: dict[int, base_action.BaseAction] = {}
-        for i in range(self.parallel_thread_pool.maxThreadCount() + self.series_thread.maxThreadCount()):
+        for i in range(self.num_parallel_threads + 1):
             self.thread_status_dict[i] = dispatcher_consts.ThreadStatus.UNINIT
             self.thread_action_dict[i] = None
 
+        # keep references to the running workers so the watchdog can inspect them and hung ones can be replaced
+        self.workers: dict[int, action_worker.ActionWorker] = {}
+        self._quarantined_workers: list[action_worker.ActionWorker] = []
+        self.watchdog = action_watchdog.ActionWatchdog(self.workers, parent=self)
+        self.watchdog.signal_action_overdue.connect(self.on_action_overdue)
+
+        # display signals and action changes are batched and forwarded once per interval instead of per event.
+        # the coalescer stays on the constructing (GUI) thread and has no parent, so it does not follow the
+        # dispatcher onto the coordinator
+        self.coalescer: update_coalescer.UpdateCoalescer = None
+        if use_coordinator or kwargs.get('coalesce_updates', False):
+            self.coalescer = update_coalescer.UpdateCoalescer(
+                self.signal_actions_changed,
+                interval_ms=kwargs.get('gui_update_interval', dispatcher_consts.GUI_UPDATE_INTERVAL_MS))
+            self.coalescer.start()
+
+        # scheduling state and action-tree bookkeeping live on this thread when enabled; public methods called
+        # from any other thread are forwarded to it
+        self.coordinator: QtCore.QThread = None
+        self._signal_call.connect(self._on_call)
+        if use_coordinator:
+            self._start_coordinator()
+
         self.dispatcher_status = ActionDispatcher.DispatcherStatus.IDLE
 
+    def _start_coordinator(self):
+        self.coordinator = QtCore.QThread()
+        self.coordinator.setObjectName('dispatcher-coordinator')
+        self.coordinator.start()
+        self.moveToThread(self.coordinator)
+
+    def stop_coordinator(self):
+        # hands the dispatcher back to the calling thread and ends the coordinator; call before the app exits
+        if self.coordinator is None:
+            return
+        if self.dispatcher_status == ActionDispatcher.DispatcherStatus.READY:
+            self.stop_dispatcher()
+        caller = QtCore.QThread.currentThread()
+        self._call_on_coordinator(lambda: self.moveToThread(caller), wait=True)
+        self.coordinator.quit()
+        self.coordinator.wait()
+        self.coordinator = None
+
+    def _off_coordinator(self) -> bool:
+        return self.coordinator is not None and QtCore.QThread.currentThread() is not self.coordinator
+
+    def _call_on_coordinator(self, call: typing.Callable[[], typing.Any], wait: bool = False) -> typing.Any:
+        if not wait:
+            self._signal_call.emit(call)
+            return None
+        done = threading.Event()
+        outcome: dict[str, typing.Any] = {}
+
+        def run():
+            try:
+                outcome['result'] = call()
+            except Exception as err:
+                outcome['error'] = err
+            finally:
+                done.set()
+
+        self._signal_call.emit(run)
+        done.wait()
+        if 'error' in outcome:
+            raise outcome['error']
+        return outcome.get('result', None)
+
+    @QtCore.pyqtSlot(object)
+    def _on_call(self, call: typing.Callable[[], typing.Any]):
+        try:
+            call()
+        except Exception as err:
+            self.logger.exception(err)
+
+    def _emit(self, signal: QtCore.pyqtBoundSignal, *args):
+        # with a coordinator the coalescer re-emits the signal on the GUI thread, so GUI receivers run directly
+        if self.coordinator is None:
+            signal.emit(*args)
+        else:
+            self.coalescer.forward(signal, *args)
+
+    def _notify(self, signal: QtCore.pyqtBoundSignal, *args):
+        # display-only signals; coalesced when enabled
+        if self.coalescer is None:
+            signal.emit(*args)
+        else:
+            self.coalescer.defer(signal, *args)
+
     def get_num_parallel_threads(self):
-        return self.parallel_thread_pool.maxThreadCount()
+        return self.num_parallel_threads
 
     @QtCore.pyqtSlot()
     def start_dispatcher(self):
+        if self._off_coordinator():
+            self._call_on_coordinator(self.start_dispatcher, wait=True)
+            return
         if self.dispatcher_status != ActionDispatcher.DispatcherStatus.IDLE and \
                 self.dispatcher_status != ActionDispatcher.DispatcherStatus.SHUTDOWN:
             self.logger.warning('Attempt was made to start dispatcher while in an invalid state.')
@@ -81,15 +228,20 @@ class ActionDispatcher(QtCore.QObject):
         self.dispatcher_status = ActionDispatcher.DispatcherStatus.STARTING
 
         self.launch_threads()
+        self.watchdog.start()
         self.dispatcher_status = ActionDispatcher.DispatcherStatus.READY
-        self.signal_dispatcher_ready.emit()
+        self._emit(self.signal_dispatcher_ready)
 
     @QtCore.pyqtSlot()
     def stop_dispatcher(self):
+        if self._off_coordinator():
+            self._call_on_coordinator(self.stop_dispatcher, wait=True)
+            return
         if self.dispatcher_status != ActionDispatcher.DispatcherStatus.READY:
             self.logger.warning('Attempted to shutdown dispatcher in an invalid state.')
             return
         self.dispatcher_status = ActionDispatcher.DispatcherStatus.STOPPING
+        self.watchdog.stop()
         self.kill_threads()
 
         # clear the queues
@@ -105,15 +257,21 @@ class ActionDispatcher(QtCore.QObject):
             except queue.Empty:
                 continue
             self.demand_queue.task_done()
+        self.demand.reset()
+        self._demand_wakeup = None
         while not self.series_queue.empty():
             try:
                 self.series_queue.get(block=False)
             except queue.Empty:
                 continue
             self.series_queue.task_done()
+        self._timer.stop()
+        self.timer_queue.clear()
+        self.dependencies.clear()
+        self._notify(self.signal_timer_queue_contents_changed)
 
         self.dispatcher_status = ActionDispatcher.DispatcherStatus.SHUTDOWN
-        self.signal_dispatcher_shutdown.emit()
+        self._emit(self.signal_dispatcher_shutdown)
 
     def launch_threads(self):
         # verify that threads are in a state that supports resuming
@@ -124,25 +282,39 @@ class ActionDispatcher(QtCore.QObject):
             self.logger.warning('Attempted to launch threads which are not shutdown')
             return
 
-        for i in range(self.parallel_thread_pool.maxThreadCount() + self.series_thread.maxThreadCount()):
-            self.thread_status_dict[i] = dispatcher_consts.ThreadStatus.STARTING
-            signal = worker_signal.WorkerSignals()
-            signal.worker_started.connect(self.on_worker_started)
-            signal.worker_shutdown.connect(self.on_worker_shutdown)
-            signal.worker_paused.connect(self.on_worker_paused)
-            signal.worker_resumed.connect(self.on_worker_resumed)
-            signal.worker_starting_action.connect(self.on_worker_starting_action)
-            signal.worker_done_with_action.connect(self.on_worker_done_with_action)
-
-            self.logger.debug(f'Launching worker thread {i}')
-            if i < self.parallel_thread_pool.maxThreadCount():
-                self.parallel_thread_pool.start(action_worker.ActionWorker(action_queue=self.immediate_queue,
-                                                                  signal=signal,
-                                                                  worker_id=i))
-            else:
-                self.series_thread.start(action_worker.ActionWorker(action_queue=self.series_queue,
-                                                                  signal=signal,
-                                                                  worker_id=i))
+        for i in range(self.num_parallel_threads + 1):
+            self._start_worker(i)
+
+    def _start_worker(self, worker_id: int):
+        self.thread_status_dict[worker_id] = dispatcher_consts.ThreadStatus.STARTING
+        signal = worker_signal.WorkerSignals()
+        signal.worker_started.connect(self.on_worker_started)
+        signal.worker_shutdown.connect(self.on_worker_shutdown)
+        signal.worker_retired.connect(self.on_worker_retired)
+        signal.worker_paused.connect(self.on_worker_paused)
+        signal.worker_resumed.connect(self.on_worker_resumed)
+        signal.worker_starting_action.connect(self.on_worker_starting_action)
+        signal.worker_done_with_action.connect(self.on_worker_done_with_action)
+        signal.worker_deferred_action.connect(self.on_worker_deferred_action)
+        signal.worker_discarded_action.connect(self.on_worker_discarded_action)
+        signal.worker_starting_batch.connect(self.on_worker_starting_batch)
+        signal.worker_done_with_batch.connect(self.on_worker_done_with_batch)
+        if self.tracer is not None:
+            self.tracer.watch_worker(worker_id, signal,
+                                     'series' if worker_id == self.num_parallel_threads else f'worker {worker_id}')
+
+        self.logger.debug(f'Launching worker thread {worker_id}')
+        if worker_id < self.num_parallel_threads:
+            worker = action_worker.ActionWorker(action_queue=self.immediate_queue, signal=signal,
+                                                worker_id=worker_id, batch_size=self.worker_batch_size)
+            pool = self.parallel_thread_pool
+        else:
+            worker = action_worker.ActionWorker(action_queue=self.series_queue, signal=signal,
+                                                worker_id=worker_id, batch_size=self.worker_batch_size)
+            pool = self.series_thread
+        worker.setAutoDelete(False)
+        self.workers[worker_id] = worker
+        pool.start(worker)
 
     def kill_threads(self):
         # verify that threads are in a state that supports resuming
@@ -155,23 +327,33 @@ class ActionDispatcher(QtCore.QObject):
             return
 
         thread_shutdown = thread_action.ThreadShutdownAction()
-        self.signal_dispatcher_created_action.emit(thread_shutdown)
+        self._emit(self.signal_dispatcher_created_action, thread_shutdown)
         self.series_queue.put((dispatcher_consts.QUEUE_SHUTDOWN_PRIORITY, thread_shutdown))
-        self.signal_series_queue_contents_changed.emit()
+        self._notify(self.signal_series_queue_contents_changed)
         self.logger.debug(f'Killing series action thread')
-        self.series_thread.waitForDone()
-        for i in range(self.parallel_thread_pool.maxThreadCount()):
+        self._wait_for_pool(self.series_thread)
+        for i in range(self.num_parallel_threads):
             thread_shutdown = thread_action.ThreadShutdownAction()
-            self.signal_dispatcher_created_action.emit(thread_shutdown)
+            self._emit(self.signal_dispatcher_created_action, thread_shutdown)
             self.immediate_queue.put((dispatcher_consts.QUEUE_SHUTDOWN_PRIORITY, thread_shutdown))
-            self.signal_immediate_queue_contents_changed.emit()
+            self._notify(self.signal_immediate_queue_contents_changed)
             self.logger.debug(f'Killing worker thread {i}')
-        self.parallel_thread_pool.waitForDone()
+        self._wait_for_pool(self.parallel_thread_pool)
         self.logger.debug('All worker threads have completed.')
 
+    def _wait_for_pool(self, pool: QtCore.QThreadPool):
+        if not self._quarantined_workers:
+            pool.waitForDone()
+        elif not pool.waitForDone(dispatcher_consts.WATCHDOG_SHUTDOWN_WAIT_MS):
+            # hung workers never return; do not block shutdown on them
+            self.logger.warning('Gave up waiting on quarantined worker threads.')
+
 
     @QtCore.pyqtSlot()
     def suspend_threads(self):
+        if self._off_coordinator():
+            self._call_on_coordinator(self.suspend_threads)
+            return
         # verify that threads are in a state that supports suspension
         ready = True
         for val in self.thread_status_dict.values():
@@ -180,18 +362,21 @@ class ActionDispatcher(QtCore.QObject):
             self.logger.warning('Attempted to suspend threads which are not running')
             return
 
-        for i in range(self.parallel_thread_pool.maxThreadCount() + self.series_thread.maxThreadCount()):
+        for i in range(self.num_parallel_threads + 1):
             action = thread_action.ThreadPauseAction()
-            self.signal_dispatcher_created_action.emit(action)
-            if i < self.parallel_thread_pool.maxThreadCount():
+            self._emit(self.signal_dispatcher_created_action, action)
+            if i < self.num_parallel_threads:
                 self.immediate_queue.put((dispatcher_consts.WORKER_PAUSE_PRIORITY, action))
-                self.signal_immediate_queue_contents_changed.emit()
+                self._notify(self.signal_immediate_queue_contents_changed)
             else:
                 self.series_queue.put((dispatcher_consts.WORKER_PAUSE_PRIORITY, action))
-                self.signal_series_queue_contents_changed.emit()
+                self._notify(self.signal_series_queue_contents_changed)
 
     @QtCore.pyqtSlot()
     def resume_threads(self):
+        if self._off_coordinator():
+            self._call_on_coordinator(self.resume_threads)
+            return
         # verify that threads are in a state that supports resuming
         ready = True
         for val in self.thread_status_dict.values():
@@ -200,53 +385,410 @@ class ActionDispatcher(QtCore.QObject):
             self.logger.warning('Attempted to resume threads which are not suspended')
             return
 
-        for i in range(self.parallel_thread_pool.maxThreadCount() + self.series_thread.maxThreadCount()):
+        for i in range(self.num_parallel_threads + 1):
             action = thread_action.ThreadResumeAction()
-            self.signal_dispatcher_created_action.emit(action)
-            if i < self.parallel_thread_pool.maxThreadCount():
+            self._emit(self.signal_dispatcher_created_action, action)
+            if i < self.num_parallel_threads:
                 self.immediate_queue.put((dispatcher_consts.WORKER_RESUME_PRIORITY, action))
-                self.signal_immediate_queue_contents_changed.emit()
+                self._notify(self.signal_immediate_queue_contents_changed)
             else:
                 self.series_queue.put((dispatcher_consts.WORKER_RESUME_PRIORITY, action))
-                self.signal_series_queue_contents_changed.emit()
+                self._notify(self.signal_series_queue_contents_changed)
 
     @QtCore.pyqtSlot(base_action.BaseAction)
-    def add_action_to_demand_queue(self, action: base_action.BaseAction):
+    def add_action_to_demand_queue(self, action: base_action.BaseAction,
+                                   priority: int = dispatcher_consts.STD_ACTION_PRIORITY):
+        if self._off_coordinator():
+            self._call_on_coordinator(lambda: self.add_action_to_demand_queue(action, priority))
+            return
         if action:
-            self.demand_queue.put(action)
-            self.signal_demand_queue_contents_changed.emit()
+            # lower values go first; equal priorities keep the order the actions were created in
+            self.demand_queue.put((priority, action))
+            self._notify(self.signal_demand_queue_contents_changed)
 
     @QtCore.pyqtSlot()
     def start_demand_queue(self):
-        for _ in range(self.demand_queue.qsize()):
-            action: base_action.BaseAction = self.demand_queue.get()
-            self.dispatch_action(action)
-            self.demand_queue.task_done()
-            self.signal_demand_queue_contents_changed.emit()
+        if self._off_coordinator():
+            self._call_on_coordinator(self.start_demand_queue)
+            return
+        self.demand.remaining = self.demand_queue.qsize()
+        self.demand.paused = False
+        self._release_demand()
+
+    @QtCore.pyqtSlot()
+    def pause_demand_queue(self):
+        if self._off_coordinator():
+            self._call_on_coordinator(self.pause_demand_queue)
+            return
+        # released actions keep running; nothing more leaves the queue until it is resumed
+        self.demand.paused = True
+        if self._demand_wakeup is not None:
+            self._demand_wakeup.cancelled = True
+            self._demand_wakeup = None
+            self._arm_timer()
+
+    @QtCore.pyqtSlot()
+    def resume_demand_queue(self):
+        if self._off_coordinator():
+            self._call_on_coordinator(self.resume_demand_queue)
+            return
+        self.demand.paused = False
+        self._release_demand()
+
+    def set_demand_release(self, **kwargs):
+        # max_in_flight, rate and burst, as given to the dispatcher with the demand_ prefix
+        if self._off_coordinator():
+            self._call_on_coordinator(lambda: self.set_demand_release(**kwargs))
+            return
+        self.demand.configure(**kwargs)
+        self._release_demand()
+
+    def _release_demand(self):
+        # dispatching can finalize actions and land back here; the outer pass picks up the room they free
+        if self._releasing_demand:
+            return
+        self._releasing_demand = True
+        released = 0
+        try:
+            while self.demand.has_room() and not self.demand_queue.empty():
+                if released >= self.demand.chunk_size:
+                    # let the event loop run before the next chunk
+                    self._wake_demand(0.0)
+                    break
+                delay = self.demand.delay()
+                if delay > 0:
+                    self._wake_demand(delay)
+                    break
+                _, action = self.demand_queue.get()
+                self.demand_queue.task_done()
+                self.demand.remaining -= 1
+                released += 1
+                if action.finalized or action.cancelled:
+                    # cancelled while it waited
+                    continue
+                self.demand.released(action)
+                self.dispatch_action(action)
+        finally:
+            self._releasing_demand = False
+        if released:
+            self._notify(self.signal_demand_queue_contents_changed)
+
+    def _wake_demand(self, delay: float):
+        if self._demand_wakeup is not None:
+            return
+        self._demand_wakeup = self._schedule(delay, self._on_demand_wakeup)
+
+    def _on_demand_wakeup(self):
+        self._demand_wakeup = None
+        self._release_demand()
+
+    def add_dependency(self, dependent: base_action.BaseAction, prerequisite: base_action.BaseAction,
+                       policy: dependency_graph.DependencyPolicy = dependency_graph.DependencyPolicy.REQUIRE_SUCCESS):
+        if self._off_coordinator():
+            self._call_on_coordinator(lambda: self.add_dependency(dependent, prerequisite, policy), wait=True)
+            return
+        if dependent.finalized:
+            return
+        if dependent.dispatched:
+            # queued or running already; a prerequisite added now could not hold it back
+            raise ValueError(f'Action {dependent.id} has already been dispatched; add its dependencies before '
+                             f'dispatching it.')
+        if prerequisite.finalized:
+            if not dependency_graph.DependencyGraph.satisfies(prerequisite.action_status, policy):
+                self._fail_dependent(dependent, dependency_graph.DependencyGraph.failure_status(policy))
+            return
+        self.dependencies.add_dependency(prerequisite, dependent, policy)
+
+    def add_dependencies(self, dependent: base_action.BaseAction, prerequisites: typing.Iterable[base_action.BaseAction],
+                         policy: dependency_graph.DependencyPolicy = dependency_graph.DependencyPolicy.REQUIRE_SUCCESS):
+        for prerequisite in prerequisites:
+            self.add_dependency(dependent, prerequisite, policy)
+
+    def _fail_dependent(self, action: base_action.BaseAction, status: dispatcher_consts.ActionStatus):
+        if action.finalized:
+            return
+        action.cancel_token.cancel()
+        if status == dispatcher_consts.ActionStatus.FAILED:
+            action.error_flags = action.error_flags | base_action.BaseAction.ErrorFlags.DEPENDENCY_FAILED
+        action.action_status = status
+        action.datetime_end = datetime.datetime.now()
+        action.tick('Prerequisite failed!' if status == dispatcher_consts.ActionStatus.FAILED else 'Skipped',
+                    msg_only=True)
+        action.signal_action_finished.emit()
+        self._on_action_finalized(action)
+        if action.parent_action:
+            action.parent_action.tick()
+            self._update_parents(action)
+
+    def _on_action_finalized(self, action: base_action.BaseAction):
+        if action.finalized:
+            return
+        action.finalized = True
+        # a parent admitted as a whole, i.e. a pipeline, gives its threads back once its last stage is done
+        self._release_resources(action)
+        if self.tracer is not None:
+            self.tracer.finalized(action)
+        # a released demand action finishing makes room for the next one
+        refill = self.demand.finished(action)
+        if action.future is not None:
+            action.future._resolve()
+        if action.parent_action is not None:
+            self._fold_into_parent(action.parent_action, action)
+        self.dependencies.discard(action)
+        ready, failed = self.dependencies.on_finished(action)
+        for dependent, status in failed:
+            self._fail_dependent(dependent, status)
+        for dependent in ready:
+            if self.dependencies.unpark(dependent):
+                self.dispatch_action(dependent)
+        self._emit(self.signal_action_finalized, action)
+        if refill:
+            self._release_demand()
+
+    def _fold_into_parent(self, parent: base_action.BaseAction, child: base_action.BaseAction):
+        parent.children_finalized += 1
+        child_status = child.action_status
+        if child_status == dispatcher_consts.ActionStatus.CANCELLED:
+            # a cancelled child leaves the parent with incomplete results
+            child_status = dispatcher_consts.ActionStatus.ERROR
+        if child_status > parent.children_status:
+            parent.children_status = child_status
+        if not parent.incremental_reduce or parent.finalized:
+            return
+        try:
+            parent.reduce_child(child)
+        except Exception as err:
+            self.logger.exception(f'{parent.description} could not reduce child {child.id}: {err}')
+            parent.error_flags = parent.error_flags | base_action.BaseAction.ErrorFlags.UNSPECIFIED
+            if parent.children_status < dispatcher_consts.ActionStatus.ERROR:
+                parent.children_status = dispatcher_consts.ActionStatus.ERROR
+        # the child's future has resolved and its callbacks have run; nothing else needs the payload
+        child.release_payload()
+
+    def future_of(self, action: base_action.BaseAction) -> action_future.ActionFuture:
+        if action.future is None:
+            action.future = action_future.ActionFuture(action)
+            if action.finalized:
+                action.future._resolve()
+        return action.future
 
     @QtCore.pyqtSlot(base_action.BaseAction)
-    def dispatch_action(self, action: base_action.BaseAction):
+    def dispatch_action(self, action: base_action.BaseAction) -> action_future.ActionFuture:
+        future = self.future_of(action)
+        if self._off_coordinator():
+            self._call_on_coordinator(lambda: self.dispatch_action(action))
+            return future
+        if action.cancelled:
+            return future
+        if self.coalescer is not None:
+            self.coalescer.watch(action)
+        if self.dependencies.is_blocked(action):
+            # runs as soon as its last prerequisite finishes
+            self.dependencies.park(action)
+            action.tick(f'Waiting on {self.dependencies.in_degree(action)} prerequisite(s)', msg_only=True)
+            return future
+        if isinstance(action, pipeline.PipelineAction) and self.admission.needs_admission(action):
+            # a pipeline is admitted as a whole, before it expands into its stage workers
+            admitted = self.admission.submit(action)
+            if action not in admitted:
+                action.tick('Waiting for threads held by other pipelines', msg_only=True)
+            self._queue_admitted(admitted)
+            return future
+        action.dispatched = True
         action.tick('Idle', msg_only=True)
+        started = self.tracer.now() if self.tracer is not None else 0
         child_actions: list[base_action.BaseAction] = action.dispatch()
+        if self.tracer is not None:
+            self.tracer.dispatched(action, child_actions, started)
         if child_actions:
             action.total_ticks = len(child_actions) + 1 # each child action plus the process children function
-            for child in child_actions:
-                self.signal_dispatcher_created_action.emit(child)
+            action.child_actions = list(child_actions)
+            action.children_finalized = 0
+            action.children_status = dispatcher_consts.ActionStatus.IN_PROGRESS
+            for child in action.child_actions:
+                child.parent_action = action
+            # both signals fire for every expansion; a listener connects to one of them, the batch for inserting
+            # a subtree at once, the per child signal for connections made before batches existed
+            self._emit(self.signal_dispatcher_created_actions, action, action.child_actions)
+            for child in action.child_actions:
+                self._emit(self.signal_dispatcher_created_action, child)
+            for child in action.child_actions:
                 self.dispatch_action(child)
         else:
-            if action.series_limited:
-                self.series_queue.put((dispatcher_consts.STD_ACTION_PRIORITY, action))
-                self.signal_series_queue_contents_changed.emit()
+            self._enqueue_action(action)
+        return future
+
+    def dispatch_pipeline(self, action: pipeline.PipelineAction) -> action_future.ActionFuture:
+        # every stage worker has to hold a thread at the same time; with fewer threads the upstream stages block
+        # on full buffers that no running worker drains. pipelines hold their threads through the admission, so
+        # running pipelines never need more threads than there are and cannot deadlock each other. other actions
+        # are not counted: a pipeline sharing the pool with long running work stalls until that work frees its
+        # threads, so give pipelines threads no other work is using where that matters
+        if action.num_workers > self.num_parallel_threads:
+            raise ValueError(f'Pipeline {action.name} needs {action.num_workers} threads, the dispatcher has '
+                             f'{self.num_parallel_threads}.')
+        return self.dispatch_action(action)
+
+    def dispatch_at(self, action: base_action.BaseAction, when: datetime.datetime) -> timer_queue.TimerEntry:
+        delay = (when - datetime.datetime.now()).total_seconds()
+        return self.dispatch_after(action, delay)
+
+    def dispatch_after(self, action: base_action.BaseAction, delay: float) -> timer_queue.TimerEntry:
+        if self._off_coordinator():
+            return self._call_on_coordinator(lambda: self.dispatch_after(action, delay), wait=True)
+        if self.coalescer is not None:
+            self.coalescer.watch(action)
+        action.tick(f'Scheduled in {max(delay, 0.0):.1f} sec', msg_only=True)
+        return self._schedule(delay, lambda: self.dispatch_action(action), action)
+
+    def schedule_recurring(self, action_factory: typing.Callable[[], base_action.BaseAction], interval: float,
+                           first_delay: float = None, count: int = None) -> timer_queue.RecurringSchedule:
+        if self._off_coordinator():
+            return self._call_on_coordinator(
+                lambda: self.schedule_recurring(action_factory, interval, first_delay, count), wait=True)
+        schedule = timer_queue.RecurringSchedule(action_factory, interval, count)
+        if first_delay is None:
+            first_delay = interval
+        schedule.next_due = time.monotonic() + first_delay
+        schedule.entry = self._schedule(first_delay, lambda: self._fire_recurring(schedule))
+        return schedule
+
+    def _fire_recurring(self, schedule: timer_queue.RecurringSchedule):
+        if schedule.finished:
+            return
+        action = schedule.action_factory()
+        schedule.runs += 1
+        if schedule.remaining is not None:
+            schedule.remaining -= 1
+        self._emit(self.signal_dispatcher_created_action, action)
+        self.dispatch_action(action)
+        if schedule.finished:
+            return
+        # fixed rate schedule; skip any runs that were missed while the event loop was busy
+        now = time.monotonic()
+        schedule.next_due += schedule.interval
+        if schedule.next_due < now:
+            missed = math.ceil((now - schedule.next_due) / schedule.interval)
+            schedule.next_due += missed * schedule.interval
+        schedule.entry = self._schedule(schedule.next_due - now, lambda: self._fire_recurring(schedule))
+
+    def _schedule(self, delay: float, callback: typing.Callable[[], typing.Any],
+                  action: base_action.BaseAction = None) -> timer_queue.TimerEntry:
+        entry = self.timer_queue.schedule(delay, callback, action)
+        self._notify(self.signal_timer_queue_contents_changed)
+        self._arm_timer()
+        return entry
+
+    def _arm_timer(self):
+        next_due = self.timer_queue.next_due()
+        if next_due is None:
+            self._timer.stop()
+            return
+        self._timer.start(max(0, math.ceil((next_due - time.monotonic()) * 1000)))
+
+    @QtCore.pyqtSlot()
+    def on_timer_queue_due(self):
+        entries = self.timer_queue.pop_due()
+        if entries:
+            self._notify(self.signal_timer_queue_contents_changed)
+        for entry in entries:
+            entry.callback()
+        self._arm_timer()
+
+    def _schedule_retry(self, action: base_action.BaseAction):
+        policy = action.retry_policy
+        delay = policy.next_delay(action.attempt)
+        action.prepare_retry()
+        action.tick(f'Retry {action.attempt}/{policy.max_attempts} in {delay:.1f} sec', msg_only=True)
+        self._schedule(delay, lambda: self._enqueue_action(action), action)
+
+    def _enqueue_action(self, action: base_action.BaseAction):
+        if action.cancelled:
+            return
+        key = action.serialization_key
+        if key is not None and not action.series_limited:
+            owner = self.lane_owner_dict.get(key, None)
+            if owner is None:
+                self.lane_owner_dict[key] = action
+                self._notify(self.signal_lane_status_changed)
+            elif owner is not action:
+                # another action holds this key; wait in FIFO order without occupying a worker
+                self.lane_waiting_dict.setdefault(key, collections.deque()).append(action)
+                action.tick(f'Waiting on lane {key}', msg_only=True)
+                self._notify(self.signal_lane_status_changed)
+                return
+        if self.admission.needs_admission(action):
+            admitted = self.admission.submit(action)
+            if action not in admitted:
+                action.tick('Waiting for resources', msg_only=True)
+            self._queue_admitted(admitted)
+            return
+        self._put_on_queue(action)
+
+    def _release_resources(self, action: base_action.BaseAction):
+        if not self.admission.holds(action) and not self.admission.is_waiting(action):
+            return
+        admitted = self.admission.release(action)
+        self._emit_resource_usage(action)
+        self._queue_admitted(admitted)
+
+    def _queue_admitted(self, admitted: list[base_action.BaseAction]):
+        for next_action in admitted:
+            self._emit_resource_usage(next_action)
+            if isinstance(next_action, pipeline.PipelineAction):
+                self.dispatch_action(next_action)
             else:
-                self.immediate_queue.put((dispatcher_consts.STD_ACTION_PRIORITY, action))
-                self.signal_immediate_queue_contents_changed.emit()
+                self._put_on_queue(next_action)
+
+    def _emit_resource_usage(self, action: base_action.BaseAction):
+        for name, (used, capacity) in self.admission.get_usage().items():
+            if name in action.resource_costs:
+                self._emit(self.signal_resource_usage_changed, name, used, capacity)
+
+    def get_resource_usage(self) -> dict[str, tuple[float, float]]:
+        return self.admission.get_usage()
+
+    def set_resource_capacity(self, name: str, capacity: float):
+        if self._off_coordinator():
+            self._call_on_coordinator(lambda: self.set_resource_capacity(name, capacity))
+            return
+        self._queue_admitted(self.admission.set_capacity(name, capacity))
+
+    def _release_lane(self, action: base_action.BaseAction):
+        key = action.serialization_key
+        if key is None or self.lane_owner_dict.get(key, None) is not action:
+            return
+        waiting = self.lane_waiting_dict.get(key, None)
+        while waiting:
+            next_action = waiting.popleft()
+            if next_action.cancelled:
+                continue
+            self.lane_owner_dict[key] = next_action
+            if not waiting:
+                del self.lane_waiting_dict[key]
+            self._notify(self.signal_lane_status_changed)
+            self._put_on_queue(next_action)
+            return
+        self.lane_waiting_dict.pop(key, None)
+        del self.lane_owner_dict[key]
+        self._notify(self.signal_lane_status_changed)
+
+    def _put_on_queue(self, action: base_action.BaseAction):
+        if self.tracer is not None:
+            self.tracer.enqueued(action)
+        if action.series_limited:
+            self.series_queue.put((dispatcher_consts.STD_ACTION_PRIORITY, action))
+            self._notify(self.signal_series_queue_contents_changed)
+        else:
+            self.immediate_queue.put((dispatcher_consts.STD_ACTION_PRIORITY, action))
+            self._notify(self.signal_immediate_queue_contents_changed)
 
     @QtCore.pyqtSlot(int)
     def on_worker_started(self, worker_id: int):
         self.thread_status_dict[worker_id] = dispatcher_consts.ThreadStatus.IDLE
-        self.signal_thread_status_changed.emit(worker_id)
+        self._notify(self.signal_thread_status_changed, worker_id)
         self.thread_action_dict[worker_id] = None
-        self.signal_thread_action_changed.emit(worker_id)
+        self._notify(self.signal_thread_action_changed, worker_id)
 
         all_active = True
         for val in self.thread_status_dict.values():
@@ -255,14 +797,14 @@ class ActionDispatcher(QtCore.QObject):
             if not all_active:
                 break
         if all_active:
-            self.signal_all_threads_running.emit()
+            self._emit(self.signal_all_threads_running)
 
     @QtCore.pyqtSlot(int)
     def on_worker_shutdown(self, worker_id: int):
         self.thread_status_dict[worker_id] = dispatcher_consts.ThreadStatus.DEAD
-        self.signal_thread_status_changed.emit(worker_id)
+        self._notify(self.signal_thread_status_changed, worker_id)
         self.thread_action_dict[worker_id] = None
-        self.signal_thread_action_changed.emit(worker_id)
+        self._notify(self.signal_thread_action_changed, worker_id)
 
         all_dead = True
         for val in self.thread_status_dict.values():
@@ -270,14 +812,50 @@ class ActionDispatcher(QtCore.QObject):
             if not all_dead:
                 break
         if all_dead:
-            self.signal_all_threads_shutdown.emit()
+            self._emit(self.signal_all_threads_shutdown)
+
+    @QtCore.pyqtSlot(int)
+    def on_worker_retired(self, worker_id: int):
+        # a quarantined worker finally returned; give back the extra pool slot its replacement used
+        for worker in [w for w in self._quarantined_workers if w.retired]:
+            self._quarantined_workers.remove(worker)
+            pool = self.parallel_thread_pool if worker.worker_id < self.num_parallel_threads else self.series_thread
+            pool.setMaxThreadCount(pool.maxThreadCount() - 1)
+
+    @QtCore.pyqtSlot(int, base_action.BaseAction)
+    def on_action_overdue(self, worker_id: int, action: base_action.BaseAction):
+        worker = self.workers.get(worker_id, None)
+        if worker is None or worker.quarantined or worker.current_action is not action:
+            return
+        self.logger.warning(f'Quarantining worker {worker_id}; {action.description} timed out.')
+        worker.quarantined = True
+        self._quarantined_workers.append(worker)
+
+        action.error_flags = action.error_flags | base_action.BaseAction.ErrorFlags.TIMEOUT
+        action.action_status = dispatcher_consts.ActionStatus.FAILED
+        action.datetime_end = datetime.datetime.now()
+        action.tick('Timed out!', msg_only=True)
+        # if the hung call ever returns it stops at its next tick, and nothing it does changes the action; the
+        # action is not cancelled, so a retry policy can still retry the timeout
+        action.abandon()
+        action.signal_action_finished.emit()
+
+        # the hung thread keeps its pool slot, so grow the pool by one for the replacement
+        pool = self.parallel_thread_pool if worker_id < self.num_parallel_threads else self.series_thread
+        pool.setMaxThreadCount(pool.maxThreadCount() + 1)
+        self._start_worker(worker_id)
+        self._notify(self.signal_thread_status_changed, worker_id)
+        self.thread_action_dict[worker_id] = None
+        self._notify(self.signal_thread_action_changed, worker_id)
+
+        self._finish_action(action)
 
     @QtCore.pyqtSlot(int)
     def on_worker_paused(self, worker_id: int):
         self.thread_status_dict[worker_id] = dispatcher_consts.ThreadStatus.SUSPENDED
-        self.signal_thread_status_changed.emit(worker_id)
+        self._notify(self.signal_thread_status_changed, worker_id)
         self.thread_action_dict[worker_id] = None
-        self.signal_thread_action_changed.emit(worker_id)
+        self._notify(self.signal_thread_action_changed, worker_id)
 
         all_paused = True
         for val in self.thread_status_dict.values():
@@ -286,14 +864,14 @@ class ActionDispatcher(QtCore.QObject):
                 break
         if all_paused:
             self.dispatcher_status = ActionDispatcher.DispatcherStatus.PAUSED
-            self.signal_all_threads_suspended.emit()
+            self._emit(self.signal_all_threads_suspended)
 
     @QtCore.pyqtSlot(int)
     def on_worker_resumed(self, worker_id: int):
         self.thread_status_dict[worker_id] = dispatcher_consts.ThreadStatus.IDLE
-        self.signal_thread_status_changed.emit(worker_id)
+        self._notify(self.signal_thread_status_changed, worker_id)
         self.thread_action_dict[worker_id] = None
-        self.signal_thread_action_changed.emit(worker_id)
+        self._notify(self.signal_thread_action_changed, worker_id)
 
         all_active = True
         for val in self.thread_status_dict.values():
@@ -303,19 +881,37 @@ class ActionDispatcher(QtCore.QObject):
                 break
         if all_active:
             self.dispatcher_status = ActionDispatcher.DispatcherStatus.READY
-            self.signal_dispatcher_ready.emit()
+            self._emit(self.signal_dispatcher_ready)
 
-    @QtCore.pyqtSlot(int, base_action.BaseAction)
+    @QtCore.pyqtSlot(int, object, float)
+    def on_worker_deferred_action(self, worker_id: int, action: base_action.BaseAction, delay: float):
+        # the worker handed back a throttled action; put it back on its queue once the limit is expected to clear
+        if worker_id < self.num_parallel_threads:
+            self._notify(self.signal_immediate_queue_contents_changed)
+        else:
+            self._notify(self.signal_series_queue_contents_changed)
+        if action.cancelled:
+            # cancel() ran while the worker held its claim and left the action for the worker to report
+            if not action.finalized:
+                action.cancel_exit()
+                self._finish_action(action)
+            return
+        action.tick('Throttled', msg_only=True)
+        self._schedule(delay, lambda: self._enqueue_action(action), action)
+
+    @QtCore.pyqtSlot(int, object)
     def on_worker_starting_action(self, worker_id: int, action: base_action.BaseAction):
-        if worker_id < self.parallel_thread_pool.maxThreadCount():
-            self.signal_immediate_queue_contents_changed.emit()
+        if worker_id < self.num_parallel_threads:
+            self._notify(self.signal_immediate_queue_contents_changed)
         else:
-            self.signal_series_queue_contents_changed.emit()
+            self._notify(self.signal_series_queue_contents_changed)
         self.thread_status_dict[worker_id] = dispatcher_consts.ThreadStatus.ACTIVE
-        self.signal_thread_status_changed.emit(worker_id)
+        self._notify(self.signal_thread_status_changed, worker_id)
         self.thread_action_dict[worker_id] = action
-        self.signal_thread_action_changed.emit(worker_id)
+        self._notify(self.signal_thread_action_changed, worker_id)
+        self._start_parents(action)
 
+    def _start_parents(self, action: base_action.BaseAction):
         # if the action has a parent, update this action status
         while action.parent_action:
             action = action.parent_action
@@ -325,32 +921,154 @@ class ActionDispatcher(QtCore.QObject):
                 action.signal_action_started.emit()
                 action.tick('Children Running', msg_only=True)
 
-    @QtCore.pyqtSlot(int, base_action.BaseAction)
+    @QtCore.pyqtSlot(int, object)
     def on_worker_done_with_action(self, worker_id: int, action: base_action.BaseAction):
         self.thread_status_dict[worker_id] = dispatcher_consts.ThreadStatus.IDLE
-        self.signal_thread_status_changed.emit(worker_id)
+        self._notify(self.signal_thread_status_changed, worker_id)
+        self.thread_action_dict[worker_id] = None
+        self._notify(self.signal_thread_action_changed, worker_id)
+
+        self._finish_action(action)
+
+    @QtCore.pyqtSlot(int, object)
+    def on_worker_starting_batch(self, worker_id: int, actions: list[base_action.BaseAction]):
+        if worker_id < self.num_parallel_threads:
+            self._notify(self.signal_immediate_queue_contents_changed)
+        else:
+            self._notify(self.signal_series_queue_contents_changed)
+        self.thread_status_dict[worker_id] = dispatcher_consts.ThreadStatus.ACTIVE
+        self._notify(self.signal_thread_status_changed, worker_id)
+        self.thread_action_dict[worker_id] = actions[0]
+        self._notify(self.signal_thread_action_changed, worker_id)
+        for action in actions:
+            self._start_parents(action)
+
+    @QtCore.pyqtSlot(int, object, object)
+    def on_worker_done_with_batch(self, worker_id: int, actions: list[base_action.BaseAction],
+                                  returned: list[base_action.BaseAction]):
+        self.thread_status_dict[worker_id] = dispatcher_consts.ThreadStatus.IDLE
+        self._notify(self.signal_thread_status_changed, worker_id)
         self.thread_action_dict[worker_id] = None
-        self.signal_thread_action_changed.emit(worker_id)
+        self._notify(self.signal_thread_action_changed, worker_id)
+
+        for action in actions:
+            self._finish_action(action)
+        # taken by a worker that was quarantined before their turn
+        self._requeue_returned(returned)
+
+    def _requeue_returned(self, actions: list[base_action.BaseAction]):
+        # actions taken off a queue but handed back unrun; they still hold their lane and resources
+        for action in actions:
+            if action.finalized:
+                # cancel() settled it after the worker let go
+                continue
+            if action.cancelled:
+                action.cancel_exit()
+                self._finish_action(action)
+            else:
+                self._put_on_queue(action)
+
+    @QtCore.pyqtSlot(str, object)
+    def on_node_starting_action(self, node: str, action: base_action.BaseAction):
+        if self.tracer is not None:
+            # nodes report through the dispatcher's thread; their slices include the trip over the socket
+            self.tracer.started(f'node {node}', action)
+        self._notify(self.signal_immediate_queue_contents_changed)
+        self._start_parents(action)
+
+    @QtCore.pyqtSlot(str, object)
+    def on_node_done_with_action(self, node: str, action: base_action.BaseAction):
+        if self.tracer is not None:
+            self.tracer.finished(f'node {node}', action)
+        self._finish_action(action)
+
+    @QtCore.pyqtSlot(str, object, float)
+    def on_node_deferred_action(self, node: str, action: base_action.BaseAction, delay: float):
+        # nodes only take from the immediate queue, which worker 0 also serves
+        self.on_worker_deferred_action(0, action, delay)
+
+    @QtCore.pyqtSlot(str, object)
+    def on_node_discarded_action(self, node: str, action: base_action.BaseAction):
+        self.on_worker_discarded_action(0, action)
 
-        if action.follow_up_action:
+    @QtCore.pyqtSlot(str, object)
+    def on_node_returned_actions(self, node: str, actions: list[base_action.BaseAction]):
+        # leases of a node that disconnected or stopped answering
+        if self.tracer is not None:
+            for action in actions:
+                self.tracer.returned(f'node {node}', action)
+        self._notify(self.signal_immediate_queue_contents_changed)
+        self._requeue_returned(actions)
+
+    @QtCore.pyqtSlot(int, object)
+    def on_worker_discarded_action(self, worker_id: int, action: base_action.BaseAction):
+        # a cancelled action was popped from its queue; its status was already settled by cancel()
+        if worker_id < self.num_parallel_threads:
+            self._notify(self.signal_immediate_queue_contents_changed)
+        else:
+            self._notify(self.signal_series_queue_contents_changed)
+
+    @QtCore.pyqtSlot(base_action.BaseAction)
+    def cancel(self, action: base_action.BaseAction):
+        if self._off_coordinator():
+            self._call_on_coordinator(lambda: self.cancel(action))
+            return
+        if action.action_status >= dispatcher_consts.ActionStatus.COMPLETE:
+            return
+        pending = [action]
+        while pending:
+            node = pending.pop()
+            pending.extend(node.child_actions)
+            if node.action_status >= dispatcher_consts.ActionStatus.COMPLETE:
+                continue
+            if node.cancel_token.cancel():
+                # a worker is running this action; it stops at its next tick and reports back as cancelled
+                continue
+            # queued, scheduled or waiting on children: the entry stays in its queue as a tombstone
+            node.action_status = dispatcher_consts.ActionStatus.CANCELLED
+            node.datetime_end = datetime.datetime.now()
+            node.tick('Cancelled', msg_only=True)
+            node.signal_action_finished.emit()
+            self._release_lane(node)
+            self._release_resources(node)
+            self._on_action_finalized(node)
+        self._notify(self.signal_immediate_queue_contents_changed)
+        self._notify(self.signal_series_queue_contents_changed)
+
+        if action.action_status == dispatcher_consts.ActionStatus.CANCELLED and action.parent_action:
+            action.parent_action.tick()
+            self._update_parents(action)
+
+    def _finish_action(self, action: base_action.BaseAction):
+        self._release_resources(action)
+        if action.retry_policy and not action.cancelled and \
+                action.retry_policy.should_retry(action.attempt, action.action_status, action.error_flags):
+            # a retry keeps its serialization lane so the actions queued behind it stay in order
+            self._schedule_retry(action)
+            return
+
+        self._release_lane(action)
+
+        if action.follow_up_action and not action.cancelled:
             self.dispatch_action(action.follow_up_action)
-            self.signal_dispatcher_created_action.emit(action.follow_up_action)
+            self._emit(self.signal_dispatcher_created_action, action.follow_up_action)
+
+        self._on_action_finalized(action)
 
         if action.parent_action:
             action.parent_action.tick()
 
+        self._update_parents(action)
+
+    def _update_parents(self, action: base_action.BaseAction):
         while action.parent_action:
 
             action = action.parent_action
             if action.action_status < dispatcher_consts.ActionStatus.COMPLETE:
-                children_complete = True
-                child_state = dispatcher_consts.ActionStatus.IN_PROGRESS
-                for child in action.child_actions:
-                    if child.action_status < dispatcher_consts.ActionStatus.COMPLETE:
-                        children_complete = False
-                        break
-                    if child.action_status > child_state:
-                        child_state = child.action_status
+                # counted as each child is finalized: a worker sets the final status before the dispatcher has
+                # handled its result, so the children's statuses alone can complete a parent too early
+                children_complete = action.children_finalized >= len(action.child_actions)
+                child_state = action.children_status
                 if children_complete:
                     action.datetime_end = datetime.datetime.now()
                     if action.parent_action:
@@ -359,7 +1077,8 @@ class ActionDispatcher(QtCore.QObject):
                         action.action_status = dispatcher_consts.ActionStatus.FAILED
                         action.tick('One or more children failed!', msg_only=True)
                         action.error_exit()
-                        return
+                        self._on_action_finalized(action)
+                        continue
                     if child_state == dispatcher_consts.ActionStatus.ERROR:
                         action.action_status = dispatcher_consts.ActionStatus.ERROR
                         action.tick('Children Complete (with errors)', msg_only=True)
@@ -367,6 +1086,10 @@ class ActionDispatcher(QtCore.QObject):
                         action.action_status = dispatcher_consts.ActionStatus.COMPLETE
                         action.tick('Children Complete', msg_only=True)
                     action.process_children()
+                    if self.release_payloads:
+                        for child in action.child_actions:
+                            child.release_payload()
+                    self._on_action_finalized(action)
                     if action.follow_up_action:
                         self.dispatch_action(action.follow_up_action)
-                        self.signal_dispatcher_created_action.emit(action.follow_up_action)
+                        self._emit(self.signal_dispatcher_created_action, action.follow_up_action)
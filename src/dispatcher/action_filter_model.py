@@ -0,0 +1,259 @@
+from PyQt6 import QtCore
+
+import bisect
+import enum
+import logging
+import typing
+
+from dispatcher import action_manager
+from dispatcher import base_action
+from dispatcher import dispatcher_consts
+
+
+class ActionFilterModel(QtCore.QAbstractTableModel):
+
+    logger = logging.getLogger('dispatcher.action_filter_model')
+
+    signal_status_counts_changed = QtCore.pyqtSignal()
+
+    class SortKey(enum.IntEnum):
+
+        INSERTION = 0
+        START_TIME = 1
+        DURATION = 2
+
+    def __init__(self, source: action_manager.ActionStatusModel, **kwargs):
+        parent = kwargs.get('parent', None)
+        super().__init__(parent=parent)
+        self.source: action_manager.ActionStatusModel = source
+        self.status_filter: set[dispatcher_consts.ActionStatus] = kwargs.get('status_filter', None)
+        self.class_filter: tuple[type, ...] = kwargs.get('class_filter', None)
+        self.text_filter: str = kwargs.get('text_filter', '')
+        self.sort_key: ActionFilterModel.SortKey = kwargs.get('sort_key', ActionFilterModel.SortKey.INSERTION)
+        self.sort_order: QtCore.Qt.SortOrder = kwargs.get('sort_order', QtCore.Qt.SortOrder.AscendingOrder)
+
+        # every action in the source, with the status last seen for it; drives the per-status counts
+        self._tracked: dict[int, base_action.BaseAction] = {}
+        self._status_by_id: dict[int, dispatcher_consts.ActionStatus] = {}
+        self._status_counts: dict[dispatcher_consts.ActionStatus, int] = {}
+        # matching actions sorted by key; _keys mirrors _rows so rows can be found and placed with bisect
+        self._rows: list[base_action.BaseAction] = []
+        self._keys: list[tuple] = []
+        self._key_by_id: dict[int, tuple] = {}
+
+        self.source.rowsInserted.connect(self.on_source_rows_inserted)
+        self.source.rowsAboutToBeRemoved.connect(self.on_source_rows_about_to_be_removed)
+        self.source.dataChanged.connect(self.on_source_data_changed)
+        self.source.modelReset.connect(self.rebuild)
+        self.source.layoutChanged.connect(self.rebuild)
+        self.rebuild()
+
+    def rowCount(self, parent: QtCore.QModelIndex = QtCore.QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self._rows)
+
+    def columnCount(self, parent: QtCore.QModelIndex = QtCore.QModelIndex()) -> int:
+        return self.source.columnCount()
+
+    def headerData(self, section, orientation, role=QtCore.Qt.ItemDataRole.DisplayRole):
+        return self.source.headerData(section, orientation, role)
+
+    def data(self, index: QtCore.QModelIndex, role=QtCore.Qt.ItemDataRole.DisplayRole) -> typing.Any:
+        if not index.isValid() or index.row() >= len(self._rows):
+            return None
+        return action_manager.ActionStatusModel.action_data(self._rows[index.row()], index.column(), role)
+
+    def flags(self, index):
+        if not index.isValid():
+            return QtCore.Qt.ItemFlag.NoItemFlags
+        return QtCore.Qt.ItemFlag.ItemIsEnabled | QtCore.Qt.ItemFlag.ItemIsSelectable
+
+    def get_action_from_index(self, index: QtCore.QModelIndex) -> base_action.BaseAction | None:
+        if not index.isValid() or index.row() >= len(self._rows):
+            return None
+        return self._rows[index.row()]
+
+    def status_counts(self) -> dict[dispatcher_consts.ActionStatus, int]:
+        return dict(self._status_counts)
+
+    def total_count(self) -> int:
+        return len(self._tracked)
+
+    # filters and sorting; changing them rebuilds the rows once from the tracked actions
+
+    def set_status_filter(self, statuses: typing.Iterable[dispatcher_consts.ActionStatus] | None):
+        self.status_filter = set(statuses) if statuses is not None else None
+        self._refilter()
+
+    def set_class_filter(self, classes: typing.Iterable[type] | None):
+        self.class_filter = tuple(classes) if classes is not None else None
+        self._refilter()
+
+    def set_text_filter(self, text: str):
+        self.text_filter = text or ''
+        self._refilter()
+
+    def set_sort(self, sort_key: 'ActionFilterModel.SortKey', order: QtCore.Qt.SortOrder = QtCore.Qt.SortOrder.AscendingOrder):
+        self.sort_key = sort_key
+        self.sort_order = order
+        self._refilter()
+
+    def sort(self, column: int, order: QtCore.Qt.SortOrder = QtCore.Qt.SortOrder.AscendingOrder):
+        # called by views with sorting enabled; the execution time column sorts by duration
+        if column == 4:
+            self.set_sort(ActionFilterModel.SortKey.DURATION, order)
+        elif column == 0:
+            self.set_sort(ActionFilterModel.SortKey.INSERTION, order)
+        else:
+            self.set_sort(ActionFilterModel.SortKey.START_TIME, order)
+
+    def accepts(self, action: base_action.BaseAction) -> bool:
+        if self.status_filter is not None and action.action_status not in self.status_filter:
+            return False
+        if self.class_filter is not None and not isinstance(action, self.class_filter):
+            return False
+        if self.text_filter and self.text_filter.lower() not in action.short_description.lower():
+            return False
+        return True
+
+    def _sort_key(self, action: base_action.BaseAction) -> tuple:
+        if self.sort_key == ActionFilterModel.SortKey.DURATION:
+            if action.datetime_start is not None and action.datetime_end is not None:
+                value = (action.datetime_end - action.datetime_start).total_seconds()
+            else:
+                value = -1.0
+        elif self.sort_key == ActionFilterModel.SortKey.START_TIME:
+            value = action.datetime_start.timestamp() if action.datetime_start is not None else float('inf')
+        else:
+            value = 0.0
+        if self.sort_order == QtCore.Qt.SortOrder.DescendingOrder:
+            return -value, -action.id
+        return value, action.id
+
+    @QtCore.pyqtSlot()
+    def rebuild(self):
+        self._tracked.clear()
+        self._status_by_id.clear()
+        self._status_counts.clear()
+        pending = list(self.source.root_actions)
+        while pending:
+            action = pending.pop()
+            pending.extend(self.source.child_rows(action))
+            self._track(action)
+        self._refilter()
+        self.signal_status_counts_changed.emit()
+
+    def _refilter(self):
+        self.beginResetModel()
+        entries = sorted((self._sort_key(action), action) for action in self._tracked.values()
+                         if self.accepts(action))
+        self._keys = [key for key, _ in entries]
+        self._rows = [action for _, action in entries]
+        self._key_by_id = {action.id: key for key, action in entries}
+        self.endResetModel()
+
+    def _track(self, action: base_action.BaseAction):
+        self._tracked[action.id] = action
+        self._status_by_id[action.id] = action.action_status
+        self._status_counts[action.action_status] = self._status_counts.get(action.action_status, 0) + 1
+
+    def _untrack(self, action: base_action.BaseAction):
+        if self._tracked.pop(action.id, None) is None:
+            return
+        status = self._status_by_id.pop(action.id)
+        self._status_counts[status] -= 1
+        if not self._status_counts[status]:
+            del self._status_counts[status]
+
+    def _row_of(self, action_id: int) -> int | None:
+        key = self._key_by_id.get(action_id, None)
+        if key is None:
+            return None
+        return bisect.bisect_left(self._keys, key)
+
+    def _remove_row(self, action_id: int):
+        row = self._row_of(action_id)
+        if row is None:
+            return
+        self.beginRemoveRows(QtCore.QModelIndex(), row, row)
+        del self._rows[row]
+        del self._keys[row]
+        del self._key_by_id[action_id]
+        self.endRemoveRows()
+
+    def _insert_rows(self, actions: list[base_action.BaseAction]):
+        entries = sorted((self._sort_key(action), action) for action in actions)
+        # actions landing at the same position go in with a single insert; insert from the back so the
+        # positions computed against the existing rows stay valid
+        groups: list[tuple[int, list[tuple[tuple, base_action.BaseAction]]]] = []
+        for entry in entries:
+            position = bisect.bisect_left(self._keys, entry[0])
+            if groups and groups[-1][0] == position:
+                groups[-1][1].append(entry)
+            else:
+                groups.append((position, [entry]))
+        for position, group in reversed(groups):
+            self.beginInsertRows(QtCore.QModelIndex(), position, position + len(group) - 1)
+            self._keys[position:position] = [key for key, _ in group]
+            self._rows[position:position] = [action for _, action in group]
+            for key, action in group:
+                self._key_by_id[action.id] = key
+            self.endInsertRows()
+
+    def _source_actions(self, parent: QtCore.QModelIndex, first: int, last: int) -> list[base_action.BaseAction]:
+        siblings = self.source.child_rows(self.source.get_action_from_index(parent))
+        actions = []
+        pending = list(siblings[first:last + 1])
+        while pending:
+            action = pending.pop()
+            pending.extend(self.source.child_rows(action))
+            actions.append(action)
+        return actions
+
+    @QtCore.pyqtSlot(QtCore.QModelIndex, int, int)
+    def on_source_rows_inserted(self, parent: QtCore.QModelIndex, first: int, last: int):
+        added = self._source_actions(parent, first, last)
+        for action in added:
+            self._track(action)
+        self._insert_rows([action for action in added if self.accepts(action)])
+        if added:
+            self.signal_status_counts_changed.emit()
+
+    @QtCore.pyqtSlot(QtCore.QModelIndex, int, int)
+    def on_source_rows_about_to_be_removed(self, parent: QtCore.QModelIndex, first: int, last: int):
+        removed = self._source_actions(parent, first, last)
+        for action in removed:
+            self._untrack(action)
+            self._remove_row(action.id)
+        if removed:
+            self.signal_status_counts_changed.emit()
+
+    @QtCore.pyqtSlot(QtCore.QModelIndex, QtCore.QModelIndex, "QList<int>")
+    def on_source_data_changed(self, top_left: QtCore.QModelIndex, bottom_right: QtCore.QModelIndex,
+                               roles: list[int] = ()):
+        counts_changed = False
+        for row in range(top_left.row(), bottom_right.row() + 1):
+            action = self.source.get_action_from_index(top_left.siblingAtRow(row))
+            if action is None or action.id not in self._tracked:
+                continue
+            previous = self._status_by_id[action.id]
+            if action.action_status != previous:
+                self._untrack(action)
+                self._track(action)
+                counts_changed = True
+            key = self._key_by_id.get(action.id, None)
+            member = key is not None
+            if action.action_status != previous or (member and key != self._sort_key(action)):
+                # status or timing moved: the action may leave the filter or change position
+                if member:
+                    self._remove_row(action.id)
+                if self.accepts(action):
+                    self._insert_rows([action])
+            elif member:
+                # progress ticks only repaint the row, they never touch the filter or sort order
+                proxy_row = self._row_of(action.id)
+                self.dataChanged.emit(self.index(proxy_row, top_left.column()),
+                                      self.index(proxy_row, bottom_right.column()), roles)
+        if counts_changed:
+            self.signal_status_counts_changed.emit()
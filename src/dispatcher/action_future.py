@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+import typing
+
+from dispatcher import base_action
+from dispatcher import dispatcher_consts
+
+
+# one condition shared by every future keeps the handles light; waiters re-check their own future on wake up
+_condition = threading.Condition()
+
+
+class ActionFailed(Exception):
+
+    def __init__(self, action: base_action.BaseAction):
+        super().__init__(f'Action id {action.id} failed: {action.description} (error flags {int(action.error_flags)})')
+        self.action: base_action.BaseAction = action
+
+
+class ActionFuture:
+
+    logger = logging.getLogger('dispatcher.action_future')
+
+    __slots__ = ('action', '_done', '_exception', '_callbacks')
+
+    def __init__(self, action: base_action.BaseAction):
+        self.action: base_action.BaseAction = action
+        self._done: bool = False
+        self._exception: BaseException = None
+        self._callbacks: list[typing.Callable[['ActionFuture'], typing.Any]] = []
+
+    def done(self) -> bool:
+        return self._done
+
+    def cancelled(self) -> bool:
+        return self._done and self.action.action_status == dispatcher_consts.ActionStatus.CANCELLED
+
+    def _resolve(self):
+        # called by the dispatcher once the action reaches its final state, after any retries
+        with _condition:
+            if self._done:
+                return
+            status = self.action.action_status
+            if status == dispatcher_consts.ActionStatus.CANCELLED:
+                self._exception = base_action.ActionCancelled(f'Action id {self.action.id} was cancelled.')
+            elif status == dispatcher_consts.ActionStatus.FAILED:
+                self._exception = ActionFailed(self.action)
+            self._done = True
+            callbacks, self._callbacks = self._callbacks, []
+            _condition.notify_all()
+        for callback in callbacks:
+            self._run_callback(callback)
+
+    def _run_callback(self, callback: typing.Callable[['ActionFuture'], typing.Any]):
+        try:
+            callback(self)
+        except Exception as err:
+            self.logger.exception(err)
+
+    def add_done_callback(self, callback: typing.Callable[['ActionFuture'], typing.Any]):
+        # runs on the dispatcher's thread when the action finishes, or right away if it already has
+        with _condition:
+            if not self._done:
+                self._callbacks.append(callback)
+                return
+        self._run_callback(callback)
+
+    def _wait(self, timeout: float = None):
+        # never call with the dispatcher's own thread blocked: that is the thread that resolves futures
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with _condition:
+            while not self._done:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f'Action id {self.action.id} did not finish within {timeout} sec.')
+                _condition.wait(remaining)
+
+    def result(self, timeout: float = None) -> typing.Any:
+        self._wait(timeout)
+        if self._exception is not None:
+            raise self._exception
+        # an action that completed with errors still returns whatever payload it produced
+        return self.action.payload
+
+    def exception(self, timeout: float = None) -> BaseException | None:
+        self._wait(timeout)
+        return self._exception
+
+    def as_asyncio_future(self, loop: asyncio.AbstractEventLoop = None) -> asyncio.Future:
+        loop = loop or asyncio.get_running_loop()
+        aio_future = loop.create_future()
+
+        def _copy_state(future: ActionFuture):
+            if aio_future.done():
+                return
+            if future._exception is not None:
+                aio_future.set_exception(future._exception)
+            else:
+                aio_future.set_result(future.action.payload)
+
+        self.add_done_callback(lambda future: loop.call_soon_threadsafe(_copy_state, future))
+        return aio_future
+
+    def __await__(self):
+        return self.as_asyncio_future().__await__()
+
+    def __repr__(self):
+        state = dispatcher_consts.ActionStatus(self.action.action_status).name if self._done else 'PENDING'
+        return f'<ActionFuture action={self.action.id} {state}>'
+
+
+def wait_all(futures: typing.Iterable[ActionFuture], timeout: float = None) -> bool:
+    # True once every future is done, False if the timeout ran out first
+    deadline = None if timeout is None else time.monotonic() + timeout
+    with _condition:
+        for future in futures:
+            while not future._done:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                _condition.wait(remaining)
+    return True
+
+
+def as_completed(futures: typing.Iterable[ActionFuture], timeout: float = None) -> typing.Iterator[ActionFuture]:
+    futures = list(futures)
+    finished: queue.Queue[ActionFuture] = queue.Queue()
+    for future in futures:
+        future.add_done_callback(finished.put)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    for _ in range(len(futures)):
+        remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            yield finished.get(timeout=remaining)
+        except queue.Empty:
+            raise TimeoutError(f'{len(futures)} actions did not all finish within {timeout} sec.') from None
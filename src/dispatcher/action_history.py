@@ -0,0 +1,161 @@
+import collections
+import datetime
+import json
+import logging
+import pathlib
+import sys
+import typing
+
+from dispatcher import base_action
+from dispatcher import dispatcher_consts
+
+
+def estimate_payload_size(payload: typing.Any, _depth: int = 0) -> int:
+    # rough size in bytes of what a payload keeps alive; containers are only followed a few levels deep
+    if payload is None:
+        return 0
+    memory_usage = getattr(payload, 'memory_usage', None)
+    if callable(memory_usage) and hasattr(payload, 'columns'):
+        try:
+            return int(memory_usage(deep=True).sum())
+        except (TypeError, ValueError):
+            pass
+    nbytes = getattr(payload, 'nbytes', None)
+    if isinstance(nbytes, int):
+        return nbytes
+    if isinstance(payload, (bytes, bytearray, memoryview)):
+        return len(payload)
+    if isinstance(payload, str):
+        return sys.getsizeof(payload)
+    content = getattr(payload, '_content', None)
+    if isinstance(content, bytes):
+        # a requests.Response that has read its body
+        return len(content)
+    size = sys.getsizeof(payload)
+    if _depth >= dispatcher_consts.HISTORY_SIZE_DEPTH:
+        return size
+    if isinstance(payload, dict):
+        size += sum(estimate_payload_size(k, _depth + 1) + estimate_payload_size(v, _depth + 1)
+                    for k, v in payload.items())
+    elif isinstance(payload, (list, tuple, set, frozenset, collections.deque)):
+        size += sum(estimate_payload_size(item, _depth + 1) for item in payload)
+    return size
+
+
+def estimate_action_size(action: base_action.BaseAction) -> int:
+    size = 0
+    pending = [action]
+    while pending:
+        node = pending.pop()
+        pending.extend(node.child_actions)
+        size += dispatcher_consts.HISTORY_ACTION_OVERHEAD + estimate_payload_size(node.stored_payload)
+    return size
+
+
+class RetentionPolicy:
+
+    def __init__(self, max_root_actions: int = None, max_megabytes: float = None, **kwargs):
+        # limits on finished root jobs kept in the model; None leaves that dimension unbounded
+        self.max_root_actions: int = max_root_actions
+        self.max_bytes: int = None if max_megabytes is None else int(max_megabytes * 1024 * 1024)
+        # replace a finished root job and its subtree with a single summary row
+        self.collapse_completed: bool = kwargs.get('collapse_completed', True)
+        # evicted jobs are appended to this file as one JSON record per line
+        self.archive_path: pathlib.Path = pathlib.Path(kwargs['archive_path']) if kwargs.get('archive_path') else None
+
+
+class ActionSummary:
+
+    def __init__(self, action: base_action.BaseAction):
+        self.id: int = action.id
+        self.description: str = action.description
+        self.short_description: str = action.short_description
+        self.action_status: dispatcher_consts.ActionStatus = action.action_status
+        self.error_flags: int = int(action.error_flags)
+        self.datetime_start: datetime.datetime = action.datetime_start
+        self.datetime_end: datetime.datetime = action.datetime_end
+        self.duration_in_seconds: str = action.duration_in_seconds
+        self.pct_complete: int = 100
+        self.parent_action = None
+        self.child_actions: list = []
+        self.child_status_counts: dict[str, int] = {}
+        pending = list(action.child_actions)
+        while pending:
+            node = pending.pop()
+            pending.extend(node.child_actions)
+            name = dispatcher_consts.ActionStatus(node.action_status).name
+            self.child_status_counts[name] = self.child_status_counts.get(name, 0) + 1
+        if self.child_status_counts:
+            counts = ', '.join(f'{count} {name.lower()}' for name, count in sorted(self.child_status_counts.items()))
+            self.current_process = f'{action.current_process} [{counts}]'
+        else:
+            self.current_process = action.current_process
+
+    def to_record(self) -> dict[str, typing.Any]:
+        return {
+            'id': self.id,
+            'description': self.description,
+            'status': dispatcher_consts.ActionStatus(self.action_status).name,
+            'error_flags': self.error_flags,
+            'start': self.datetime_start.isoformat() if self.datetime_start else None,
+            'end': self.datetime_end.isoformat() if self.datetime_end else None,
+            'duration': self.duration_in_seconds,
+            'children': self.child_status_counts,
+        }
+
+
+class ActionHistory:
+
+    logger = logging.getLogger('dispatcher.action_history')
+
+    def __init__(self, policy: RetentionPolicy):
+        self.policy: RetentionPolicy = policy
+        # finished root jobs in completion order with their estimated size in bytes
+        self._finished: collections.OrderedDict[int, int] = collections.OrderedDict()
+        self.total_bytes: int = 0
+        self.evicted_count: int = 0
+
+    def summarize(self, action: base_action.BaseAction) -> ActionSummary:
+        if isinstance(action, ActionSummary):
+            return action
+        return ActionSummary(action)
+
+    def record(self, entry: base_action.BaseAction | ActionSummary):
+        if isinstance(entry, ActionSummary):
+            size = dispatcher_consts.HISTORY_ACTION_OVERHEAD
+        else:
+            size = estimate_action_size(entry)
+        self.forget(entry.id)
+        self._finished[entry.id] = size
+        self.total_bytes += size
+
+    def forget(self, entry_id: int):
+        size = self._finished.pop(entry_id, None)
+        if size is not None:
+            self.total_bytes -= size
+
+    def over_limit(self, num_root_actions: int) -> bool:
+        if not self._finished:
+            return False
+        if self.policy.max_root_actions is not None and num_root_actions > self.policy.max_root_actions:
+            return True
+        return self.policy.max_bytes is not None and self.total_bytes > self.policy.max_bytes
+
+    def pop_oldest(self) -> int | None:
+        if not self._finished:
+            return None
+        entry_id, size = self._finished.popitem(last=False)
+        self.total_bytes -= size
+        return entry_id
+
+    def archive(self, entries: typing.Iterable[base_action.BaseAction | ActionSummary]):
+        entries = list(entries)
+        self.evicted_count += len(entries)
+        if self.policy.archive_path is None or not entries:
+            return
+        try:
+            with open(self.policy.archive_path, 'a', encoding='utf-8') as f:
+                for entry in entries:
+                    f.write(json.dumps(self.summarize(entry).to_record()) + '\n')
+        except OSError as err:
+            self.logger.warning(f'Unable to archive action history to {self.policy.archive_path}: {err}')
@@ -1,5 +1,6 @@
 from PyQt6 import QtCore, QtWidgets, QtGui
 
+from dispatcher import action_history
 from dispatcher import base_action
 from dispatcher import dispatcher_consts
 
@@ -12,16 +13,21 @@ class ActionStatusModel(QtCore.QAbstractItemModel):
         if base_action_list is None:
             base_action_list = []
         self.root_actions: list[base_action.BaseAction] = base_action_list
+        # the model keeps its own rows under each parent so it can announce inserts before the rows appear;
+        # the dispatcher fills action.child_actions independently
+        self._child_rows: dict[int, list[base_action.BaseAction]] = {}
+        self._row_by_id: dict[int, int] = {action.id: row for row, action in enumerate(self.root_actions)}
+        # without a retention policy every root job stays in the model for the life of the app
+        retention_policy: action_history.RetentionPolicy = kwargs.get('retention_policy', None)
+        self.history: action_history.ActionHistory = None
+        if retention_policy is not None:
+            self.history = action_history.ActionHistory(retention_policy)
 
     def index(self, row, column, parent=QtCore.QModelIndex()):
-        if not parent.isValid():
-            parentActions = self.root_actions
-        else:
-            parent_action = self.get_action_from_index(parent)
-            parentActions = parent_action.child_actions
-        if row >= len(parentActions):
+        parent_actions = self.child_rows(self.get_action_from_index(parent))
+        if row < 0 or row >= len(parent_actions):
             return QtCore.QModelIndex()
-        childAction = parentActions[row]
+        childAction = parent_actions[row]
         if childAction:
             return self.createIndex(row, column, childAction)
         else:
@@ -31,32 +37,21 @@ class ActionStatusModel(QtCore.QAbstractItemModel):
         if not index.isValid():
             return QtCore.QModelIndex()
         action = self.get_action_from_index(index)
-        parent_action = action.parent_action
-        if parent_action:
-            grandparent_action = parent_action.parent_action
-            if grandparent_action:
-                return self.createIndex(grandparent_action.child_actions.index(parent_action), 0, parent_action)
-            else:
-                return self.createIndex(self.root_actions.index(parent_action), 0, parent_action)
-
+        if action.parent_action:
+            return self.get_index(action.parent_action)
         else:
             return QtCore.QModelIndex()
-        # for root_action in self.root_actions:
-        #     if action in root_action.child_actions:
-        #         return self.createIndex(self.root_actions.index(root_action), 0, root_action)
-        #     for child_action in root_action.child_actions:
-        #         if action in child_action.child_actions:
-        #             return self.createIndex(root_action.index(child_action), 0, child_action)
+
+    def child_rows(self, action: base_action.BaseAction | None) -> list[base_action.BaseAction]:
+        if action is None:
+            return self.root_actions
+        return self._child_rows.get(action.id, [])
 
     def get_action_from_index(self, index: QtCore.QModelIndex):
         return index.internalPointer() if index.isValid() else None
 
     def rowCount(self, parent=QtCore.QModelIndex()):
-        if not parent.isValid():
-            parent_actions = self.root_actions
-        else:
-            parent_actions = parent.internalPointer().child_actions
-        return len(parent_actions)
+        return len(self.child_rows(self.get_action_from_index(parent)))
 
     def columnCount(self, parent=QtCore.QModelIndex()):
         return 5
@@ -64,20 +59,23 @@ class ActionStatusModel(QtCore.QAbstractItemModel):
     def data(self, index, role=QtCore.Qt.ItemDataRole.DisplayRole):
         if not index.isValid():
             return None
-        action: base_action.BaseAction = index.internalPointer()
+        return self.action_data(index.internalPointer(), index.column(), role)
+
+    @staticmethod
+    def action_data(action: base_action.BaseAction, column: int, role=QtCore.Qt.ItemDataRole.DisplayRole):
         if role == QtCore.Qt.ItemDataRole.DisplayRole:
-            if index.column() == 0:
+            if column == 0:
                 return action.short_description
-            elif index.column() == 1:
+            elif column == 1:
                 return action.current_process
-            elif index.column() == 3:
+            elif column == 3:
                 return action.pct_complete
-            elif index.column() == 4:
+            elif column == 4:
                 return action.duration_in_seconds
             return None
-        elif role == dispatcher_consts.ACTION_STATUS_ROLE and (index.column() == 2 or index.column() == 3):
+        elif role == dispatcher_consts.ACTION_STATUS_ROLE and (column == 2 or column == 3):
             return action.action_status
-        elif role == dispatcher_consts.ACTION_PROGRESS_ROLE and index.column() == 3:
+        elif role == dispatcher_consts.ACTION_PROGRESS_ROLE and column == 3:
             return action.pct_complete
         elif role == QtCore.Qt.ItemDataRole.TextAlignmentRole:
             return QtCore.Qt.AlignmentFlag.AlignCenter
@@ -106,46 +104,143 @@ class ActionStatusModel(QtCore.QAbstractItemModel):
             return None
 
     def get_index(self, action: base_action.BaseAction):
-        for rootIndex, rootNode in enumerate(self.root_actions):
-            if rootNode is action:
-                return self.createIndex(rootIndex, 0, rootNode)
-            for childIndex, childNode in enumerate(rootNode.child_actions):
-                if childNode is action:
-                    return self.createIndex(childIndex, 0, childNode)
-        return QtCore.QModelIndex()
+        if action is None:
+            return QtCore.QModelIndex()
+        row = self._row_by_id.get(action.id, None)
+        if row is None:
+            return QtCore.QModelIndex()
+        rows = self.child_rows(action.parent_action)
+        if row >= len(rows) or rows[row] is not action:
+            return QtCore.QModelIndex()
+        return self.createIndex(row, 0, action)
 
-    @QtCore.pyqtSlot(base_action.BaseAction)
-    def add_action(self, action: base_action.BaseAction):
-        parent = action.parent_action
-        if not parent:
-            # action is a root action
-            self.beginInsertRows(QtCore.QModelIndex(), len(self.root_actions), len(self.root_actions))
-            self.root_actions.append(action)
-            self.endInsertRows()
+    def _insert_rows(self, parent: base_action.BaseAction | None, actions: list[base_action.BaseAction]):
+        actions = [action for action in actions if action.id not in self._row_by_id]
+        if not actions:
+            return
+        if parent is None:
+            rows = self.root_actions
+            parent_index = QtCore.QModelIndex()
         else:
+            rows = self._child_rows.setdefault(parent.id, [])
             parent_index = self.get_index(parent)
-            self.beginInsertRows(parent_index, len(parent.child_actions), len(parent.child_actions))
-            parent.child_actions.append(action)
+        first = len(rows)
+        # rows under a parent that is not (or no longer) in the model are kept without notifying views
+        notify = parent is None or parent_index.isValid()
+        if notify:
+            self.beginInsertRows(parent_index, first, first + len(actions) - 1)
+        rows.extend(actions)
+        for row, action in enumerate(actions, first):
+            self._row_by_id[action.id] = row
+        if notify:
             self.endInsertRows()
 
+    @QtCore.pyqtSlot(base_action.BaseAction)
+    def add_action(self, action: base_action.BaseAction):
+        self._insert_rows(action.parent_action, [action])
+
+    @QtCore.pyqtSlot(base_action.BaseAction, list)
+    def add_actions(self, parent: base_action.BaseAction, actions: list[base_action.BaseAction]):
+        # a whole dispatch() expansion goes in with a single insert, so views re-layout once per batch
+        self._insert_rows(parent, actions)
+
+    def _drop_subtree_rows(self, action: base_action.BaseAction):
+        pending = [action]
+        while pending:
+            node = pending.pop()
+            self._row_by_id.pop(node.id, None)
+            pending.extend(self._child_rows.pop(node.id, ()))
+
+    def _remove_root(self, row: int) -> base_action.BaseAction:
+        self.beginRemoveRows(QtCore.QModelIndex(), row, row)
+        action = self.root_actions.pop(row)
+        self._drop_subtree_rows(action)
+        for shifted in range(row, len(self.root_actions)):
+            self._row_by_id[self.root_actions[shifted].id] = shifted
+        self.endRemoveRows()
+        return action
+
+    def _replace_root(self, row: int, replacement: base_action.BaseAction):
+        self._remove_root(row)
+        self.beginInsertRows(QtCore.QModelIndex(), row, row)
+        self.root_actions.insert(row, replacement)
+        for shifted in range(row, len(self.root_actions)):
+            self._row_by_id[self.root_actions[shifted].id] = shifted
+        self.endInsertRows()
+
+    @QtCore.pyqtSlot(base_action.BaseAction)
+    def on_action_finalized(self, action: base_action.BaseAction):
+        if self.history is None or action.parent_action is not None:
+            return
+        index = self.get_index(action)
+        if not index.isValid():
+            return
+        if self.history.policy.collapse_completed:
+            summary = self.history.summarize(action)
+            self._replace_root(index.row(), summary)
+            self.history.record(summary)
+        else:
+            self.history.record(action)
+        self._enforce_retention()
+
+    def _enforce_retention(self):
+        # evict the oldest finished root jobs one row at a time; running jobs are never evicted
+        evicted = []
+        while self.history.over_limit(len(self.root_actions)):
+            action_id = self.history.pop_oldest()
+            row = self._row_by_id.get(action_id, None)
+            if row is None or row >= len(self.root_actions) or self.root_actions[row].id != action_id:
+                continue
+            evicted.append(self._remove_root(row))
+        self.history.archive(evicted)
+
     @QtCore.pyqtSlot(base_action.BaseAction)
     def update_action_status(self, action: base_action.BaseAction):
+        row = self.get_index(action).row()
+        if row < 0:
+            # the action has already been collapsed or evicted from the history
+            return
         # Find the index of the RequestAction object in the model
-        index = self.createIndex(self.get_index(action).row(), 2, action)
-        index2 = self.createIndex(self.get_index(action).row(), 3, action)
+        index = self.createIndex(row, 2, action)
+        index2 = self.createIndex(row, 3, action)
         self.dataChanged.emit(index, index2, [dispatcher_consts.ACTION_STATUS_ROLE])
-        index3 = self.createIndex(self.get_index(action).row(), 1, action)
+        index3 = self.createIndex(row, 1, action)
         self.dataChanged.emit(index3, index3, [QtCore.Qt.ItemDataRole.DisplayRole])
-        index4 = self.createIndex(self.get_index(action).row(), 4, action)
+        index4 = self.createIndex(row, 4, action)
         self.dataChanged.emit(index4, index4, [QtCore.Qt.ItemDataRole.DisplayRole])
 
     @QtCore.pyqtSlot(base_action.BaseAction)
     def on_action_tick(self, action: base_action.BaseAction):
-        task_idx = self.createIndex(self.get_index(action).row(), 1, action)
+        row = self.get_index(action).row()
+        if row < 0:
+            return
+        task_idx = self.createIndex(row, 1, action)
         self.dataChanged.emit(task_idx, task_idx, [QtCore.Qt.ItemDataRole.DisplayRole])
-        prg_idx = self.createIndex(self.get_index(action).row(), 3, action)
+        prg_idx = self.createIndex(row, 3, action)
         self.dataChanged.emit(prg_idx, prg_idx, [dispatcher_consts.ACTION_PROGRESS_ROLE])
 
+    @QtCore.pyqtSlot(list)
+    def on_actions_changed(self, actions: list[base_action.BaseAction]):
+        # a coalesced batch from the dispatcher: one dataChanged per run of adjacent rows under the same parent
+        rows_by_parent: dict[int, list[tuple[int, base_action.BaseAction]]] = {}
+        for action in actions:
+            row = self.get_index(action).row()
+            if row < 0:
+                continue
+            parent_id = action.parent_action.id if action.parent_action is not None else None
+            rows_by_parent.setdefault(parent_id, []).append((row, action))
+        for rows in rows_by_parent.values():
+            rows.sort(key=lambda item: item[0])
+            first_row, first_action = last_row, last_action = rows[0]
+            for row, action in rows[1:]:
+                if row != last_row + 1:
+                    self.dataChanged.emit(self.createIndex(first_row, 1, first_action),
+                                          self.createIndex(last_row, 4, last_action))
+                    first_row, first_action = row, action
+                last_row, last_action = row, action
+            self.dataChanged.emit(self.createIndex(first_row, 1, first_action),
+                                  self.createIndex(last_row, 4, last_action))
+
 
 class ActionStatusDelegate(QtWidgets.QStyledItemDelegate):
 
@@ -0,0 +1,238 @@
+from PyQt6 import QtCore
+
+import collections
+import itertools
+import json
+import logging
+import os
+import pathlib
+import threading
+import time
+import typing
+
+from dispatcher import base_action
+from dispatcher import dispatcher_consts
+from dispatcher import thread_action
+from dispatcher import worker_signal
+
+
+DISPATCHER_TRACK = 'dispatcher'
+
+
+def _slice_key(event: str, track: typing.Hashable, action_id: typing.Optional[int]) -> tuple:
+    # a remote node runs several actions at once, so runs are told apart by action; a batch has no end id
+    if event in ('begin', 'end'):
+        return 'run', track, action_id
+    return 'batch', track, None
+
+
+class ActionTracer:
+
+    logger = logging.getLogger('dispatcher.action_tracer')
+
+    # records when actions are queued, run, paused behind and waited on, for export as a chrome trace
+    # (chrome://tracing or ui.perfetto.dev). recording appends one tuple to a bounded deque, from whichever thread
+    # the event happens on; slices, flows and waits are only worked out on export, and the oldest events drop
+    # off once the buffer is full. pass one to the dispatcher with ActionDispatcher(tracer=ActionTracer())
+
+    def __init__(self, **kwargs):
+        self.capacity: int = kwargs.get('capacity', dispatcher_consts.TRACE_BUFFER_SIZE)
+        self.enabled: bool = kwargs.get('enabled', True)
+        # (timestamp ns, event, track, action id, name, extra)
+        self._events: collections.deque[tuple] = collections.deque(maxlen=self.capacity)
+        self._track_names: dict[typing.Hashable, str] = {DISPATCHER_TRACK: 'dispatcher'}
+        self._origin_ns: int = time.perf_counter_ns()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._events)
+
+    def clear(self):
+        self._events.clear()
+
+    def _record(self, event: str, track: typing.Hashable, action_id: int = None, name: str = None,
+                extra: typing.Any = None):
+        if self.enabled:
+            self._events.append((time.perf_counter_ns(), event, track, action_id, name, extra))
+
+    def name_track(self, track: typing.Hashable, name: str):
+        with self._lock:
+            self._track_names[track] = name
+
+    def watch_worker(self, worker_id: int, signals: worker_signal.WorkerSignals, name: str = None):
+        # direct connections run in the worker's thread as the signal is emitted, so the times are the worker's
+        # own and nothing waits on the dispatcher's event loop
+        self.name_track(worker_id, name or f'worker {worker_id}')
+        direct = QtCore.Qt.ConnectionType.DirectConnection
+        signals.worker_starting_action.connect(self.started, direct)
+        signals.worker_done_with_action.connect(self.finished, direct)
+        signals.worker_starting_batch.connect(self.batch_started, direct)
+        signals.worker_done_with_batch.connect(self.batch_finished, direct)
+        signals.worker_paused.connect(self.paused, direct)
+        signals.worker_resumed.connect(self.resumed, direct)
+
+    def enqueued(self, action: base_action.BaseAction):
+        self._record('enqueue', DISPATCHER_TRACK, action.id, type(action).__name__)
+
+    def started(self, track: typing.Hashable, action: base_action.BaseAction):
+        # pause, resume and shutdown actions never report back; the pause shows up as its own slice
+        if not isinstance(action, thread_action.ThreadAction):
+            self._record('begin', track, action.id, type(action).__name__)
+
+    def finished(self, track: typing.Hashable, action: base_action.BaseAction):
+        self._record('end', track, action.id, None, action.action_status)
+
+    def returned(self, track: typing.Hashable, action: base_action.BaseAction):
+        self._record('end', track, action.id)
+
+    def batch_started(self, track: typing.Hashable, actions: list[base_action.BaseAction]):
+        self._record('batch_begin', track, actions[0].id, type(actions[0]).__name__,
+                     tuple(action.id for action in actions))
+
+    def batch_finished(self, track: typing.Hashable, actions: list[base_action.BaseAction],
+                       returned: list[base_action.BaseAction] = None):
+        self._record('batch_end', track)
+
+    def paused(self, track: typing.Hashable):
+        self._record('pause', track)
+
+    def resumed(self, track: typing.Hashable):
+        self._record('resume', track)
+
+    def now(self) -> int:
+        return time.perf_counter_ns()
+
+    def dispatched(self, action: base_action.BaseAction, children: list[base_action.BaseAction], started: int):
+        # one event once dispatch() has returned, so actions without children cost nothing here
+        if children:
+            self._record('dispatch', DISPATCHER_TRACK, action.id, type(action).__name__,
+                         (started, tuple(child.id for child in children)))
+
+    def finalized(self, action: base_action.BaseAction):
+        # only parents are of interest here; a leaf's end is already on its worker's track
+        if action.child_actions:
+            self._record('finalize', DISPATCHER_TRACK, action.id, None, action.action_status)
+
+    def trace_events(self) -> list[dict]:
+        events = sorted(self._events, key=lambda e: e[0])
+        with self._lock:
+            track_names = dict(self._track_names)
+        pid = os.getpid()
+        tids: dict[typing.Hashable, int] = {DISPATCHER_TRACK: 0}
+
+        def tid_of(track: typing.Hashable) -> int:
+            if track not in tids:
+                tids[track] = track + 1 if isinstance(track, int) else 1000 + len(tids)
+            return tids[track]
+
+        def us(ts: int) -> float:
+            return (ts - self._origin_ns) / 1000
+
+        out: list[dict] = []
+        # slices still open, and the lanes in use on each track: overlapping slices go on extra lanes below it
+        open_slices: dict[tuple, tuple] = {}
+        lanes: dict[typing.Hashable, set[int]] = collections.defaultdict(set)
+        paused: dict[typing.Hashable, float] = {}
+        # where each action first shows up as a slice; flows from its parent end there
+        first_slice: dict[int, tuple[float, int]] = {}
+        queued: set[int] = set()
+        dispatches: list[tuple[int, float, tuple]] = []
+        waiting: dict[int, float] = {}
+
+        for ts, event, track, action_id, name, extra in events:
+            tid = tid_of(track)
+            t = us(ts)
+            if event == 'enqueue':
+                if action_id in queued:
+                    continue
+                queued.add(action_id)
+                out.append({'name': 'queued', 'cat': 'queue', 'ph': 'b', 'id': f'q{action_id}', 'ts': t,
+                            'pid': pid, 'tid': tid, 'args': {'action': action_id, 'type': name}})
+            elif event in ('begin', 'batch_begin'):
+                ids = extra if event == 'batch_begin' else (action_id,)
+                label = f'{name} x{len(ids)}' if event == 'batch_begin' else f'{name} {action_id}'
+                busy = lanes[track]
+                lane = next(i for i in itertools.count() if i not in busy)
+                busy.add(lane)
+                if lane:
+                    tid = tid_of((track, lane))
+                    track_names.setdefault((track, lane), f'{track_names.get(track, str(track))} #{lane + 1}')
+                open_slices[_slice_key(event, track, action_id)] = (t, label, ids, track, lane, tid)
+                for started_id in ids:
+                    first_slice.setdefault(started_id, (t, tid))
+                    if started_id in queued:
+                        queued.discard(started_id)
+                        out.append({'name': 'queued', 'cat': 'queue', 'ph': 'e', 'id': f'q{started_id}', 'ts': t,
+                                    'pid': pid, 'tid': tid})
+            elif event in ('end', 'batch_end'):
+                opened = open_slices.pop(_slice_key(event, track, action_id), None)
+                if opened is None:
+                    # its start dropped out of the buffer
+                    continue
+                start, label, ids, _, lane, tid = opened
+                lanes[track].discard(lane)
+                args = {'actions': list(ids)} if len(ids) > 1 else {'action': ids[0]}
+                if event == 'end':
+                    # no status: handed back unfinished, e.g. by a remote node that was lost
+                    args['status'] = dispatcher_consts.ActionStatus(extra).name if extra is not None else 'RETURNED'
+                out.append({'name': label, 'cat': 'action', 'ph': 'X', 'ts': start, 'dur': t - start,
+                            'pid': pid, 'tid': tid, 'args': args})
+            elif event == 'dispatch':
+                started, child_ids = extra
+                start = us(started)
+                first_slice.setdefault(action_id, (start, tid))
+                out.append({'name': f'{name} {action_id}', 'cat': 'dispatch', 'ph': 'X', 'ts': start,
+                            'dur': t - start, 'pid': pid, 'tid': tid,
+                            'args': {'action': action_id, 'children': len(child_ids)}})
+                # the parent waits from the end of its dispatch until its last child is folded in
+                dispatches.append((action_id, start, child_ids))
+                waiting[action_id] = t
+                out.append({'name': 'children', 'cat': 'children', 'ph': 'b', 'id': f'c{action_id}', 'ts': t,
+                            'pid': pid, 'tid': tid, 'args': {'parent': action_id, 'children': len(child_ids)}})
+            elif event == 'pause':
+                paused[track] = t
+            elif event == 'resume':
+                start = paused.pop(track, None)
+                if start is not None:
+                    out.append({'name': 'paused', 'cat': 'worker', 'ph': 'X', 'ts': start, 'dur': t - start,
+                                'pid': pid, 'tid': tid})
+            elif event == 'finalize':
+                if waiting.pop(action_id, None) is not None:
+                    out.append({'name': 'children', 'cat': 'children', 'ph': 'e', 'id': f'c{action_id}', 'ts': t,
+                                'pid': pid, 'tid': tid,
+                                'args': {'status': dispatcher_consts.ActionStatus(extra).name}})
+
+        # whatever is still running at export stays open to the end of the trace
+        for start, label, ids, _, _, tid in open_slices.values():
+            out.append({'name': label, 'cat': 'action', 'ph': 'B', 'ts': start, 'pid': pid, 'tid': tid})
+        for track, start in paused.items():
+            out.append({'name': 'paused', 'cat': 'worker', 'ph': 'B', 'ts': start, 'pid': pid, 'tid': tid_of(track)})
+
+        # parent to child arrows, from the parent's dispatch to wherever each child first ran
+        dispatcher_tid = tids[DISPATCHER_TRACK]
+        for parent_id, start, child_ids in dispatches:
+            for child_id in child_ids:
+                target = first_slice.get(child_id, None)
+                if target is None:
+                    continue
+                flow = f'{parent_id}:{child_id}'
+                out.append({'name': 'child', 'cat': 'flow', 'ph': 's', 'id': flow, 'ts': start,
+                            'pid': pid, 'tid': dispatcher_tid})
+                out.append({'name': 'child', 'cat': 'flow', 'ph': 'f', 'bp': 'e', 'id': flow, 'ts': target[0],
+                            'pid': pid, 'tid': target[1]})
+
+        out.append({'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': 'dispatcher'}})
+        for track, tid in tids.items():
+            out.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                        'args': {'name': track_names.get(track, str(track))}})
+            out.append({'name': 'thread_sort_index', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'sort_index': tid}})
+        return out
+
+    def export(self, path: typing.Union[str, pathlib.Path]) -> int:
+        trace_events = self.trace_events()
+        # one string written at once; json.dump writes each token separately
+        text = json.dumps({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, separators=(',', ':'))
+        with open(path, 'w') as f:
+            f.write(text)
+        self.logger.info(f'Wrote {len(trace_events):,} trace events to {path}')
+        return len(trace_events)
@@ -0,0 +1,58 @@
+from PyQt6 import QtCore
+
+import logging
+import threading
+import time
+
+from dispatcher import base_action
+from dispatcher import action_worker
+from dispatcher import dispatcher_consts
+
+
+class ActionWatchdog(QtCore.QObject):
+
+    logger = logging.getLogger('dispatcher.watchdog')
+
+    signal_action_overdue = QtCore.pyqtSignal(int, base_action.BaseAction)
+
+    def __init__(self, workers: dict[int, action_worker.ActionWorker], **kwargs):
+        parent = kwargs.get('parent', None)
+        super().__init__(parent=parent)
+        self.workers: dict[int, action_worker.ActionWorker] = workers
+        self.interval: float = kwargs.get('interval', dispatcher_consts.WATCHDOG_INTERVAL)
+        self._flagged_ids: set[int] = set()
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='dispatcher-watchdog', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.check()
+
+    def check(self):
+        now = time.monotonic()
+        current_ids: set[int] = set()
+        for worker_id, worker in list(self.workers.items()):
+            action = worker.current_action
+            if action is None or worker.quarantined:
+                continue
+            current_ids.add(action.id)
+            if action.id in self._flagged_ids or not action.is_overdue(now):
+                continue
+            self._flagged_ids.add(action.id)
+            self.logger.warning(f'Worker {worker_id} exceeded the {action.timeout} sec deadline of '
+                                f'{action.description}')
+            self.signal_action_overdue.emit(worker_id, action)
+        self._flagged_ids &= current_ids
@@ -17,14 +17,22 @@ class ActionWorker(QtCore.QRunnable):
     logger = logging.getLogger('dispatcher.worker')
 
     def __init__(self, action_queue: queue.PriorityQueue, signal: worker_signal.WorkerSignals,
-                 worker_id: int):
+                 worker_id: int, batch_size: int = dispatcher_consts.WORKER_BATCH_SIZE):
         super().__init__()
         self.action_queue: queue.PriorityQueue = action_queue
         self.worker_id: int = worker_id
         self.signal: worker_signal.WorkerSignals = signal
         self._wait_flag: bool = False
-        # maintain reference to the last completed action by the worker to ensure that the reference count never goes to 0
-        self._last_action_completed: base_action.BaseAction = None
+        # only the id is kept so a finished action is not held alive by an idle worker; the worker signals carry
+        # actions as python objects, which keeps them alive until the dispatcher's slots have run
+        self._last_action_completed_id: int = None
+        # the action currently executing, watched by the dispatcher's watchdog
+        self.current_action: base_action.BaseAction = None
+        # set by the dispatcher once this worker is considered hung and has been replaced
+        self.quarantined: bool = False
+        self.retired: bool = False
+        # batchable actions at the head of the queue are taken up to this many at a time
+        self.batch_size: int = max(1, batch_size)
 
     def run(self):
         self.signal.worker_started.emit(self.worker_id)
@@ -37,7 +45,10 @@ class ActionWorker(QtCore.QRunnable):
                 else:
                     action = self.action_queue.queue[0]
             except IndexError:
-                time.sleep(dispatcher_consts.WORKER_WAIT_TIME)
+                # put() notifies this condition, so a refilled queue is picked up at once
+                with self.action_queue.not_empty:
+                    if not self.action_queue.queue:
+                        self.action_queue.not_empty.wait(dispatcher_consts.WORKER_WAIT_TIME)
                 continue
 
             if self._wait_flag:
@@ -56,6 +67,24 @@ class ActionWorker(QtCore.QRunnable):
             else:
                 action = self.action_queue.get()
 
+            if not isinstance(action, thread_action.ThreadAction):
+                if not action.cancel_token.claim():
+                    # the action was cancelled while it was queued; drop it without running it
+                    self.action_queue.task_done()
+                    self.signal.worker_discarded_action.emit(self.worker_id, action)
+                    continue
+                delay = action.throttle_delay()
+                if delay > 0:
+                    # hand the action back rather than blocking this worker on a throttled resource
+                    action.cancel_token.release()
+                    self.action_queue.task_done()
+                    self.signal.worker_deferred_action.emit(self.worker_id, action, delay)
+                    continue
+                if self.batch_size > 1 and action.batchable:
+                    if not self._run_batch(action):
+                        return
+                    continue
+
             # inform the dispatcher that the action has been removed
             self.signal.worker_starting_action.emit(self.worker_id, action)
 
@@ -65,7 +94,7 @@ class ActionWorker(QtCore.QRunnable):
                 action.execute_action()
                 self.signal.worker_shutdown.emit(self.worker_id)
                 self.logger.debug(f'Worker thread {self.worker_id} has stopped.')
-                self._last_action_completed = action
+                self._last_action_completed_id = action.id
                 # self.signal.worker_done_with_action.emit(self.worker_id, action)
                 return
             elif type(action) == thread_action.ThreadPauseAction:
@@ -75,7 +104,7 @@ class ActionWorker(QtCore.QRunnable):
                 action.execute_action()
                 self.signal.worker_paused.emit(self.worker_id)
                 self.logger.debug(f'Worker thread {self.worker_id} has been paused.')
-                self._last_action_completed = action
+                self._last_action_completed_id = action.id
                 continue
             elif type(action) == thread_action.ThreadResumeAction:
                 action.tick('Restarting thread...')
@@ -84,11 +113,91 @@ class ActionWorker(QtCore.QRunnable):
                 action.execute_action()
                 self.signal.worker_resumed.emit(self.worker_id)
                 self.logger.debug(f'Worker thread {self.worker_id} has been restarted.')
-                self._last_action_completed = action
+                self._last_action_completed_id = action.id
                 continue
             else:
                 self.logger.debug(f'Worker {self.worker_id}: {action.description}')
-                action.execute_action()
+                self.current_action = action
+                action.begin_run(self.worker_id)
+                try:
+                    action.execute_action()
+                except base_action.ActionCancelled:
+                    self.logger.debug(f'Worker {self.worker_id}: cancelled {action.description}')
+                    action.cancel_exit()
+                self.current_action = None
+                if not action.abandoned:
+                    # a retry of an abandoned action may already be claimed by the replacement worker
+                    action.cancel_token.release()
                 self.action_queue.task_done()
+                if self.quarantined:
+                    # the dispatcher already failed this action and started a replacement worker
+                    self.logger.warning(f'Quarantined worker {self.worker_id} returned from {action.description}')
+                    self.retired = True
+                    self.signal.worker_retired.emit(self.worker_id)
+                    return
                 self.signal.worker_done_with_action.emit(self.worker_id, action)
-                self._last_action_completed = action
+                self._last_action_completed_id = action.id
+
+    def _take_batch(self, first: base_action.BaseAction) -> list[base_action.BaseAction]:
+        # one pass under the queue's lock: keep taking from the head while the next action can join the batch
+        batch = [first]
+        with self.action_queue.mutex:
+            while len(batch) < self.batch_size and self.action_queue.queue:
+                head = self.action_queue.queue[0]
+                action = head[1] if isinstance(self.action_queue, queue.PriorityQueue) else head
+                if not action.batchable:
+                    break
+                self.action_queue._get()
+                batch.append(action)
+            self.action_queue.not_full.notify(len(batch) - 1)
+        return batch
+
+    def _run_batch(self, first: base_action.BaseAction) -> bool:
+        batch = [first]
+        for action in self._take_batch(first)[1:]:
+            if not action.cancel_token.claim():
+                self.action_queue.task_done()
+                self.signal.worker_discarded_action.emit(self.worker_id, action)
+                continue
+            delay = action.throttle_delay()
+            if delay > 0:
+                action.cancel_token.release()
+                self.action_queue.task_done()
+                self.signal.worker_deferred_action.emit(self.worker_id, action, delay)
+                continue
+            batch.append(action)
+
+        self.signal.worker_starting_batch.emit(self.worker_id, batch)
+        self.logger.debug(f'Worker {self.worker_id}: batch of {len(batch)} starting with {first.description}')
+        done: list[base_action.BaseAction] = []
+        for index, action in enumerate(batch):
+            self.current_action = action
+            action.begin_run(self.worker_id)
+            try:
+                if action.cancelled:
+                    # cancelled while it waited for its turn in the batch
+                    action.cancel_exit()
+                else:
+                    action.execute_action()
+            except base_action.ActionCancelled:
+                action.cancel_exit()
+            self.current_action = None
+            if not action.abandoned:
+                action.cancel_token.release()
+            self.action_queue.task_done()
+            if self.quarantined:
+                # the dispatcher already failed this action; report the ones that finished before it and hand
+                # back the ones that never ran
+                self.logger.warning(f'Quarantined worker {self.worker_id} returned from {action.description}')
+                returned = batch[index + 1:]
+                for waiting in returned:
+                    waiting.cancel_token.release()
+                    self.action_queue.task_done()
+                self.signal.worker_done_with_batch.emit(self.worker_id, done, returned)
+                self.retired = True
+                self.signal.worker_retired.emit(self.worker_id)
+                return False
+            done.append(action)
+        self.signal.worker_done_with_batch.emit(self.worker_id, done, [])
+        self._last_action_completed_id = batch[-1].id
+        return True
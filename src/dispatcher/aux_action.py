@@ -1,9 +1,32 @@
 from PyQt6 import QtCore
 import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc
+import pyarrow.parquet as pq
+import xlsxwriter
 
 import logging
+import math
+import os
+import pathlib
+import tempfile
 
 from dispatcher import base_action
+from dispatcher import dispatcher_consts
+
+
+def _umask() -> int:
+    # os.umask can only be read by setting it, which races with other threads creating files; linux has it in /proc
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('Umask:'):
+                    return int(line.split()[1], 8)
+    except (OSError, ValueError):
+        pass
+    mask = os.umask(0o022)
+    os.umask(mask)
+    return mask
 
 
 class AuxAction(base_action.BaseAction):
@@ -22,42 +45,294 @@ class AuxAction(base_action.BaseAction):
         return 'AuxAction class'
 
 
-class DataframeExcelAction(AuxAction):
+class DataframeExportAction(AuxAction):
 
     logger = logging.getLogger('dispatcher.df_export')
 
-    def __init__(self, df: pd.DataFrame, file_path: str, *args ,**kwargs):
+    def __init__(self, df: pd.DataFrame, file_path: str, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.file_path: str = file_path
         self.df: pd.DataFrame = df
-        self.total_ticks = 1
-        self.sheet_name = kwargs.get('sheet_name', 'Sheet1')
+        # options shared by every export format; binary formats keep nulls natively and ignore na_rep
         self.na_rep = kwargs.get('na_rep', '')
-        self.float_format = kwargs.get('float_format', None)
         self.index = kwargs.get('index', False)
         self.columns = kwargs.get('columns', None)
-        self.engine = kwargs.get('engine', 'xlsxwriter')
+        self.chunk_size: int = kwargs.get('chunk_size', dispatcher_consts.EXPORT_CHUNK_SIZE)
+        # write to a temp file next to the target and rename it into place once complete
+        self.atomic: bool = kwargs.get('atomic', True)
 
     @property
     def short_description(self):
-        return f'{self.id:4}: Export dataframe to excel'
+        return f'{self.id:4}: Export dataframe'
 
     @property
     def description(self):
-        return f'{self.id:4} Export dataframe to excel'
+        return f'{self.id:4} Export dataframe to {self.file_path}'
 
     def do_work(self):
         self.tick('Exporting', msg_only=True)
+        target = pathlib.Path(self.file_path)
+        write_path = self._temp_path(target) if self.atomic else target
         try:
-            self.df.to_excel(self.file_path,
-                             sheet_name=self.sheet_name,
-                             na_rep=self.na_rep,
-                             float_format=self.float_format,
-                             index=self.index,
-                             columns=self.columns,
-                             engine=self.engine)
+            self.write(write_path)
+            if self.atomic:
+                self._match_mode(write_path, target)
+                os.replace(write_path, target)
         except PermissionError:
             self.logger.warning(f'Unable to open file {self.file_path}. Permission denied!')
-            self.action_status = consts.ActionStatus.FAILED
+            self._discard_temp(write_path, target)
+            self.action_status = dispatcher_consts.ActionStatus.FAILED
+            return
+        except BaseException:
+            self._discard_temp(write_path, target)
+            raise
+        self.action_status = dispatcher_consts.ActionStatus.COMPLETE
+
+    def release_payload(self):
+        super().release_payload()
+        self.df = None
+
+    def write(self, path: pathlib.Path):
+        raise NotImplementedError('DataframeExportAction subclasses must implement write().')
+
+    @staticmethod
+    def _temp_path(target: pathlib.Path) -> pathlib.Path:
+        # keep the real suffix last; some writers pick or validate their format from it
+        fd, name = tempfile.mkstemp(prefix=f'.{target.stem}.', suffix=f'.tmp{target.suffix}',
+                                    dir=target.parent if str(target.parent) else None)
+        os.close(fd)
+        return pathlib.Path(name)
+
+    @staticmethod
+    def _match_mode(write_path: pathlib.Path, target: pathlib.Path):
+        # mkstemp creates the file owner-only; give it the mode a direct write would have had: the existing
+        # file's, or the default for a new file under the umask
+        try:
+            mode = target.stat().st_mode & 0o7777
+        except FileNotFoundError:
+            mode = 0o666 & ~_umask()
+        os.chmod(write_path, mode)
+
+    @staticmethod
+    def _discard_temp(write_path: pathlib.Path, target: pathlib.Path):
+        if write_path != target:
+            write_path.unlink(missing_ok=True)
+
+    def _select(self, frame: pd.DataFrame) -> pd.DataFrame:
+        if self.columns is None:
+            return frame
+        return frame[self.columns]
+
+    def _num_chunks(self, frame: pd.DataFrame) -> int:
+        return max(1, math.ceil(len(frame) / self.chunk_size))
+
+    def _chunks(self, frame: pd.DataFrame):
+        if len(frame) == 0:
+            yield frame
+            return
+        for start in range(0, len(frame), self.chunk_size):
+            yield frame.iloc[start:start + self.chunk_size]
+
+    def _tick_chunk(self, rows_done: int, num_rows: int):
+        self.tick(f'Exported {min(rows_done, num_rows):,} of {num_rows:,} rows')
+
+
+class DataframeCsvAction(DataframeExportAction):
+
+    def __init__(self, df: pd.DataFrame, file_path: str, *args, **kwargs):
+        super().__init__(df, file_path, *args, **kwargs)
+        self.sep: str = kwargs.get('sep', ',')
+        self.encoding: str = kwargs.get('encoding', 'utf-8')
+        self.float_format = kwargs.get('float_format', None)
+        self.total_ticks = self._num_chunks(df)
+
+    @property
+    def short_description(self):
+        return f'{self.id:4}: Export dataframe to csv'
+
+    def write(self, path: pathlib.Path):
+        frame = self._select(self.df)
+        rows_done = 0
+        with open(path, 'w', newline='', encoding=self.encoding) as f:
+            for chunk in self._chunks(frame):
+                chunk.to_csv(f, header=rows_done == 0, index=self.index, na_rep=self.na_rep, sep=self.sep,
+                             float_format=self.float_format)
+                rows_done += len(chunk)
+                self._tick_chunk(rows_done, len(frame))
+
+
+class DataframeParquetAction(DataframeExportAction):
+
+    def __init__(self, df: pd.DataFrame, file_path: str, *args, **kwargs):
+        super().__init__(df, file_path, *args, **kwargs)
+        self.compression: str = kwargs.get('compression', 'snappy')
+        self.total_ticks = self._num_chunks(df)
+
+    @property
+    def short_description(self):
+        return f'{self.id:4}: Export dataframe to parquet'
+
+    def write(self, path: pathlib.Path):
+        frame = self._select(self.df)
+        # one schema for the whole frame so every row group is written with the same column types
+        schema = pa.Schema.from_pandas(frame, preserve_index=self.index)
+        writer: pq.ParquetWriter = None
+        rows_done = 0
+        try:
+            for chunk in self._chunks(frame):
+                table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=self.index)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema, compression=self.compression)
+                writer.write_table(table, row_group_size=self.chunk_size)
+                rows_done += len(chunk)
+                self._tick_chunk(rows_done, len(frame))
+        finally:
+            if writer is not None:
+                writer.close()
+
+
+class DataframeFeatherAction(DataframeExportAction):
+
+    def __init__(self, df: pd.DataFrame, file_path: str, *args, **kwargs):
+        super().__init__(df, file_path, *args, **kwargs)
+        # feather v2 is the arrow ipc file format; None writes uncompressed record batches
+        self.compression: str = kwargs.get('compression', None)
+        self.total_ticks = self._num_chunks(df)
+
+    @property
+    def short_description(self):
+        return f'{self.id:4}: Export dataframe to feather'
+
+    def write(self, path: pathlib.Path):
+        frame = self._select(self.df)
+        schema = pa.Schema.from_pandas(frame, preserve_index=self.index)
+        options = pa.ipc.IpcWriteOptions(compression=self.compression)
+        rows_done = 0
+        with pa.ipc.new_file(str(path), schema, options=options) as writer:
+            for chunk in self._chunks(frame):
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=self.index))
+                rows_done += len(chunk)
+                self._tick_chunk(rows_done, len(frame))
+
+
+class DataframeExcelAction(DataframeExportAction):
+
+    def __init__(self, df: pd.DataFrame | dict[str, pd.DataFrame], file_path: str, *args ,**kwargs):
+        super().__init__(df, file_path, *args, **kwargs)
+        self.sheet_name = kwargs.get('sheet_name', 'Sheet1')
+        # several frames can be written as separate sheets of one workbook, keyed by sheet name
+        if isinstance(df, dict):
+            self.sheets: dict[str, pd.DataFrame] = dict(df)
+        else:
+            self.sheets: dict[str, pd.DataFrame] = {self.sheet_name: df}
+        self.float_format = kwargs.get('float_format', None)
+        self.engine = kwargs.get('engine', 'xlsxwriter')
+        # streaming writes rows in chunks through xlsxwriter's constant_memory mode, one tick per chunk
+        self.streaming: bool = kwargs.get('streaming', False)
+        if self.streaming and self.engine != 'xlsxwriter':
+            raise ValueError('Streaming excel export requires the xlsxwriter engine.')
+        if self.streaming:
+            self.total_ticks = sum(self._num_chunks(frame) for frame in self.sheets.values())
+        else:
+            self.total_ticks = len(self.sheets)
+
+    @property
+    def short_description(self):
+        return f'{self.id:4}: Export dataframe to excel'
+
+    @property
+    def description(self):
+        return f'{self.id:4} Export dataframe to excel'
+
+    def release_payload(self):
+        super().release_payload()
+        self.sheets = {}
+
+    def write(self, path: pathlib.Path):
+        if self.streaming:
+            self._write_streaming(path)
+        else:
+            self._write_frames(path)
+
+    def _write_frames(self, path: pathlib.Path):
+        with pd.ExcelWriter(path, engine=self.engine) as writer:
+            for sheet_name, frame in self.sheets.items():
+                frame.to_excel(writer,
+                               sheet_name=sheet_name,
+                               na_rep=self.na_rep,
+                               float_format=self.float_format,
+                               index=self.index,
+                               columns=self.columns)
+                self.tick(f'Exported sheet {sheet_name}')
+
+    def _write_streaming(self, path: pathlib.Path):
+        workbook = xlsxwriter.Workbook(str(path), {'constant_memory': True,
+                                                        'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+                                                        'nan_inf_to_errors': True})
+        header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+        try:
+            for sheet_name, frame in self.sheets.items():
+                self._stream_sheet(workbook, sheet_name, frame, header_format)
+        finally:
+            workbook.close()
+
+    def _stream_sheet(self, workbook: xlsxwriter.Workbook, sheet_name: str, frame: pd.DataFrame, header_format):
+        frame = self._select(frame)
+        header = [self._header_label(col) for col in frame.columns]
+        if self.index:
+            index_names = list(frame.index.names)
+            if len(index_names) == 1 and index_names[0] is None:
+                index_names = [dispatcher_consts.DF_INDEX_NAME]
+            header = ['' if name is None else self._header_label(name) for name in index_names] + header
+
+        part = 1
+        worksheet = self._add_worksheet(workbook, sheet_name, part, header, header_format)
+        row = 1
+        num_rows = len(frame)
+        if num_rows == 0:
+            self.tick(f'Exported sheet {sheet_name}')
+            return
+        for start in range(0, num_rows, self.chunk_size):
+            chunk = frame.iloc[start:start + self.chunk_size]
+            for values in self._chunk_rows(chunk):
+                if row >= dispatcher_consts.EXCEL_MAX_ROWS:
+                    # rows beyond the excel sheet limit continue on a numbered overflow sheet
+                    part += 1
+                    worksheet = self._add_worksheet(workbook, sheet_name, part, header, header_format)
+                    row = 1
+                worksheet.write_row(row, 0, values)
+                row += 1
+            self.tick(f'{sheet_name}: exported {min(start + self.chunk_size, num_rows):,} of {num_rows:,} rows')
+
+    @staticmethod
+    def _add_worksheet(workbook: xlsxwriter.Workbook, sheet_name: str, part: int, header: list, header_format):
+        if part > 1:
+            suffix = f' ({part})'
+            sheet_name = sheet_name[:dispatcher_consts.EXCEL_SHEET_NAME_LENGTH - len(suffix)] + suffix
+        worksheet = workbook.add_worksheet(sheet_name)
+        worksheet.write_row(0, 0, header, header_format)
+        return worksheet
+
+    @staticmethod
+    def _header_label(label):
+        if isinstance(label, tuple):
+            return '.'.join(str(part) for part in label)
+        if isinstance(label, (str, int, float)):
+            return label
+        return str(label)
+
+    def _chunk_rows(self, chunk: pd.DataFrame):
+        if self.float_format:
+            chunk = chunk.copy()
+            for pos, dtype in enumerate(chunk.dtypes):
+                if dtype.kind == 'f':
+                    chunk.isetitem(pos, chunk.iloc[:, pos].map(lambda v: float(self.float_format % v),
+                                                                na_action='ignore'))
+        values = chunk.astype(object).where(chunk.notna(), self.na_rep)
+        if not self.index:
+            yield from values.itertuples(index=False, name=None)
             return
-        self.action_status = consts.ActionStatus.COMPLETE
+        for key, row in zip(chunk.index, values.itertuples(index=False, name=None)):
+            if not isinstance(key, tuple):
+                key = (key,)
+            yield [self.na_rep if pd.isna(part) else part for part in key] + list(row)
@@ -1,6 +1,8 @@
 from PyQt6 import QtCore
 
 import logging
+import threading
+import time
 import typing
 import datetime
 import enum
@@ -9,20 +11,81 @@ from dispatcher import base_user
 from dispatcher import dispatcher_consts
 
 
+# the run each worker thread is on, as (action id, worker id, attempt). pool threads are reused, so the worker
+# replaces it every time it starts an action instead of anything being tied to the thread itself
+_current_run = threading.local()
+
+
+class ActionCancelled(Exception):
+    pass
+
+
+class CancellationToken:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cancelled: bool = False
+        self._claimed: bool = False
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def cancel(self) -> bool:
+        # returns True if a worker currently owns the action and will report the cancellation itself
+        with self._lock:
+            self._cancelled = True
+            return self._claimed
+
+    def claim(self) -> bool:
+        with self._lock:
+            if self._cancelled:
+                return False
+            self._claimed = True
+            return True
+
+    def release(self):
+        with self._lock:
+            self._claimed = False
+
+
+class ExternalPayload:
+
+    # a payload holding memory outside the action, e.g. a shared memory block; released with the action's payload
+    def release(self):
+        return
+
+
 class BaseAction(QtCore.QObject):
 
     logger = logging.getLogger('dispatcher.base_action')
     num_actions = 0
+    # per-class deadline in seconds for do_work; None disables the watchdog for the class
+    default_timeout: float = None
+    # per-class resource costs, e.g. {dispatcher_consts.RESOURCE_MEMORY_MB: 2000}
+    default_resource_costs: dict[str, float] = {}
+    # tiny actions that a worker may run back to back with the batchable actions queued behind them
+    batchable: bool = False
+    # parents that fold each child into an accumulator through reduce_child as soon as it is finalized
+    incremental_reduce: bool = False
+    # optional payload_store.PayloadStore; large payloads are tracked by it and spilled to disk over its budget
+    payload_store = None
+    # actions that a remote worker node may run; remote_args() has to rebuild an equivalent action there
+    remote_capable: bool = False
 
     # signals
     signal_action_started = QtCore.pyqtSignal()
     signal_action_tick = QtCore.pyqtSignal()
     signal_action_finished = QtCore.pyqtSignal()
+    # intermediate result of an incremental reduce, published by reduce_child
+    signal_action_partial_result = QtCore.pyqtSignal(object)
 
     class ErrorFlags(enum.IntFlag):
 
         NO_ERROR = 0
         UNSPECIFIED = 1
+        TIMEOUT = 32
+        DEPENDENCY_FAILED = 64
 
     def __init__(self, *args, **kwargs):
         super().__init__()
@@ -31,19 +94,44 @@ class BaseAction(QtCore.QObject):
             BaseAction.num_actions = 0
         else:
             BaseAction.num_actions += 1
+        # runs the dispatcher gave up on, as (action id, worker id, attempt); what they do afterwards is ignored,
+        # so a hung call that returns cannot change an action that was already failed or retried
+        self._abandoned_runs: set[tuple[int, int, int]] = set()
+        self._run: tuple[int, int, int] = None
         self.error_flags = BaseAction.ErrorFlags.NO_ERROR
-        self.payload: typing.Any = None
+        self._payload: typing.Any = None
         self.current_process: str = 'Idle...'
         self.tick_count: int = 0
         self.total_ticks: int = 0
         self.pct_complete: int = 0
         self.datetime_start: datetime.datetime = None
         self.datetime_end: datetime.datetime = None
-        self.action_status: dispatcher_consts.ActionStatus = dispatcher_consts.ActionStatus.IDLE
+        self._action_status: dispatcher_consts.ActionStatus = dispatcher_consts.ActionStatus.IDLE
         self.parent_action: BaseAction = kwargs.get('parent_action', None)
         self.child_actions: list[BaseAction] = []
+        # maintained by the dispatcher as children are finalized, so a parent never rescans its children
+        self.children_finalized: int = 0
+        self.children_status: dispatcher_consts.ActionStatus = dispatcher_consts.ActionStatus.IN_PROGRESS
+        self.accumulator: typing.Any = None
         self.follow_up_action: BaseAction = None
         self.series_limited: bool = False
+        # actions sharing a serialization key run one at a time in FIFO order; different keys run in parallel
+        self.serialization_key: typing.Hashable = kwargs.get('serialization_key', None)
+        self.resource_costs: dict[str, float] = dict(kwargs.get('resource_costs', type(self).default_resource_costs))
+        self.retry_policy = kwargs.get('retry_policy', None)
+        self.attempt: int = 1
+        self.cancel_token: CancellationToken = CancellationToken()
+        # set by the dispatcher once the action has reached its final state (after any retries)
+        self.finalized: bool = False
+        # set by the dispatcher once the action is past its prerequisites and on its way to a queue
+        self.dispatched: bool = False
+        # handle returned by ActionDispatcher.dispatch_action, resolved once the action is finalized
+        self.future = None
+        self._executing: bool = False
+        self.timeout: float = kwargs.get('timeout', type(self).default_timeout)
+        self.started_monotonic: float = None
+        # name of the remote worker node that ran the action, None when it ran in this process
+        self.remote_node: str = None
         # self.logger.debug(f'Action id \'{self.id}\' created. {self.description}')
 
     @property
@@ -54,6 +142,38 @@ class BaseAction(QtCore.QObject):
     def short_description(self):
         return 'BaseAction class'
 
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_token.cancelled
+
+    @property
+    def abandoned(self) -> bool:
+        # true inside a run that was given up on while it executed this action
+        return bool(self._abandoned_runs) and getattr(_current_run, 'run', None) in self._abandoned_runs
+
+    def begin_run(self, worker_id: int):
+        # called by a worker on its own thread before it runs the action
+        self._run = (self.id, worker_id, self.attempt)
+        _current_run.run = self._run
+
+    def abandon(self):
+        # called by the dispatcher when the running worker is quarantined
+        if self._run is not None:
+            self._abandoned_runs.add(self._run)
+        self._executing = False
+        # the old worker never lets go of its claim; a retry is claimed afresh by whichever worker takes it
+        self.cancel_token.release()
+
+    @property
+    def action_status(self) -> dispatcher_consts.ActionStatus:
+        return self._action_status
+
+    @action_status.setter
+    def action_status(self, value: dispatcher_consts.ActionStatus):
+        if self.abandoned:
+            return
+        self._action_status = value
+
     @property
     def duration_in_seconds(self) -> str:
         if self.datetime_start is None or self.datetime_end is None:
@@ -62,16 +182,26 @@ class BaseAction(QtCore.QObject):
             diff = self.datetime_end - self.datetime_start
             return f'{diff.total_seconds():.2f} sec'
 
+    def is_overdue(self, now: float) -> bool:
+        if not self.timeout or self.started_monotonic is None or not self._executing:
+            return False
+        return now - self.started_monotonic > self.timeout
+
     def setup(self):
+        self.started_monotonic = time.monotonic()
         self.datetime_start = datetime.datetime.now()
         self.logger.debug(f'Starting: {self.description}')
         self.action_status = dispatcher_consts.ActionStatus.IN_PROGRESS
         self.current_process = 'Pending'
+        self._executing = True
 
     def do_work(self):
         raise ValueError('BaseAction objects are not intended to be executed.')
 
     def tear_down(self):
+        if self.abandoned:
+            return
+        self._executing = False
         self.datetime_end = datetime.datetime.now()
         self.tick_count = self.total_ticks
         self.pct_complete = 100
@@ -81,6 +211,8 @@ class BaseAction(QtCore.QObject):
             self.current_process = 'Complete!'
         elif self.action_status == dispatcher_consts.ActionStatus.ERROR:
             self.current_process = 'Complete (Error exists)'
+        elif self.action_status == dispatcher_consts.ActionStatus.CANCELLED:
+            self.current_process = 'Cancelled'
         else:
             self.current_process = 'Failed!'
         self.signal_action_finished.emit()
@@ -90,7 +222,16 @@ class BaseAction(QtCore.QObject):
         self.do_work()
         self.tear_down()
 
+    def cancel_exit(self):
+        self.action_status = dispatcher_consts.ActionStatus.CANCELLED
+        self.tear_down()
+
     def tick(self, curr_process: str = '', msg_only: bool = False):
+        if self.abandoned:
+            # unwind the late call without touching the action
+            raise ActionCancelled(f'Action id {self.id} was abandoned.')
+        if self._executing and self.cancel_token.cancelled:
+            raise ActionCancelled(f'Action id {self.id} was cancelled.')
         if curr_process:
             self.current_process = curr_process
         if not msg_only:
@@ -104,6 +245,59 @@ class BaseAction(QtCore.QObject):
     def dispatch(self):
         return []
 
+    def prepare_retry(self):
+        self.attempt += 1
+        self.error_flags = BaseAction.ErrorFlags.NO_ERROR
+        self.payload = None
+        self.tick_count = 0
+        self.pct_complete = 0
+        self.datetime_end = None
+        self.action_status = dispatcher_consts.ActionStatus.PENDING
+
+    @property
+    def payload(self) -> typing.Any:
+        # a spilled payload is paged back in here
+        if self.payload_store is None:
+            return self._payload
+        return self.payload_store.get(self._payload)
+
+    @payload.setter
+    def payload(self, value: typing.Any):
+        if self.abandoned:
+            return
+        previous = self._payload
+        if self.payload_store is not None:
+            self.payload_store.discard(previous)
+            value = self.payload_store.put(value)
+        self._payload = value
+
+    @property
+    def stored_payload(self) -> typing.Any:
+        # the payload as held, without paging a spilled one back in
+        return self._payload
+
+    def release_payload(self):
+        # drop results once the parent has consumed them; subclasses release any other large state here
+        if isinstance(self._payload, ExternalPayload):
+            self._payload.release()
+        self._payload = None
+
+    def remote_args(self) -> tuple[tuple, dict]:
+        # positional and keyword arguments for the action's class, sent to the node that runs it
+        raise NotImplementedError(f'{type(self).__name__} does not implement remote_args().')
+
+    def throttle_delay(self) -> float:
+        # seconds the action would have to wait on an external limit before it can make progress
+        return 0.0
+
+    def reduce_child(self, child: 'BaseAction'):
+        # with incremental_reduce set, called on the dispatcher's thread for every finalized child whatever its
+        # status; the child's payload is released right after, so fold what is needed into self.accumulator
+        return
+
+    def publish_partial(self, value: typing.Any):
+        self.signal_action_partial_result.emit(value)
+
     def process_children(self):
         self.signal_action_finished.emit()
         return
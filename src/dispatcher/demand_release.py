@@ -0,0 +1,58 @@
+import logging
+
+from dispatcher import base_action
+from dispatcher import dispatcher_consts
+from dispatcher import host_limiter
+
+
+class DemandRelease:
+
+    logger = logging.getLogger('dispatcher.demand_release')
+
+    # decides how much of the demand queue may be dispatched right now. the queue itself is released in priority
+    # order; this keeps at most max_in_flight released actions unfinished and paces releases through a token
+    # bucket. a max_in_flight of None and a rate of 0 leave that limit off
+
+    def __init__(self, **kwargs):
+        self.max_in_flight: int = kwargs.get('max_in_flight', None)
+        self.bucket: host_limiter.TokenBucket = host_limiter.TokenBucket(kwargs.get('rate', 0.0),
+                                                                         kwargs.get('burst', None))
+        self.chunk_size: int = kwargs.get('chunk_size', dispatcher_consts.DEMAND_RELEASE_CHUNK)
+        self.paused: bool = False
+        # actions still to release from the last start; later additions wait for the next start
+        self.remaining: int = 0
+        self._in_flight: set[int] = set()
+
+    def configure(self, **kwargs):
+        if 'max_in_flight' in kwargs:
+            self.max_in_flight = kwargs['max_in_flight']
+        if 'rate' in kwargs or 'burst' in kwargs:
+            self.bucket = host_limiter.TokenBucket(kwargs.get('rate', self.bucket.rate),
+                                                   kwargs.get('burst', None))
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    def has_room(self) -> bool:
+        if self.paused or self.remaining <= 0:
+            return False
+        return not self.max_in_flight or len(self._in_flight) < self.max_in_flight
+
+    def delay(self) -> float:
+        # seconds until the rate limit allows the next release
+        return self.bucket.time_until_available()
+
+    def released(self, action: base_action.BaseAction):
+        self.bucket.try_take()
+        self._in_flight.add(action.id)
+
+    def finished(self, action: base_action.BaseAction) -> bool:
+        if action.id not in self._in_flight:
+            return False
+        self._in_flight.discard(action.id)
+        return True
+
+    def reset(self):
+        self.remaining = 0
+        self._in_flight.clear()
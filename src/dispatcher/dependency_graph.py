@@ -0,0 +1,96 @@
+import enum
+
+from dispatcher import base_action
+from dispatcher import dispatcher_consts
+
+
+class DependencyPolicy(enum.IntEnum):
+
+    REQUIRE_SUCCESS = 0     # prerequisite must complete without errors, otherwise the dependent fails
+    ALLOW_ERRORS = 1        # prerequisite may complete with errors; a failed prerequisite fails the dependent
+    ALWAYS = 2              # dependent runs whatever the outcome of the prerequisite
+    SKIP_ON_FAILURE = 3     # like ALLOW_ERRORS, but the dependent is cancelled instead of failed
+
+
+class DependencyGraph:
+
+    def __init__(self):
+        self._in_degree: dict[int, int] = {}
+        self._dependents: dict[int, list[tuple[base_action.BaseAction, DependencyPolicy]]] = {}
+        self._parked: dict[int, base_action.BaseAction] = {}
+
+    def add_dependency(self, prerequisite: base_action.BaseAction, dependent: base_action.BaseAction,
+                       policy: DependencyPolicy = DependencyPolicy.REQUIRE_SUCCESS):
+        if prerequisite is dependent:
+            raise ValueError('An action cannot depend on itself.')
+        if self._reaches(dependent, prerequisite):
+            raise ValueError(f'Dependency of action {dependent.id} on action {prerequisite.id} creates a cycle.')
+        self._dependents.setdefault(prerequisite.id, []).append((dependent, policy))
+        self._in_degree[dependent.id] = self._in_degree.get(dependent.id, 0) + 1
+
+    def _reaches(self, start: base_action.BaseAction, target: base_action.BaseAction) -> bool:
+        pending = [start]
+        seen: set[int] = set()
+        while pending:
+            node = pending.pop()
+            if node is target:
+                return True
+            if node.id in seen:
+                continue
+            seen.add(node.id)
+            pending.extend(dependent for dependent, _ in self._dependents.get(node.id, ()))
+        return False
+
+    def in_degree(self, action: base_action.BaseAction) -> int:
+        return self._in_degree.get(action.id, 0)
+
+    def is_blocked(self, action: base_action.BaseAction) -> bool:
+        return action.id in self._in_degree
+
+    def park(self, action: base_action.BaseAction):
+        self._parked[action.id] = action
+
+    def unpark(self, action: base_action.BaseAction) -> bool:
+        return self._parked.pop(action.id, None) is not None
+
+    def discard(self, action: base_action.BaseAction):
+        # drop a dependent that reached a final state before its prerequisites did
+        self._parked.pop(action.id, None)
+        self._in_degree.pop(action.id, None)
+
+    @staticmethod
+    def satisfies(status: dispatcher_consts.ActionStatus, policy: DependencyPolicy) -> bool:
+        if policy == DependencyPolicy.ALWAYS:
+            return True
+        if policy == DependencyPolicy.REQUIRE_SUCCESS:
+            return status == dispatcher_consts.ActionStatus.COMPLETE
+        return status in (dispatcher_consts.ActionStatus.COMPLETE, dispatcher_consts.ActionStatus.ERROR)
+
+    @staticmethod
+    def failure_status(policy: DependencyPolicy) -> dispatcher_consts.ActionStatus:
+        if policy == DependencyPolicy.SKIP_ON_FAILURE:
+            return dispatcher_consts.ActionStatus.CANCELLED
+        return dispatcher_consts.ActionStatus.FAILED
+
+    def on_finished(self, prerequisite: base_action.BaseAction) \
+            -> tuple[list[base_action.BaseAction], list[tuple[base_action.BaseAction, dispatcher_consts.ActionStatus]]]:
+        ready: list[base_action.BaseAction] = []
+        failed: list[tuple[base_action.BaseAction, dispatcher_consts.ActionStatus]] = []
+        for dependent, policy in self._dependents.pop(prerequisite.id, ()):
+            if dependent.id not in self._in_degree:
+                # already failed through another edge
+                continue
+            if not self.satisfies(prerequisite.action_status, policy):
+                self.discard(dependent)
+                failed.append((dependent, self.failure_status(policy)))
+                continue
+            self._in_degree[dependent.id] -= 1
+            if self._in_degree[dependent.id] == 0:
+                del self._in_degree[dependent.id]
+                ready.append(dependent)
+        return ready, failed
+
+    def clear(self):
+        self._in_degree.clear()
+        self._dependents.clear()
+        self._parked.clear()
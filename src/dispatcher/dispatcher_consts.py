@@ -20,6 +20,7 @@ class ActionStatus(enum.IntEnum):
     COMPLETE = 3
     ERROR = 4
     FAILED = 5
+    CANCELLED = 6
 
 
 ACTION_STATUS_COLORS = {
@@ -29,7 +30,8 @@ ACTION_STATUS_COLORS = {
     ActionStatus.IN_PROGRESS: QtGui.QColor('#fce83a'),
     ActionStatus.COMPLETE: QtGui.QColor('#56f000'),
     ActionStatus.ERROR: QtGui.QColor('#ffb302'),
-    ActionStatus.FAILED: QtGui.QColor('#ff3838')
+    ActionStatus.FAILED: QtGui.QColor('#ff3838'),
+    ActionStatus.CANCELLED: QtGui.QColor('#7c5295')
 }
 
 
@@ -52,10 +54,93 @@ STD_ACTION_PRIORITY = 2
 
 # worker constants
 WORKER_WAIT_TIME = 0.5
+WORKER_BATCH_SIZE = 1  # batchable actions a worker takes per queue operation; 1 disables batching
+WATCHDOG_INTERVAL = 1.0  # seconds
+WATCHDOG_SHUTDOWN_WAIT_MS = 5000
+HTTP_DEFAULT_TIMEOUT = (10.0, 120.0)  # (connect, read) seconds
+
+# host limiter constants
+HOST_RATE_LIMIT = 20.0  # requests per second, 0 disables the token bucket
+HOST_RATE_BURST = 20
+HOST_MIN_CONCURRENCY = 1
+HOST_MAX_CONCURRENCY = NUM_PARALLEL_THREADS
+HOST_LATENCY_THRESHOLD = 5.0  # seconds
+HOST_BACKOFF_RATIO = 0.5
+HOST_DECREASE_COOLDOWN = 1.0  # seconds
+LIMITER_EWMA_ALPHA = 0.2
+THROTTLE_MIN_DELAY = 0.05  # seconds
+
+# hedged request constants
+HEDGE_PERCENTILE = 95.0  # learned hedge delay, percentile of recent successful latencies
+HEDGE_LATENCY_WINDOW = 200  # samples
+HEDGE_MIN_SAMPLES = 20
+HEDGE_BUDGET_RATIO = 0.05  # hedge tokens earned per primary request
+HEDGE_BUDGET_BURST = 10.0
+HEDGE_MAX_THREADS = 2 * NUM_PARALLEL_THREADS
+
+# resource admission constants
+RESOURCE_MEMORY_MB = 'memory_mb'
+RESOURCE_CONNECTIONS = 'connections'
+RESOURCE_CPU = 'cpu'
+# held by a pipeline for all of its stage workers at once; its capacity is the number of parallel threads
+RESOURCE_PIPELINE_THREADS = 'pipeline_threads'
+ADMISSION_STARVATION_TIME = 30.0  # seconds
+
+# retry constants
+RETRY_MAX_ATTEMPTS = 3
+RETRY_BASE_DELAY = 1.0  # seconds
+RETRY_MAX_DELAY = 60.0  # seconds
+RETRY_MULTIPLIER = 2.0
+RETRY_JITTER = 0.25  # fraction of the computed delay
+
+# download constants
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # bytes
+DOWNLOAD_MAX_RESUMES = 5
+DOWNLOAD_PART_SUFFIX = '.part'
+DOWNLOAD_VALIDATOR_SUFFIX = '.part.validator'  # etag or last-modified of the body in the .part file
+DOWNLOAD_TICK_INTERVAL = 0.25  # seconds
+
+# action history constants
+HISTORY_ACTION_OVERHEAD = 2048  # estimated bytes per retained action besides its payload
+HISTORY_SIZE_DEPTH = 3  # container levels followed when estimating payload sizes
+
+# http cache constants
+HTTP_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# coordinator constants
+GUI_UPDATE_INTERVAL_MS = 50  # display updates from the coordinator thread are batched over this window
+
+# pipeline constants
+PIPELINE_BUFFER_SIZE = 1000  # items held between two stages before the upstream stage blocks
+PIPELINE_WAIT_INTERVAL = 0.1  # seconds between cancellation checks while blocked on a buffer
+PIPELINE_TICK_INTERVAL = 0.25  # seconds between stage progress updates
+
+# shared payload constants
+PAYLOAD_SHM_PREFIX = 'dispatcher_'  # names of the shared memory blocks holding cross-process payloads
+PAYLOAD_SPILL_THRESHOLD = 16 * 1024 * 1024  # bytes; smaller payloads are never tracked or spilled
+PAYLOAD_RESIDENT_BUDGET = 1024 * 1024 * 1024  # bytes of tracked payloads kept in memory before spilling
+
+# remote worker constants
+REMOTE_HEARTBEAT_INTERVAL = 1.0  # seconds between heartbeats from a worker node
+REMOTE_NODE_TIMEOUT = 5.0  # seconds without a message from a node before its leased actions are re-queued
+REMOTE_POLL_INTERVAL = 0.05  # seconds a node's connection is polled before looking for queued actions again
+REMOTE_TICK_INTERVAL = 0.25  # seconds between progress messages for one remote action
+REMOTE_AUTHKEY_ENV = 'DISPATCHER_AUTHKEY'
+
+# demand queue constants
+DEMAND_RELEASE_CHUNK = 100  # actions released in one pass before the event loop gets a turn
+
+# tracer constants
+TRACE_BUFFER_SIZE = 200000  # events kept by an action tracer before the oldest are dropped
 
 ACTION_STATUS_ROLE = QtCore.Qt.ItemDataRole.UserRole + 11
 ACTION_PROGRESS_ROLE = QtCore.Qt.ItemDataRole.UserRole + 12
 THREAD_STATUS_ROLE = QtCore.Qt.ItemDataRole.UserRole + 13
 ACTION_PENDING_ROLE = QtCore.Qt.ItemDataRole.UserRole + 14
 
-DF_INDEX_NAME = 'Index'
\ No newline at end of file
+DF_INDEX_NAME = 'Index'
+
+# export constants
+EXPORT_CHUNK_SIZE = 50000
+EXCEL_MAX_ROWS = 1048576
+EXCEL_SHEET_NAME_LENGTH = 31
\ No newline at end of file
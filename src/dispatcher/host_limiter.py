@@ -0,0 +1,259 @@
+import collections
+import logging
+import math
+import threading
+import time
+import urllib.parse
+
+from dispatcher import dispatcher_consts
+
+
+class TokenBucket:
+
+    def __init__(self, rate: float, burst: float = None):
+        # a rate of 0 (or less) disables the bucket entirely
+        self.rate: float = rate
+        self.burst: float = burst if burst else max(rate, 1.0)
+        self._tokens: float = self.burst
+        self._last_refill: float = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def tokens(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+    def _refill(self, now: float):
+        if self.rate <= 0:
+            self._tokens = self.burst
+            return
+        elapsed = now - self._last_refill
+        if elapsed > 0:
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._last_refill = now
+
+    def try_take(self, count: float = 1.0) -> bool:
+        with self._lock:
+            if self.rate <= 0:
+                return True
+            self._refill(time.monotonic())
+            if self._tokens >= count:
+                self._tokens -= count
+                return True
+            return False
+
+    def time_until_available(self, count: float = 1.0) -> float:
+        with self._lock:
+            if self.rate <= 0:
+                return 0.0
+            self._refill(time.monotonic())
+            if self._tokens >= count:
+                return 0.0
+            return (count - self._tokens) / self.rate
+
+
+class AdaptiveConcurrencyLimit:
+
+    def __init__(self, initial_limit: float, min_limit: float, max_limit: float, latency_threshold: float,
+                 backoff_ratio: float = dispatcher_consts.HOST_BACKOFF_RATIO,
+                 decrease_cooldown: float = dispatcher_consts.HOST_DECREASE_COOLDOWN):
+        self.min_limit: float = min_limit
+        self.max_limit: float = max_limit
+        self.limit: float = max(min_limit, min(initial_limit, max_limit))
+        self.latency_threshold: float = latency_threshold
+        self.backoff_ratio: float = backoff_ratio
+        self.decrease_cooldown: float = decrease_cooldown
+        self.in_flight: int = 0
+        self.latency_ewma: float = 0.0
+        self.error_rate_ewma: float = 0.0
+        self._last_decrease: float = 0.0
+
+    def has_capacity(self) -> bool:
+        return self.in_flight < int(self.limit)
+
+    def on_sample(self, latency: float, success: bool):
+        alpha = dispatcher_consts.LIMITER_EWMA_ALPHA
+        if self.latency_ewma == 0.0:
+            self.latency_ewma = latency
+        else:
+            self.latency_ewma += alpha * (latency - self.latency_ewma)
+        self.error_rate_ewma += alpha * ((0.0 if success else 1.0) - self.error_rate_ewma)
+
+        now = time.monotonic()
+        if not success or latency > self.latency_threshold:
+            # multiplicative decrease, at most once per cooldown so a burst of failures does not collapse the limit
+            if now - self._last_decrease >= self.decrease_cooldown:
+                self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+                self._last_decrease = now
+        else:
+            # additive increase of roughly one slot per window of successful requests
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+
+class HostLimiter:
+
+    logger = logging.getLogger('dispatcher.host_limiter')
+
+    def __init__(self, host: str, **kwargs):
+        self.host: str = host
+        self.bucket = TokenBucket(kwargs.get('rate', dispatcher_consts.HOST_RATE_LIMIT),
+                                  kwargs.get('burst', dispatcher_consts.HOST_RATE_BURST))
+        max_concurrency = kwargs.get('max_concurrency', dispatcher_consts.HOST_MAX_CONCURRENCY)
+        self.concurrency = AdaptiveConcurrencyLimit(
+            initial_limit=kwargs.get('initial_concurrency', max_concurrency),
+            min_limit=kwargs.get('min_concurrency', dispatcher_consts.HOST_MIN_CONCURRENCY),
+            max_limit=max_concurrency,
+            latency_threshold=kwargs.get('latency_threshold', dispatcher_consts.HOST_LATENCY_THRESHOLD))
+        self._cond = threading.Condition()
+        self.total_requests: int = 0
+        self.total_errors: int = 0
+        self.total_throttled: int = 0
+        self.waiting: int = 0
+        # recent successful latencies, used to learn the delay before a request is hedged
+        self._latencies: collections.deque[float] = collections.deque(
+            maxlen=kwargs.get('latency_window', dispatcher_consts.HEDGE_LATENCY_WINDOW))
+        # every primary request earns a fraction of a hedge, which caps hedges at that fraction of the load
+        self.hedge_budget_ratio: float = kwargs.get('hedge_budget_ratio', dispatcher_consts.HEDGE_BUDGET_RATIO)
+        self.hedge_budget_burst: float = kwargs.get('hedge_budget_burst', dispatcher_consts.HEDGE_BUDGET_BURST)
+        self._hedge_tokens: float = 0.0
+        self.total_hedges: int = 0
+        self.total_hedge_wins: int = 0
+        self.total_hedges_denied: int = 0
+
+    def _try_acquire_locked(self, hedge: bool = False) -> bool:
+        if self.concurrency.has_capacity() and self.bucket.try_take():
+            self.concurrency.in_flight += 1
+            self.total_requests += 1
+            if not hedge:
+                self._hedge_tokens = min(self.hedge_budget_burst, self._hedge_tokens + self.hedge_budget_ratio)
+            return True
+        return False
+
+    def try_acquire(self) -> bool:
+        with self._cond:
+            return self._try_acquire_locked()
+
+    def acquire(self, timeout: float = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            if self._try_acquire_locked():
+                return True
+            self.total_throttled += 1
+            self.waiting += 1
+            try:
+                while True:
+                    if self.concurrency.has_capacity():
+                        wait = self.bucket.time_until_available()
+                    else:
+                        # no slot available; a release will wake us up
+                        wait = None
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            return False
+                        wait = remaining if wait is None else min(wait, remaining)
+                    self._cond.wait(wait)
+                    if self._try_acquire_locked():
+                        return True
+            finally:
+                self.waiting -= 1
+
+    def release(self, latency: float, success: bool):
+        with self._cond:
+            self.concurrency.in_flight -= 1
+            if not success:
+                self.total_errors += 1
+            else:
+                self._latencies.append(latency)
+            self.concurrency.on_sample(latency, success)
+            self._cond.notify_all()
+
+    def try_hedge(self) -> bool:
+        # never waits: a hedge is only worth sending if the budget and a slot are available right now
+        with self._cond:
+            if self._hedge_tokens < 1.0 or not self._try_acquire_locked(hedge=True):
+                self.total_hedges_denied += 1
+                return False
+            self._hedge_tokens -= 1.0
+            self.total_hedges += 1
+            return True
+
+    def record_hedge_win(self):
+        with self._cond:
+            self.total_hedge_wins += 1
+
+    def latency_percentile(self, percentile: float) -> float | None:
+        with self._cond:
+            if len(self._latencies) < dispatcher_consts.HEDGE_MIN_SAMPLES:
+                return None
+            samples = sorted(self._latencies)
+        rank = max(1, math.ceil(percentile / 100.0 * len(samples)))
+        return samples[min(rank, len(samples)) - 1]
+
+    def delay_hint(self) -> float:
+        # estimate of how long a new request would have to wait for a slot; 0 if it could start now
+        with self._cond:
+            if not self.concurrency.has_capacity():
+                return dispatcher_consts.THROTTLE_MIN_DELAY
+            wait = self.bucket.time_until_available()
+            if wait <= 0:
+                return 0.0
+            return max(wait, dispatcher_consts.THROTTLE_MIN_DELAY)
+
+    def metrics(self) -> dict[str, float]:
+        with self._cond:
+            return {
+                'rate': self.bucket.rate,
+                'tokens': self.bucket.tokens,
+                'concurrency_limit': self.concurrency.limit,
+                'in_flight': self.concurrency.in_flight,
+                'waiting': self.waiting,
+                'latency_ewma': self.concurrency.latency_ewma,
+                'error_rate_ewma': self.concurrency.error_rate_ewma,
+                'total_requests': self.total_requests,
+                'total_errors': self.total_errors,
+                'total_throttled': self.total_throttled,
+                'hedge_tokens': self._hedge_tokens,
+                'total_hedges': self.total_hedges,
+                'total_hedge_wins': self.total_hedge_wins,
+                'total_hedges_denied': self.total_hedges_denied,
+            }
+
+
+class HostLimiterRegistry:
+
+    _limiters: dict[str, HostLimiter] = {}
+    _host_settings: dict[str, dict] = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def host_key(base_url: str) -> str:
+        parts = urllib.parse.urlsplit(base_url)
+        if parts.netloc:
+            return f'{parts.scheme}://{parts.netloc}'.lower()
+        return base_url.lower()
+
+    @classmethod
+    def configure_host(cls, base_url: str, **kwargs):
+        key = cls.host_key(base_url)
+        with cls._lock:
+            cls._host_settings[key] = kwargs
+            # drop any existing limiter so the new settings take effect on the next request
+            cls._limiters.pop(key, None)
+
+    @classmethod
+    def get_limiter(cls, base_url: str) -> HostLimiter:
+        key = cls.host_key(base_url)
+        with cls._lock:
+            limiter = cls._limiters.get(key, None)
+            if limiter is None:
+                limiter = HostLimiter(key, **cls._host_settings.get(key, {}))
+                cls._limiters[key] = limiter
+            return limiter
+
+    @classmethod
+    def all_metrics(cls) -> dict[str, dict[str, float]]:
+        with cls._lock:
+            limiters = list(cls._limiters.values())
+        return {limiter.host: limiter.metrics() for limiter in limiters}
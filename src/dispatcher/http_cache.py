@@ -0,0 +1,344 @@
+import requests
+
+import collections
+import email.utils
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import tempfile
+import threading
+import time
+import typing
+
+from dispatcher import base_user
+from dispatcher import dispatcher_consts
+
+
+class CacheEntry:
+
+    def __init__(self, key: str, namespace: str, meta: dict[str, typing.Any]):
+        self.key: str = key
+        self.namespace: str = namespace
+        self.url: str = meta['url']
+        self.headers: dict[str, str] = meta['headers']
+        self.stored_at: float = meta['stored_at']
+        self.vary: dict[str, str] = meta.get('vary', {})
+        self.size: int = meta.get('size', 0)
+
+    def to_meta(self) -> dict[str, typing.Any]:
+        return {'url': self.url, 'headers': self.headers, 'stored_at': self.stored_at, 'vary': self.vary,
+                'size': self.size}
+
+    @property
+    def etag(self) -> str:
+        return _get_header(self.headers, 'ETag')
+
+    @property
+    def last_modified(self) -> str:
+        return _get_header(self.headers, 'Last-Modified')
+
+    def freshness_lifetime(self) -> float:
+        directives = parse_cache_control(_get_header(self.headers, 'Cache-Control'))
+        if 'no-cache' in directives:
+            return 0.0
+        if 'max-age' in directives:
+            try:
+                return float(directives['max-age'])
+            except (TypeError, ValueError):
+                return 0.0
+        expires = _get_header(self.headers, 'Expires')
+        if expires:
+            try:
+                return email.utils.parsedate_to_datetime(expires).timestamp() - self.stored_at
+            except (TypeError, ValueError):
+                return 0.0
+        # no explicit lifetime: always revalidate rather than guess one from Last-Modified
+        return 0.0
+
+    def is_fresh(self, now: float) -> bool:
+        try:
+            age = float(_get_header(self.headers, 'Age') or 0)
+        except ValueError:
+            age = 0.0
+        return now - self.stored_at + age < self.freshness_lifetime()
+
+    def conditional_headers(self) -> dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+def _get_header(headers: dict[str, str], name: str) -> str:
+    name = name.lower()
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return ''
+
+
+def parse_cache_control(value: str) -> dict[str, str]:
+    directives = {}
+    for part in value.split(','):
+        name, _, arg = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = arg.strip('"') if arg else None
+    return directives
+
+
+class HttpCache:
+
+    logger = logging.getLogger('dispatcher.http_cache')
+
+    ANONYMOUS_NAMESPACE = 'anonymous'
+
+    def __init__(self, cache_dir: str | pathlib.Path, **kwargs):
+        self.cache_dir: pathlib.Path = pathlib.Path(cache_dir)
+        self.max_bytes: int = kwargs.get('max_bytes', dispatcher_consts.HTTP_CACHE_MAX_BYTES)
+        self._lock = threading.Lock()
+        # key -> (namespace, size) in least recently used order
+        self._lru: collections.OrderedDict[str, tuple[str, int]] = collections.OrderedDict()
+        self.total_bytes: int = 0
+        self.hits: int = 0
+        self.revalidated: int = 0
+        self.misses: int = 0
+        self.stores: int = 0
+        self.evictions: int = 0
+        self._load_index()
+
+    @staticmethod
+    def user_namespace(usr: base_user.BaseUser) -> str:
+        # entries are kept apart per user so authenticated responses are never served to another user. the
+        # username is taken as given: a server may well tell apart names that differ only by case
+        if usr is None or not usr.username:
+            return HttpCache.ANONYMOUS_NAMESPACE
+        return hashlib.sha256(usr.username.encode()).hexdigest()[:32]
+
+    @staticmethod
+    def _entry_key(namespace: str, url: str) -> str:
+        return hashlib.sha256(f'{namespace}\n{url}'.encode()).hexdigest()
+
+    def _meta_path(self, namespace: str, key: str) -> pathlib.Path:
+        return self.cache_dir / namespace / f'{key}.json'
+
+    def _body_path(self, namespace: str, key: str) -> pathlib.Path:
+        return self.cache_dir / namespace / f'{key}.body'
+
+    def _load_index(self):
+        if not self.cache_dir.is_dir():
+            return
+        found = []
+        for body_path in self.cache_dir.glob('*/*.body'):
+            meta_path = body_path.with_suffix('.json')
+            if not meta_path.is_file():
+                body_path.unlink(missing_ok=True)
+                continue
+            stat = body_path.stat()
+            # the body's mtime is bumped on every hit, so it doubles as the last access time
+            found.append((stat.st_mtime, body_path.stem, body_path.parent.name, stat.st_size))
+        for _, key, namespace, size in sorted(found):
+            self._lru[key] = (namespace, size)
+            self.total_bytes += size
+        self._evict()
+
+    def get(self, namespace: str, url: str, headers: dict,
+            send: typing.Callable[[dict], requests.Response | None]) -> requests.Response | None:
+        request_directives = parse_cache_control(_get_header(headers, 'Cache-Control'))
+        if _get_header(headers, 'Range') or 'no-store' in request_directives:
+            return send(headers)
+        if namespace == HttpCache.ANONYMOUS_NAMESPACE and _get_header(headers, 'Authorization'):
+            # the anonymous namespace is shared; a request carrying credentials is never answered from it
+            return send(headers)
+        entry = self._lookup(namespace, url, headers)
+        if entry is not None and 'no-cache' not in request_directives and entry.is_fresh(time.time()):
+            response = self._serve(entry, headers)
+            if response is not None:
+                with self._lock:
+                    self.hits += 1
+                return response
+            entry = None
+
+        request_headers = dict(headers)
+        if entry is not None:
+            request_headers.update(entry.conditional_headers())
+        r = send(request_headers)
+        if r is None:
+            return None
+        if r.status_code == 304 and entry is not None:
+            self._refresh(entry, r)
+            response = self._serve(entry, headers, r)
+            if response is not None:
+                with self._lock:
+                    self.revalidated += 1
+                return response
+            # the cached body vanished underneath us; fetch it again without validators
+            r = send(headers)
+            if r is None:
+                return None
+        with self._lock:
+            self.misses += 1
+        if r.status_code == 200:
+            self._store(namespace, url, headers, r)
+        return r
+
+    def _lookup(self, namespace: str, url: str, headers: dict) -> CacheEntry | None:
+        key = self._entry_key(namespace, url)
+        with self._lock:
+            if key not in self._lru:
+                return None
+        try:
+            with open(self._meta_path(namespace, key), 'r', encoding='utf-8') as f:
+                entry = CacheEntry(key, namespace, json.load(f))
+        except (OSError, ValueError, KeyError):
+            self._remove(key)
+            return None
+        for name, value in entry.vary.items():
+            if _get_header(headers, name) != value:
+                return None
+        return entry
+
+    def _serve(self, entry: CacheEntry, headers: dict, revalidation: requests.Response = None) \
+            -> requests.Response | None:
+        body_path = self._body_path(entry.namespace, entry.key)
+        try:
+            content = body_path.read_bytes()
+            os.utime(body_path)
+        except OSError:
+            self._remove(entry.key)
+            return None
+        with self._lock:
+            if entry.key in self._lru:
+                self._lru.move_to_end(entry.key)
+        r = requests.Response()
+        r.status_code = 200
+        r.reason = 'OK'
+        r._content = content
+        r.headers = requests.structures.CaseInsensitiveDict(entry.headers)
+        r.encoding = requests.utils.get_encoding_from_headers(r.headers)
+        r.url = entry.url
+        if revalidation is not None:
+            r.request = revalidation.request
+            r.elapsed = revalidation.elapsed
+        else:
+            r.request = requests.Request('GET', entry.url, headers=headers).prepare()
+        r.from_cache = True
+        return r
+
+    def _refresh(self, entry: CacheEntry, r: requests.Response):
+        # a 304 carries updated freshness headers for the stored response
+        for name in ('Cache-Control', 'Expires', 'ETag', 'Last-Modified', 'Date', 'Age'):
+            value = r.headers.get(name, None)
+            if value is None:
+                continue
+            for existing in [k for k in entry.headers if k.lower() == name.lower()]:
+                del entry.headers[existing]
+            entry.headers[name] = value
+        entry.stored_at = time.time()
+        try:
+            self._write_atomic(self._meta_path(entry.namespace, entry.key), json.dumps(entry.to_meta()).encode())
+        except OSError as err:
+            self.logger.warning(f'Unable to update cache entry for {entry.url}: {err}')
+
+    def _store(self, namespace: str, url: str, headers: dict, r: requests.Response):
+        directives = parse_cache_control(r.headers.get('Cache-Control', ''))
+        if 'no-store' in directives:
+            return
+        if 'private' in directives and namespace == HttpCache.ANONYMOUS_NAMESPACE:
+            # only a namespace belonging to one user may keep a private response
+            return
+        vary_names = [name.strip() for name in r.headers.get('Vary', '').split(',') if name.strip()]
+        if '*' in vary_names:
+            return
+        if not (r.headers.get('ETag') or r.headers.get('Last-Modified') or 'max-age' in directives
+                or r.headers.get('Expires')):
+            # nothing to revalidate against and no lifetime; storing it would never produce a hit
+            return
+        content = r.content
+        if len(content) > self.max_bytes:
+            return
+        key = self._entry_key(namespace, url)
+        entry = CacheEntry(key, namespace, {
+            'url': url,
+            'headers': dict(r.headers),
+            'stored_at': time.time(),
+            'vary': {name: _get_header(headers, name) for name in vary_names},
+            'size': len(content),
+        })
+        try:
+            (self.cache_dir / namespace).mkdir(parents=True, exist_ok=True)
+            self._write_atomic(self._body_path(namespace, key), content)
+            self._write_atomic(self._meta_path(namespace, key), json.dumps(entry.to_meta()).encode())
+        except OSError as err:
+            self.logger.warning(f'Unable to store cache entry for {url}: {err}')
+            return
+        with self._lock:
+            previous = self._lru.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= previous[1]
+            self._lru[key] = (namespace, len(content))
+            self.total_bytes += len(content)
+            self.stores += 1
+            evicted = self._pop_over_limit()
+        self._delete_files(evicted)
+
+    @staticmethod
+    def _write_atomic(path: pathlib.Path, data: bytes):
+        fd, tmp_name = tempfile.mkstemp(prefix=f'.{path.name}.', suffix='.tmp', dir=path.parent)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_name, path)
+        except BaseException:
+            pathlib.Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+    def _pop_over_limit(self) -> list[tuple[str, str]]:
+        evicted = []
+        while self.total_bytes > self.max_bytes and self._lru:
+            key, (namespace, size) = self._lru.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+            evicted.append((namespace, key))
+        return evicted
+
+    def _evict(self):
+        with self._lock:
+            evicted = self._pop_over_limit()
+        self._delete_files(evicted)
+
+    def _delete_files(self, entries: list[tuple[str, str]]):
+        for namespace, key in entries:
+            self._body_path(namespace, key).unlink(missing_ok=True)
+            self._meta_path(namespace, key).unlink(missing_ok=True)
+
+    def _remove(self, key: str):
+        with self._lock:
+            item = self._lru.pop(key, None)
+            if item is None:
+                return
+            self.total_bytes -= item[1]
+        self._delete_files([(item[0], key)])
+
+    def clear(self, namespace: str = None):
+        with self._lock:
+            removed = [(ns, key) for key, (ns, _) in self._lru.items() if namespace is None or ns == namespace]
+            for _, key in removed:
+                self.total_bytes -= self._lru.pop(key)[1]
+        self._delete_files(removed)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                'entries': len(self._lru),
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'revalidated': self.revalidated,
+                'misses': self.misses,
+                'stores': self.stores,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,149 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc
+import numpy as np
+
+import logging
+import mmap
+import os
+import sys
+import threading
+import uuid
+from multiprocessing import resource_tracker
+from multiprocessing import shared_memory
+
+if os.name != 'nt':
+    import _posixshmem
+
+from dispatcher import base_action
+from dispatcher import dispatcher_consts
+
+
+logger = logging.getLogger('dispatcher.payload_ref')
+
+# blocks this process is responsible for unlinking, with the number of references held on each
+_owned_lock = threading.Lock()
+_owned: dict[str, shared_memory.SharedMemory] = {}
+_owned_counts: dict[str, int] = {}
+
+
+def _map_block(name: str, size: int) -> mmap.mmap:
+    # readers map the block themselves: SharedMemory registers every attachment with the resource tracker
+    # (before 3.13), which unlinks what it knows about when it exits and is shared with child processes
+    if os.name == 'nt':
+        return mmap.mmap(-1, size, tagname=name)
+    fd = _posixshmem.shm_open(f'/{name}', os.O_RDONLY, mode=0o600)
+    try:
+        return mmap.mmap(fd, size, prot=mmap.PROT_READ)
+    finally:
+        os.close(fd)
+
+
+class _Mapping:
+
+    # one read-only mapping of a block; arrow buffers keep it as their base, so the block stays mapped for as
+    # long as any frame column built on it is alive
+    def __init__(self, name: str, size: int):
+        self.name: str = name
+        self.map: mmap.mmap = _map_block(name, max(1, size))
+        self.view: np.ndarray = np.frombuffer(self.map, dtype=np.uint8)
+
+    def buffer(self, size: int) -> pa.Buffer:
+        return pa.foreign_buffer(self.view.ctypes.data, size, base=self)
+
+    def __del__(self):
+        # the view is an export of the map; it has to go before the map can close
+        self.view = None
+        try:
+            self.map.close()
+        except (OSError, BufferError) as err:
+            logger.warning(f'Unable to close shared payload {self.name}: {err}')
+
+
+class PayloadReference(base_action.ExternalPayload):
+
+    # a picklable handle to a dataframe held in shared memory as an arrow ipc stream. only the handle crosses
+    # process boundaries; readers map the block, so numeric columns without nulls are not copied.
+    # the process that created the block (or adopted it) owns it and unlinks it once its references are
+    # released; every other process only maps it
+
+    def __init__(self, name: str, size: int, num_rows: int):
+        self.name: str = name
+        self.size: int = size
+        self.num_rows: int = num_rows
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame) -> 'PayloadReference':
+        table = pa.Table.from_pandas(frame, preserve_index=True)
+        sink = pa.MockOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        size = sink.size()
+        name = f'{dispatcher_consts.PAYLOAD_SHM_PREFIX}{os.getpid()}_{uuid.uuid4().hex[:12]}'
+        block = shared_memory.SharedMemory(name=name, create=True, size=max(1, size))
+        target = np.frombuffer(block.buf, dtype=np.uint8)
+        with pa.ipc.new_stream(pa.FixedSizeBufferWriter(pa.py_buffer(target)), table.schema) as writer:
+            writer.write_table(table)
+        del target
+        with _owned_lock:
+            _owned[name] = block
+            _owned_counts[name] = 1
+        return cls(name, size, len(frame))
+
+    @property
+    def owned(self) -> bool:
+        with _owned_lock:
+            return self.name in _owned
+
+    def to_frame(self) -> pd.DataFrame:
+        mapping = _Mapping(self.name, self.size)
+        table = pa.ipc.open_stream(mapping.buffer(self.size)).read_all()
+        # one block per column keeps the numeric columns as views on the mapped arrow buffers
+        return table.to_pandas(split_blocks=True)
+
+    def acquire(self) -> 'PayloadReference':
+        # another holder in the owning process, e.g. a second action sharing the payload
+        with _owned_lock:
+            if self.name not in _owned:
+                raise ValueError(f'Shared payload {self.name} is not owned by this process.')
+            _owned_counts[self.name] += 1
+        return self
+
+    def release(self):
+        with _owned_lock:
+            if self.name not in _owned:
+                return
+            _owned_counts[self.name] -= 1
+            if _owned_counts[self.name] > 0:
+                return
+            block = _owned.pop(self.name)
+            del _owned_counts[self.name]
+        # frames already mapped keep their pages; the name is gone, so nothing new can attach
+        block.unlink()
+        block.close()
+
+    def adopt(self):
+        # take over ownership of a block the creating process has disowned
+        block = shared_memory.SharedMemory(name=self.name)
+        with _owned_lock:
+            if self.name in _owned:
+                block.close()
+                _owned_counts[self.name] += 1
+                return
+            _owned[self.name] = block
+            _owned_counts[self.name] = 1
+
+    def disown(self):
+        # close this side without unlinking, before the reference is sent to the process that adopts it; the
+        # other order would let a shared resource tracker forget the adopter's registration
+        with _owned_lock:
+            block = _owned.pop(self.name, None)
+            _owned_counts.pop(self.name, None)
+        if block is None:
+            return
+        if sys.version_info < (3, 13):
+            resource_tracker.unregister(block._name, 'shared_memory')
+        block.close()
+
+    def __repr__(self):
+        return f'<PayloadReference {self.name} rows={self.num_rows} bytes={self.size}>'
@@ -0,0 +1,214 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc
+
+import collections
+import itertools
+import logging
+import pathlib
+import pickle
+import shutil
+import tempfile
+import threading
+import typing
+
+from dispatcher import action_history
+from dispatcher import base_action
+from dispatcher import dispatcher_consts
+
+
+class StoredPayload(base_action.ExternalPayload):
+
+    # what an action holds instead of a large payload once a store is installed. the value is either resident
+    # or written to a file; a spilled numpy array or arrow table comes back memory mapped, a dataframe is read
+    # back into a writable copy and anything else is unpickled, and those two count against the budget again
+
+    _ids = itertools.count(1)
+
+    def __init__(self, store: 'PayloadStore', value: typing.Any, size: int):
+        self.store: PayloadStore = store
+        self.id: int = next(StoredPayload._ids)
+        self.size: int = size
+        self._lock = threading.Lock()
+        self._value: typing.Any = value
+        self._mapped: typing.Any = None
+        self.path: pathlib.Path = None
+        self.released: bool = False
+
+    @property
+    def resident(self) -> bool:
+        return self._value is not None
+
+    @property
+    def nbytes(self) -> int:
+        # what the entry keeps in memory, as counted by the store and the action history
+        return self.size if self.resident else 0
+
+    def get(self) -> typing.Any:
+        with self._lock:
+            if self._mapped is not None or self.released:
+                return self._mapped
+            if self._value is None:
+                value, mapped = self._load()
+                if mapped:
+                    # pages come in from the file as they are read and are not counted against the budget
+                    self._mapped = value
+                    return value
+                self._value = value
+                # the caller may change the value, so the file is out of date from here on; the next spill
+                # writes it again
+                self._remove_file()
+            value = self._value
+        self.store._touch(self)
+        return value
+
+    def spill(self):
+        with self._lock:
+            if self._value is None:
+                return
+            self.path = self.store._write(self.id, self._value)
+            self._value = None
+
+    def release(self):
+        with self._lock:
+            if self.released:
+                return
+            self.released = True
+            self._value = None
+            self._mapped = None
+            self._remove_file()
+        self.store._forget(self)
+
+    def _remove_file(self):
+        path, self.path = self.path, None
+        if path is not None:
+            try:
+                path.unlink(missing_ok=True)
+            except OSError as err:
+                # windows keeps a mapped file open until the last view on it is gone
+                self.store.logger.warning(f'Unable to remove spilled payload {path}: {err}')
+
+    def _load(self) -> tuple[typing.Any, bool]:
+        if self.path.suffix == '.npy':
+            # copy on write: the caller may modify the array without touching the file
+            return np.load(self.path, mmap_mode='c'), True
+        if self.path.suffix == '.arrow':
+            with pa.memory_map(str(self.path)) as source:
+                return pa.ipc.open_file(source).read_all(), True
+        if self.path.suffix == '.frame':
+            # columns mapped from the file would be read-only; the caller may edit the frame in place
+            with pa.OSFile(str(self.path)) as source:
+                return pa.ipc.open_file(source).read_all().to_pandas(), False
+        with open(self.path, 'rb') as f:
+            return pickle.load(f), False
+
+    def __repr__(self):
+        state = 'resident' if self.resident else f'spilled to {self.path}'
+        return f'<StoredPayload {self.id} {self.size:,} bytes {state}>'
+
+
+class PayloadStore:
+
+    logger = logging.getLogger('dispatcher.payload_store')
+
+    # install one store for every action with base_action.BaseAction.payload_store = PayloadStore(...), before
+    # any payload is set. payloads below the threshold stay plain attributes; larger ones are tracked, and the
+    # least recently used are written out whenever the tracked payloads exceed the budget
+
+    def __init__(self, **kwargs):
+        self.budget_bytes: int = kwargs.get('budget_bytes', dispatcher_consts.PAYLOAD_RESIDENT_BUDGET)
+        self.spill_threshold: int = kwargs.get('spill_threshold', dispatcher_consts.PAYLOAD_SPILL_THRESHOLD)
+        spill_dir = kwargs.get('spill_dir', None)
+        self._spill_dir: pathlib.Path = pathlib.Path(spill_dir) if spill_dir is not None else None
+        self._owns_spill_dir: bool = spill_dir is None
+        self._lock = threading.Lock()
+        # resident entries, least recently used first
+        self._resident: collections.OrderedDict[int, StoredPayload] = collections.OrderedDict()
+        self.resident_bytes: int = 0
+        self.spilled_count: int = 0
+
+    @property
+    def spill_dir(self) -> pathlib.Path:
+        with self._lock:
+            if self._spill_dir is None:
+                self._spill_dir = pathlib.Path(tempfile.mkdtemp(prefix='dispatcher_payloads_'))
+            return pathlib.Path(self._spill_dir)
+
+    def put(self, value: typing.Any) -> typing.Any:
+        if value is None or isinstance(value, base_action.ExternalPayload):
+            return value
+        size = action_history.estimate_payload_size(value)
+        if size < self.spill_threshold:
+            return value
+        entry = StoredPayload(self, value, size)
+        self._touch(entry)
+        return entry
+
+    def get(self, value: typing.Any) -> typing.Any:
+        if isinstance(value, StoredPayload):
+            return value.get()
+        return value
+
+    def discard(self, value: typing.Any):
+        # a payload being replaced; only entries created by a store are released here
+        if isinstance(value, StoredPayload):
+            value.release()
+
+    def _touch(self, entry: StoredPayload):
+        with self._lock:
+            if entry.id in self._resident:
+                self._resident.move_to_end(entry.id)
+                return
+            if entry.released or not entry.resident:
+                return
+            self._resident[entry.id] = entry
+            self.resident_bytes += entry.size
+            victims = []
+            while self.resident_bytes > self.budget_bytes and len(self._resident) > 1:
+                _, victim = self._resident.popitem(last=False)
+                self.resident_bytes -= victim.size
+                victims.append(victim)
+        # files are written outside the store's lock so other threads can keep reading their payloads
+        for victim in victims:
+            try:
+                victim.spill()
+                with self._lock:
+                    self.spilled_count += 1
+            except Exception as err:
+                self.logger.exception(f'Unable to spill payload {victim.id}: {err}')
+
+    def _forget(self, entry: StoredPayload):
+        with self._lock:
+            if self._resident.pop(entry.id, None) is not None:
+                self.resident_bytes -= entry.size
+
+    def _write(self, entry_id: int, value: typing.Any) -> pathlib.Path:
+        if isinstance(value, np.ndarray) and value.dtype != object:
+            path = self.spill_dir / f'{entry_id}.npy'
+            np.save(path, value, allow_pickle=False)
+            return path
+        if isinstance(value, (pa.Table, pd.DataFrame)):
+            suffix = '.frame' if isinstance(value, pd.DataFrame) else '.arrow'
+            path = self.spill_dir / f'{entry_id}{suffix}'
+            try:
+                table = pa.Table.from_pandas(value, preserve_index=True) if isinstance(value, pd.DataFrame) else value
+                with pa.OSFile(str(path), 'wb') as sink:
+                    with pa.ipc.new_file(sink, table.schema) as writer:
+                        writer.write_table(table)
+                return path
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+                # columns arrow cannot represent fall back to pickle
+                path.unlink(missing_ok=True)
+        path = self.spill_dir / f'{entry_id}.pkl'
+        with open(path, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return path
+
+    def close(self):
+        with self._lock:
+            self._resident.clear()
+            self.resident_bytes = 0
+            spill_dir, owned = self._spill_dir, self._owns_spill_dir
+        if spill_dir is not None and owned:
+            shutil.rmtree(spill_dir, ignore_errors=True)
@@ -0,0 +1,288 @@
+import collections
+import logging
+import threading
+import time
+import typing
+
+from dispatcher import base_action
+from dispatcher import dispatcher_consts
+
+
+class PipelineAborted(Exception):
+    pass
+
+
+class BoundedBuffer:
+
+    # returned by get() once every producer has closed and the buffer is drained
+    END = object()
+
+    def __init__(self, capacity: int, num_producers: int):
+        self.capacity: int = capacity
+        self._items: collections.deque = collections.deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._open_producers: int = num_producers
+        self._aborted: bool = False
+        self.total_in: int = 0
+        self.total_out: int = 0
+        self.high_water: int = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, item: typing.Any, on_wait: typing.Callable[[], typing.Any] = None):
+        # blocks while the buffer is full; this is how a slow stage holds back the stages feeding it.
+        # on_wait runs after every wait interval, e.g. to check for cancellation or report progress
+        with self._not_full:
+            while len(self._items) >= self.capacity and not self._aborted:
+                self._not_full.wait(dispatcher_consts.PIPELINE_WAIT_INTERVAL)
+                if on_wait is not None:
+                    on_wait()
+            if self._aborted:
+                raise PipelineAborted()
+            self._items.append(item)
+            self.total_in += 1
+            if len(self._items) > self.high_water:
+                self.high_water = len(self._items)
+            self._not_empty.notify()
+
+    def get(self, on_wait: typing.Callable[[], typing.Any] = None) -> typing.Any:
+        with self._not_empty:
+            while not self._items:
+                if self._aborted:
+                    raise PipelineAborted()
+                if not self._open_producers:
+                    return BoundedBuffer.END
+                self._not_empty.wait(dispatcher_consts.PIPELINE_WAIT_INTERVAL)
+                if on_wait is not None:
+                    on_wait()
+            if self._aborted:
+                raise PipelineAborted()
+            item = self._items.popleft()
+            self.total_out += 1
+            self._not_full.notify()
+            return item
+
+    def close(self):
+        # one call per producer; consumers see END once the last producer has closed and the items are gone
+        with self._lock:
+            self._open_producers -= 1
+            self._not_empty.notify_all()
+
+    def abort(self):
+        with self._lock:
+            self._aborted = True
+            self._items.clear()
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
+
+class PipelineStage:
+
+    # subclass and override produce() for the first stage and process() for the others. with more than one
+    # worker, process() is called from several threads at once and items leave the stage in no fixed order
+
+    def __init__(self, name: str, **kwargs):
+        self.name: str = name
+        self.workers: int = kwargs.get('workers', 1)
+        # capacity of the buffer this stage writes to
+        self.buffer_size: int = kwargs.get('buffer_size', dispatcher_consts.PIPELINE_BUFFER_SIZE)
+        # expected number of items from the first stage; drives the percentage shown for every stage
+        self.total: int = kwargs.get('total', None)
+
+    def produce(self) -> typing.Iterable:
+        raise ValueError(f'Stage {self.name} has no input and does not implement produce().')
+
+    def process(self, item: typing.Any) -> typing.Iterable | None:
+        return [item]
+
+    def finish(self) -> typing.Iterable | None:
+        # called once per worker after its input is exhausted, e.g. to flush a partial batch
+        return None
+
+
+class PipelineWorkerAction(base_action.BaseAction):
+
+    logger = logging.getLogger('dispatcher.pipeline')
+
+    def __init__(self, stage_action: 'PipelineStageAction', worker_index: int, **kwargs):
+        super().__init__(**kwargs)
+        self.stage_action: PipelineStageAction = stage_action
+        self.stage: PipelineStage = stage_action.stage
+        self.worker_index: int = worker_index
+        self.items_in: int = 0
+        self.items_out: int = 0
+
+    @property
+    def short_description(self):
+        return f'{self.id:4}: {self.stage.name} #{self.worker_index + 1}'
+
+    @property
+    def description(self):
+        return f'{self.id:4} Pipeline stage {self.stage.name}, worker {self.worker_index + 1}'
+
+    def _on_wait(self):
+        # runs with the buffer's lock held; only reads the buffer sizes through len()
+        if self.cancelled:
+            raise base_action.ActionCancelled(f'Action id {self.id} was cancelled.')
+        self.stage_action.report()
+
+    def _inputs(self) -> typing.Iterator:
+        if self.stage_action.input_buffer is None:
+            yield from self.stage.produce()
+            return
+        while True:
+            item = self.stage_action.input_buffer.get(self._on_wait)
+            if item is BoundedBuffer.END:
+                return
+            yield item
+
+    def _emit(self, outputs: typing.Iterable | None):
+        if outputs is None:
+            return
+        output_buffer = self.stage_action.output_buffer
+        for output in outputs:
+            if output_buffer is not None:
+                output_buffer.put(output, self._on_wait)
+            self.items_out += 1
+            self.stage_action.count(0, 1)
+
+    def do_work(self):
+        self.tick('Running', msg_only=True)
+        source = self.stage_action.input_buffer is None
+        try:
+            for item in self._inputs():
+                if self.cancelled:
+                    raise base_action.ActionCancelled(f'Action id {self.id} was cancelled.')
+                self.items_in += 1
+                self.stage_action.count(1, 0)
+                self._emit([item] if source else self.stage.process(item))
+            self._emit(self.stage.finish())
+        except PipelineAborted:
+            # another stage failed or was cancelled; stop without blaming this one
+            self.current_process = 'Stopped, pipeline aborted'
+            self.action_status = dispatcher_consts.ActionStatus.CANCELLED
+            return
+        except base_action.ActionCancelled:
+            self.stage_action.pipeline_action.abort()
+            raise
+        except Exception as err:
+            self.logger.exception(f'{self.description} failed: {err}')
+            self.stage_action.pipeline_action.abort()
+            self.error_flags = self.error_flags | base_action.BaseAction.ErrorFlags.UNSPECIFIED
+            self.action_status = dispatcher_consts.ActionStatus.FAILED
+            return
+        finally:
+            if self.stage_action.output_buffer is not None:
+                self.stage_action.output_buffer.close()
+            self.stage_action.report(force=True)
+        self.action_status = dispatcher_consts.ActionStatus.COMPLETE
+
+
+class PipelineStageAction(base_action.BaseAction):
+
+    logger = logging.getLogger('dispatcher.pipeline')
+
+    def __init__(self, pipeline_action: 'PipelineAction', stage: PipelineStage,
+                 input_buffer: BoundedBuffer | None, output_buffer: BoundedBuffer | None, **kwargs):
+        super().__init__(**kwargs)
+        self.pipeline_action: PipelineAction = pipeline_action
+        self.stage: PipelineStage = stage
+        self.input_buffer: BoundedBuffer = input_buffer
+        self.output_buffer: BoundedBuffer = output_buffer
+        # workers of one stage update the counts concurrently
+        self._lock = threading.Lock()
+        self.items_in: int = 0
+        self.items_out: int = 0
+        self._last_report: float = 0.0
+
+    @property
+    def short_description(self):
+        return f'{self.id:4}: Stage {self.stage.name}'
+
+    @property
+    def description(self):
+        return f'{self.id:4} Pipeline stage {self.stage.name} ({self.stage.workers} worker(s))'
+
+    def dispatch(self):
+        return [PipelineWorkerAction(self, i) for i in range(self.stage.workers)]
+
+    def count(self, items_in: int, items_out: int):
+        with self._lock:
+            self.items_in += items_in
+            self.items_out += items_out
+        self.report()
+
+    def progress_message(self, with_buffer: bool = True) -> str:
+        message = f'{self.items_in:,} in, {self.items_out:,} out'
+        if with_buffer and self.output_buffer is not None:
+            message += f', buffer {len(self.output_buffer)}/{self.output_buffer.capacity}'
+        return message
+
+    def report(self, force: bool = False):
+        # called from the workers; rate limited so a fast stage does not flood the model with ticks
+        now = time.monotonic()
+        if not force and now - self._last_report < dispatcher_consts.PIPELINE_TICK_INTERVAL:
+            return
+        self._last_report = now
+        total = self.pipeline_action.total
+        if total:
+            done = self.items_out if self.input_buffer is None else self.items_in
+            self.pct_complete = min(100, int(100 * done / total))
+        self.tick(self.progress_message(), msg_only=True)
+
+    def process_children(self):
+        self.current_process = self.progress_message(with_buffer=False)
+        self.pct_complete = 100
+        super().process_children()
+
+
+class PipelineAction(base_action.BaseAction):
+
+    logger = logging.getLogger('dispatcher.pipeline')
+
+    def __init__(self, stages: list[PipelineStage], *args, **kwargs):
+        super().__init__(**kwargs)
+        if not stages:
+            raise ValueError('A pipeline needs at least one stage.')
+        if stages[0].workers != 1:
+            raise ValueError(f'The first stage {stages[0].name} has to run with a single worker.')
+        self.stages: list[PipelineStage] = stages
+        self.name: str = kwargs.get('name', ' > '.join(stage.name for stage in stages))
+        self.total: int = stages[0].total
+        self.buffers: list[BoundedBuffer] = []
+        self.resource_costs[dispatcher_consts.RESOURCE_PIPELINE_THREADS] = self.num_workers
+
+    @property
+    def short_description(self):
+        return f'{self.id:4}: Pipeline {self.name}'
+
+    @property
+    def description(self):
+        return f'{self.id:4} Pipeline {self.name}'
+
+    @property
+    def num_workers(self) -> int:
+        return sum(stage.workers for stage in self.stages)
+
+    def dispatch(self):
+        # fresh buffers on every dispatch; buffer i sits between stage i and stage i + 1
+        self.buffers = [BoundedBuffer(stage.buffer_size, stage.workers) for stage in self.stages[:-1]]
+        stage_actions = []
+        for i, stage in enumerate(self.stages):
+            input_buffer = self.buffers[i - 1] if i > 0 else None
+            output_buffer = self.buffers[i] if i < len(self.buffers) else None
+            stage_actions.append(PipelineStageAction(self, stage, input_buffer, output_buffer))
+        return stage_actions
+
+    def abort(self):
+        for buffer in self.buffers:
+            buffer.abort()
+
+    def process_children(self):
+        # the number of items that reached the last stage
+        self.payload = self.child_actions[-1].items_in if self.child_actions else 0
+        self.pct_complete = 100
+        super().process_children()
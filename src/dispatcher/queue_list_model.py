@@ -35,6 +35,8 @@ class QueueListModel(QtCore.QAbstractListModel):
                     return None
             if action is None:
                 return 'Shutdown Action'
+            if action.cancelled:
+                return f'{action.short_description} (cancelled)'
             return action.short_description
 
         return None
@@ -0,0 +1,496 @@
+from PyQt6 import QtCore
+import pandas as pd
+
+import argparse
+import concurrent.futures
+import datetime
+import importlib
+import itertools
+import logging
+import os
+import pathlib
+import queue
+import socket
+import sys
+import threading
+import time
+from multiprocessing import connection
+
+from dispatcher import action_dispatcher
+from dispatcher import base_action
+from dispatcher import dispatcher_consts
+from dispatcher import payload_ref
+
+
+# messages are tuples whose first item names them
+#   node -> dispatcher: ('hello', name, slots), ('heartbeat',), ('tick', lease_id, process, pct, ticks),
+#                       ('done', lease_id, state)
+#   dispatcher -> node: ('lease', lease_id, class_path, args, kwargs, attempt), ('cancel', lease_id), ('shutdown',)
+
+
+def _class_path(cls: type) -> str:
+    module = cls.__module__
+    if module == '__main__':
+        # a class defined in the script that was started; the node imports that script as a module
+        main = sys.modules['__main__']
+        spec = getattr(main, '__spec__', None)
+        module = spec.name if spec is not None else pathlib.Path(main.__file__).stem
+    return f'{module}:{cls.__qualname__}'
+
+
+def _resolve_class(class_path: str) -> type:
+    module_name, qualname = class_path.split(':')
+    target = importlib.import_module(module_name)
+    for part in qualname.split('.'):
+        target = getattr(target, part)
+    return target
+
+
+def _authkey(authkey: bytes | str | None) -> bytes:
+    authkey = authkey or os.environ.get(dispatcher_consts.REMOTE_AUTHKEY_ENV, None)
+    if not authkey:
+        # messages are pickled; never accept connections that have not proven they hold the key
+        raise ValueError(f'Remote workers need an authkey, or the {dispatcher_consts.REMOTE_AUTHKEY_ENV} '
+                         f'environment variable.')
+    return authkey.encode() if isinstance(authkey, str) else authkey
+
+
+class RemoteNodeSignals(QtCore.QObject):
+
+    node_connected = QtCore.pyqtSignal(str)
+    node_disconnected = QtCore.pyqtSignal(str)
+    # actions are passed as python objects for the same reason as in worker_signal.WorkerSignals
+    node_starting_action = QtCore.pyqtSignal(str, object)
+    node_done_with_action = QtCore.pyqtSignal(str, object)
+    node_deferred_action = QtCore.pyqtSignal(str, object, float)
+    node_discarded_action = QtCore.pyqtSignal(str, object)
+    node_returned_actions = QtCore.pyqtSignal(str, object)
+
+
+class _Lease:
+
+    def __init__(self, lease_id: int, action: base_action.BaseAction):
+        self.lease_id: int = lease_id
+        self.action: base_action.BaseAction = action
+        self.cancel_sent: bool = False
+
+
+class _NodeHandler:
+
+    # one thread per connected node: it reads the node's messages and leases queued actions to it while the
+    # node has free slots. every lease ends either with the node's result or with the action going back on
+    # the queue when the node disconnects or stops sending heartbeats
+
+    _lease_ids = itertools.count(1)
+
+    def __init__(self, server: 'RemoteWorkerServer', conn: connection.Connection):
+        self.server: RemoteWorkerServer = server
+        self.conn: connection.Connection = conn
+        self.name: str = 'unknown'
+        self.slots: int = 0
+        self.leases: dict[int, _Lease] = {}
+        self.last_seen: float = time.monotonic()
+        self.completed: int = 0
+        self._thread = threading.Thread(target=self._run, name='dispatcher-remote-node', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def join(self, timeout: float = None):
+        self._thread.join(timeout)
+
+    def _run(self):
+        logger = self.server.logger
+        try:
+            message = self.conn.recv()
+            if message[0] != 'hello':
+                logger.warning(f'Remote node sent {message[0]!r} before hello; closing the connection.')
+                return
+            _, self.name, self.slots = message
+            self.server._on_node_connected(self)
+            while not self.server._stopping.is_set():
+                if self.conn.poll(dispatcher_consts.REMOTE_POLL_INTERVAL):
+                    self.last_seen = time.monotonic()
+                    self._handle(self.conn.recv())
+                elif time.monotonic() - self.last_seen > self.server.node_timeout:
+                    logger.warning(f'Remote node {self.name} missed its heartbeats; re-queueing '
+                                   f'{len(self.leases)} action(s).')
+                    break
+                self._send_cancels()
+                self._lease_queued()
+        except (EOFError, OSError) as err:
+            logger.warning(f'Lost remote node {self.name}: {err!r}')
+        finally:
+            if self.server._stopping.is_set():
+                self._send(('shutdown',))
+            self.conn.close()
+            self._return_leases()
+            self.server._on_node_disconnected(self)
+
+    def _send(self, message: tuple) -> bool:
+        try:
+            self.conn.send(message)
+            return True
+        except (OSError, ValueError):
+            return False
+
+    def _handle(self, message: tuple):
+        kind = message[0]
+        if kind == 'heartbeat':
+            return
+        lease = self.leases.get(message[1], None)
+        if lease is None:
+            # a result for a lease that has already been given up
+            return
+        action = lease.action
+        if kind == 'tick':
+            _, _, action.current_process, action.pct_complete, action.tick_count = message
+            action.signal_action_tick.emit()
+        elif kind == 'done':
+            # the lease is only dropped once the action has its outcome; until then a lost node hands it back
+            try:
+                self._apply_result(action, message[2])
+            except Exception as err:
+                # e.g. the shared memory block holding the result is already gone
+                self.server.logger.exception(f'Unable to take the result of {action.description} from '
+                                             f'{self.name}: {err}')
+                action.error_flags = action.error_flags | base_action.BaseAction.ErrorFlags.UNSPECIFIED
+                action.action_status = dispatcher_consts.ActionStatus.FAILED
+                action.datetime_end = datetime.datetime.now()
+                action.signal_action_finished.emit()
+            del self.leases[lease.lease_id]
+            self.completed += 1
+            action.cancel_token.release()
+            self.server.action_queue.task_done()
+            self.server.signals.node_done_with_action.emit(self.name, action)
+
+    def _apply_result(self, action: base_action.BaseAction, state: dict):
+        payload = state.pop('payload', None)
+        if isinstance(payload, payload_ref.PayloadReference):
+            # a dataframe left in shared memory by a node on this host: map it and let go of the name, the
+            # mapping lives on with the frame
+            payload.adopt()
+            try:
+                frame = payload.to_frame()
+            finally:
+                payload.release()
+            payload = frame
+        for name, value in state.items():
+            setattr(action, name, value)
+        action.payload = payload
+        action.signal_action_finished.emit()
+
+    def _send_cancels(self):
+        for lease in self.leases.values():
+            if lease.action.cancelled and not lease.cancel_sent:
+                lease.cancel_sent = self._send(('cancel', lease.lease_id))
+
+    def _take_queued(self) -> base_action.BaseAction | None:
+        # only the head of the queue is considered, so priorities hold; anything a node cannot run (including
+        # the pause and shutdown actions meant for the local threads) waits for a local worker
+        action_queue = self.server.action_queue
+        with action_queue.mutex:
+            if not action_queue.queue:
+                return None
+            _, action = action_queue.queue[0]
+            if not action.remote_capable:
+                return None
+            action_queue._get()
+            action_queue.not_full.notify()
+        return action
+
+    def _lease_queued(self):
+        while len(self.leases) < self.slots:
+            action = self._take_queued()
+            if action is None:
+                return
+            if not action.cancel_token.claim():
+                self.server.action_queue.task_done()
+                self.server.signals.node_discarded_action.emit(self.name, action)
+                continue
+            delay = action.throttle_delay()
+            if delay > 0:
+                action.cancel_token.release()
+                self.server.action_queue.task_done()
+                self.server.signals.node_deferred_action.emit(self.name, action, delay)
+                continue
+            lease = _Lease(next(_NodeHandler._lease_ids), action)
+            try:
+                args, kwargs = action.remote_args()
+                self.conn.send(('lease', lease.lease_id, _class_path(type(action)), args, kwargs, action.attempt))
+            except (OSError, ValueError):
+                # the connection is gone; hand the action back with the other leases
+                self.leases[lease.lease_id] = lease
+                raise EOFError(f'Unable to send {action.description}')
+            except Exception as err:
+                self.server.logger.exception(f'Unable to send {action.description} to {self.name}: {err}')
+                self._fail_unsent(action)
+                continue
+            self.leases[lease.lease_id] = lease
+            action.remote_node = self.name
+            action.action_status = dispatcher_consts.ActionStatus.IN_PROGRESS
+            action.datetime_start = datetime.datetime.now()
+            action.started_monotonic = time.monotonic()
+            action.current_process = f'Running on {self.name}'
+            self.server.signals.node_starting_action.emit(self.name, action)
+            action.signal_action_tick.emit()
+
+    def _fail_unsent(self, action: base_action.BaseAction):
+        action.error_flags = action.error_flags | base_action.BaseAction.ErrorFlags.UNSPECIFIED
+        action.action_status = dispatcher_consts.ActionStatus.FAILED
+        action.tear_down()
+        action.cancel_token.release()
+        self.server.action_queue.task_done()
+        self.server.signals.node_done_with_action.emit(self.name, action)
+
+    def _return_leases(self):
+        returned = []
+        for lease in self.leases.values():
+            action = lease.action
+            action.remote_node = None
+            action.action_status = dispatcher_consts.ActionStatus.PENDING
+            action.datetime_start = None
+            action.started_monotonic = None
+            action.current_process = 'Re-queued'
+            action.cancel_token.release()
+            self.server.action_queue.task_done()
+            returned.append(action)
+        self.leases.clear()
+        if returned:
+            self.server.signals.node_returned_actions.emit(self.name, returned)
+
+
+class RemoteWorkerServer:
+
+    logger = logging.getLogger('dispatcher.remote_worker')
+
+    # accepts worker nodes for a dispatcher. address is (host, port) for tcp or a filesystem path for a unix
+    # socket; nodes run remote_capable actions taken from the dispatcher's immediate queue next to its own
+    # threads
+
+    def __init__(self, dispatcher: action_dispatcher.ActionDispatcher, address: tuple[str, int] | str,
+                 **kwargs):
+        self.dispatcher = dispatcher
+        self.action_queue: queue.PriorityQueue = dispatcher.immediate_queue
+        self.node_timeout: float = kwargs.get('node_timeout', dispatcher_consts.REMOTE_NODE_TIMEOUT)
+        self.signals = RemoteNodeSignals()
+        self.signals.node_starting_action.connect(dispatcher.on_node_starting_action)
+        self.signals.node_done_with_action.connect(dispatcher.on_node_done_with_action)
+        self.signals.node_deferred_action.connect(dispatcher.on_node_deferred_action)
+        self.signals.node_discarded_action.connect(dispatcher.on_node_discarded_action)
+        self.signals.node_returned_actions.connect(dispatcher.on_node_returned_actions)
+        self._authkey: bytes = _authkey(kwargs.get('authkey', None))
+        self._listener = connection.Listener(address, authkey=self._authkey)
+        self.address = self._listener.address
+        self._lock = threading.Lock()
+        self.nodes: dict[str, _NodeHandler] = {}
+        self._stopping = threading.Event()
+        self._accept_thread: threading.Thread = None
+
+    def start(self):
+        self._accept_thread = threading.Thread(target=self._accept, name='dispatcher-remote-accept', daemon=True)
+        self._accept_thread.start()
+        self.logger.info(f'Accepting remote worker nodes on {self.address}')
+
+    def stop(self):
+        # nodes are told to shut down; whatever they still hold goes back on the queue
+        self._stopping.set()
+        try:
+            # closing the listener does not interrupt a blocking accept; a last connection does
+            connection.Client(self.address, authkey=self._authkey).close()
+        except OSError:
+            pass
+        self._listener.close()
+        with self._lock:
+            handlers = list(self.nodes.values())
+        for handler in handlers:
+            handler.join()
+        if self._accept_thread is not None:
+            self._accept_thread.join()
+            self._accept_thread = None
+
+    def _accept(self):
+        while not self._stopping.is_set():
+            try:
+                conn = self._listener.accept()
+            except connection.AuthenticationError as err:
+                self.logger.warning(f'Rejected a remote node: {err}')
+                continue
+            except OSError:
+                # the listener was closed by stop()
+                return
+            if self._stopping.is_set():
+                conn.close()
+                return
+            _NodeHandler(self, conn).start()
+
+    def _on_node_connected(self, handler: _NodeHandler):
+        with self._lock:
+            if handler.name in self.nodes:
+                handler.name = f'{handler.name}#{id(handler)}'
+            self.nodes[handler.name] = handler
+        self.logger.info(f'Remote node {handler.name} connected with {handler.slots} slot(s)')
+        self.signals.node_connected.emit(handler.name)
+
+    def _on_node_disconnected(self, handler: _NodeHandler):
+        with self._lock:
+            if self.nodes.get(handler.name, None) is handler:
+                del self.nodes[handler.name]
+        self.logger.info(f'Remote node {handler.name} disconnected after {handler.completed} action(s)')
+        self.signals.node_disconnected.emit(handler.name)
+
+
+class RemoteWorkerNode:
+
+    logger = logging.getLogger('dispatcher.remote_worker')
+
+    # the worker side: connects to a RemoteWorkerServer and runs the actions it leases on a pool of threads.
+    # started with python -m dispatcher.remote_worker
+
+    def __init__(self, address: tuple[str, int] | str, **kwargs):
+        self.address = address
+        self.authkey: bytes = _authkey(kwargs.get('authkey', None))
+        self.slots: int = kwargs.get('slots', os.cpu_count() or 1)
+        self.name: str = kwargs.get('name', None) or f'{socket.gethostname()}:{os.getpid()}'
+        # dataframe payloads go back through shared memory; only for nodes on the dispatcher's host
+        self.shared_memory: bool = kwargs.get('shared_memory', False)
+        self.heartbeat_interval: float = kwargs.get('heartbeat_interval', dispatcher_consts.REMOTE_HEARTBEAT_INTERVAL)
+        self._conn: connection.Connection = None
+        self._send_lock = threading.Lock()
+        self._actions: dict[int, base_action.BaseAction] = {}
+        self._stop_event = threading.Event()
+
+    def run(self):
+        self._conn = connection.Client(self.address, authkey=self.authkey)
+        self._send(('hello', self.name, self.slots))
+        self.logger.info(f'Node {self.name} connected to {self.address} with {self.slots} slot(s)')
+        heartbeat = threading.Thread(target=self._heartbeat, name='node-heartbeat', daemon=True)
+        heartbeat.start()
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.slots, thread_name_prefix='node-worker')
+        try:
+            while True:
+                message = self._conn.recv()
+                kind = message[0]
+                if kind == 'lease':
+                    executor.submit(self._execute, *message[1:])
+                elif kind == 'cancel':
+                    action = self._actions.get(message[1], None)
+                    if action is not None:
+                        action.cancel_token.cancel()
+                elif kind == 'shutdown':
+                    break
+        except (EOFError, OSError):
+            self.logger.warning(f'Node {self.name} lost its connection to {self.address}')
+        finally:
+            self._stop_event.set()
+            for action in list(self._actions.values()):
+                action.cancel_token.cancel()
+            executor.shutdown(wait=True, cancel_futures=True)
+            self._conn.close()
+
+    def _send(self, message: tuple) -> bool:
+        with self._send_lock:
+            try:
+                self._conn.send(message)
+                return True
+            except (OSError, ValueError):
+                return False
+
+    def _heartbeat(self):
+        while not self._stop_event.wait(self.heartbeat_interval):
+            if not self._send(('heartbeat',)):
+                return
+
+    def _execute(self, lease_id: int, class_path: str, args: tuple, kwargs: dict, attempt: int):
+        action: base_action.BaseAction = None
+        try:
+            action = _resolve_class(class_path)(*args, **kwargs)
+            action.attempt = attempt
+        except Exception as err:
+            self.logger.exception(f'Unable to build {class_path}: {err}')
+            self._send(('done', lease_id, {
+                'action_status': dispatcher_consts.ActionStatus.FAILED,
+                'error_flags': base_action.BaseAction.ErrorFlags.UNSPECIFIED,
+                'current_process': f'Unable to build the action on {self.name}',
+                'datetime_end': datetime.datetime.now(),
+            }))
+            return
+        self._actions[lease_id] = action
+        last_tick = [0.0]
+
+        def on_tick():
+            now = time.monotonic()
+            if now - last_tick[0] < dispatcher_consts.REMOTE_TICK_INTERVAL:
+                return
+            last_tick[0] = now
+            self._send(('tick', lease_id, action.current_process, action.pct_complete, action.tick_count))
+
+        action.signal_action_tick.connect(on_tick, type=QtCore.Qt.ConnectionType.DirectConnection)
+        action.cancel_token.claim()
+        try:
+            action.execute_action()
+        except base_action.ActionCancelled:
+            action.cancel_exit()
+        except Exception as err:
+            self.logger.exception(f'{action.description} failed on {self.name}: {err}')
+            action.error_flags = action.error_flags | base_action.BaseAction.ErrorFlags.UNSPECIFIED
+            action.action_status = dispatcher_consts.ActionStatus.FAILED
+            action.tear_down()
+        finally:
+            self._actions.pop(lease_id, None)
+        self._send_result(lease_id, action)
+
+    def _send_result(self, lease_id: int, action: base_action.BaseAction):
+        state = {
+            'action_status': action.action_status,
+            'error_flags': action.error_flags,
+            'current_process': action.current_process,
+            'pct_complete': action.pct_complete,
+            'tick_count': action.tick_count,
+            'datetime_start': action.datetime_start,
+            'datetime_end': action.datetime_end,
+        }
+        payload = action.payload
+        reference = None
+        if self.shared_memory and isinstance(payload, pd.DataFrame):
+            # disown before sending, the dispatcher adopts the block when the result arrives
+            reference = payload = payload_ref.PayloadReference.from_frame(payload)
+            reference.disown()
+        state['payload'] = payload
+        try:
+            with self._send_lock:
+                self._conn.send(('done', lease_id, state))
+        except (OSError, ValueError):
+            return
+        except Exception as err:
+            # the payload could not be pickled
+            self.logger.exception(f'Unable to send the result of {action.description}: {err}')
+            state.update(payload=None, action_status=dispatcher_consts.ActionStatus.FAILED,
+                         error_flags=action.error_flags | base_action.BaseAction.ErrorFlags.UNSPECIFIED,
+                         current_process=f'Result could not be sent from {self.name}')
+            self._send(('done', lease_id, state))
+
+
+def _parse_address(address: str) -> tuple[str, int] | str:
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit():
+        return host, int(port)
+    return address
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run actions for a dispatcher on this machine.')
+    parser.add_argument('address', help='host:port of the dispatcher, or the path of its unix socket')
+    parser.add_argument('--slots', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--name', default=None)
+    parser.add_argument('--shared-memory', action='store_true',
+                        help='return dataframes through shared memory (same host only)')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    node = RemoteWorkerNode(_parse_address(args.address), slots=args.slots, name=args.name,
+                            shared_memory=args.shared_memory)
+    node.run()
+
+
+if __name__ == '__main__':
+    main()
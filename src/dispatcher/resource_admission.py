@@ -0,0 +1,95 @@
+import collections
+import logging
+import time
+
+from dispatcher import base_action
+from dispatcher import dispatcher_consts
+
+
+class ResourceAdmission:
+
+    logger = logging.getLogger('dispatcher.resource_admission')
+
+    def __init__(self, capacity: dict[str, float] = None, **kwargs):
+        self.capacity: dict[str, float] = dict(capacity) if capacity else {}
+        self.usage: dict[str, float] = {name: 0.0 for name in self.capacity}
+        # once the oldest waiting action has waited this long, stop backfilling so capacity drains for it
+        self.starvation_time: float = kwargs.get('starvation_time', dispatcher_consts.ADMISSION_STARVATION_TIME)
+        self._waiting: collections.OrderedDict[int, tuple[float, base_action.BaseAction]] = collections.OrderedDict()
+        self._held: dict[int, dict[str, float]] = {}
+
+    def set_capacity(self, name: str, capacity: float) -> list[base_action.BaseAction]:
+        # returns the waiting actions that fit now
+        self.capacity[name] = capacity
+        self.usage.setdefault(name, 0.0)
+        return self._drain()
+
+    def _limited_costs(self, action: base_action.BaseAction) -> dict[str, float]:
+        # an action larger than the whole capacity is clamped so it can still run on its own
+        return {name: min(cost, self.capacity[name]) for name, cost in action.resource_costs.items()
+                if name in self.capacity and cost > 0}
+
+    def needs_admission(self, action: base_action.BaseAction) -> bool:
+        return action.id not in self._held and bool(self._limited_costs(action))
+
+    def holds(self, action: base_action.BaseAction) -> bool:
+        return action.id in self._held
+
+    def is_waiting(self, action: base_action.BaseAction) -> bool:
+        return action.id in self._waiting
+
+    def _fits(self, costs: dict[str, float]) -> bool:
+        return all(self.usage[name] + cost <= self.capacity[name] for name, cost in costs.items())
+
+    def _acquire(self, action: base_action.BaseAction, costs: dict[str, float]):
+        for name, cost in costs.items():
+            self.usage[name] += cost
+        self._held[action.id] = costs
+
+    def submit(self, action: base_action.BaseAction) -> list[base_action.BaseAction]:
+        # returns every action admitted by the submission, which may include waiting actions besides this one
+        costs = self._limited_costs(action)
+        if not self._waiting and self._fits(costs):
+            self._acquire(action, costs)
+            return [action]
+        self._waiting[action.id] = (time.monotonic(), action)
+        return self._drain()
+
+    def release(self, action: base_action.BaseAction) -> list[base_action.BaseAction]:
+        # a waiting action that goes away (e.g. cancelled) may have been the one holding back the others
+        was_waiting = self._waiting.pop(action.id, None) is not None
+        costs = self._held.pop(action.id, None)
+        if costs is None:
+            return self._drain() if was_waiting else []
+        for name, cost in costs.items():
+            self.usage[name] = max(0.0, self.usage[name] - cost)
+        return self._drain()
+
+    def _drain(self) -> list[base_action.BaseAction]:
+        admitted: list[base_action.BaseAction] = []
+        now = time.monotonic()
+        blocked_seen = False
+        head_starving = False
+        for action_id, (queued_at, action) in list(self._waiting.items()):
+            if action.cancelled:
+                del self._waiting[action_id]
+                continue
+            costs = self._limited_costs(action)
+            if self._fits(costs):
+                if head_starving:
+                    break
+                # smaller actions backfill around the blocked ones ahead of them
+                del self._waiting[action_id]
+                self._acquire(action, costs)
+                admitted.append(action)
+            elif not blocked_seen:
+                blocked_seen = True
+                # the oldest blocked action has waited long enough; stop backfilling and let capacity drain for it
+                head_starving = now - queued_at > self.starvation_time
+        return admitted
+
+    def waiting_count(self) -> int:
+        return len(self._waiting)
+
+    def get_usage(self) -> dict[str, tuple[float, float]]:
+        return {name: (self.usage[name], capacity) for name, capacity in self.capacity.items()}
@@ -0,0 +1,38 @@
+import random
+
+from dispatcher import dispatcher_consts
+
+
+class RetryPolicy:
+
+    def __init__(self, max_attempts: int = dispatcher_consts.RETRY_MAX_ATTEMPTS, retry_on: int = None,
+                 base_delay: float = dispatcher_consts.RETRY_BASE_DELAY,
+                 max_delay: float = dispatcher_consts.RETRY_MAX_DELAY,
+                 multiplier: float = dispatcher_consts.RETRY_MULTIPLIER,
+                 jitter: float = dispatcher_consts.RETRY_JITTER):
+        if max_attempts < 1:
+            raise ValueError('A retry policy requires at least one attempt.')
+        self.max_attempts: int = max_attempts
+        # mask of error flags that trigger a retry; None retries on any error flag
+        self.retry_on: int = retry_on
+        self.base_delay: float = base_delay
+        self.max_delay: float = max_delay
+        self.multiplier: float = multiplier
+        self.jitter: float = jitter
+
+    def should_retry(self, attempt: int, action_status: dispatcher_consts.ActionStatus, error_flags: int) -> bool:
+        if attempt >= self.max_attempts:
+            return False
+        if action_status not in (dispatcher_consts.ActionStatus.ERROR, dispatcher_consts.ActionStatus.FAILED):
+            return False
+        if not error_flags:
+            return False
+        if self.retry_on is None:
+            return True
+        return bool(int(error_flags) & int(self.retry_on))
+
+    def next_delay(self, attempt: int) -> float:
+        delay = min(self.max_delay, self.base_delay * (self.multiplier ** (attempt - 1)))
+        if self.jitter:
+            delay *= 1.0 + random.uniform(-self.jitter, self.jitter)
+        return max(delay, 0.0)
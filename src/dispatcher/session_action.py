@@ -1,15 +1,26 @@
 import requests
 
+import concurrent.futures
 import enum
 import logging
+import os
+import pathlib
+import threading
+import time
 import typing
 
 from dispatcher import base_action, base_user
+from dispatcher import dispatcher_consts
+from dispatcher import host_limiter
+from dispatcher import http_cache
 
 
 class SessionAction(base_action.BaseAction):
 
     logger = logging.getLogger('dispatcher.session_action')
+    # shared by every SessionAction; runs the racing attempts of hedged requests
+    _hedge_executor: concurrent.futures.ThreadPoolExecutor = None
+    _hedge_executor_lock = threading.Lock()
 
     class ErrorFlags(enum.IntFlag):
 
@@ -19,6 +30,8 @@ class SessionAction(base_action.BaseAction):
         CRED_ERROR = 4
         SERVER_ERROR = 8
         KEY_VAL_ERROR = 16
+        TIMEOUT = 32
+        DEPENDENCY_FAILED = 64
 
     class UrlOperation(enum.IntEnum):
 
@@ -36,9 +49,20 @@ class SessionAction(base_action.BaseAction):
         else:
             self.session_values = {}
         self.usr: base_user.BaseUser = kwargs.get('usr', None)
+        # optional shared on-disk cache for GET requests, namespaced by usr
+        self.http_cache: http_cache.HttpCache = kwargs.get('http_cache', None)
+        # opt-in hedging of GET requests; a fixed hedge_delay overrides the delay learned from the host's latencies
+        self.hedge: bool = kwargs.get('hedge', False)
+        self.hedge_delay: float = kwargs.get('hedge_delay', None)
+        self.hedge_percentile: float = kwargs.get('hedge_percentile', dispatcher_consts.HEDGE_PERCENTILE)
+        self.request_timeout: float | tuple[float, float] = kwargs.get('request_timeout',
+                                                                       dispatcher_consts.HTTP_DEFAULT_TIMEOUT)
         session_cookies: dict[str, typing.Any] = kwargs.get('session_cookies', None)
         if session_cookies:
             self.session.cookies.update(session_cookies)
+        self._retry_state: tuple[dict[str, typing.Any], str, dict[str, typing.Any]] = ({}, None, {})
+        self._hedge_session: requests.Session = None
+        self._download_ticked: float = 0.0
 
     def login(self):
         raise NotImplementedError('You cannot login from a generic session action.')
@@ -46,9 +70,28 @@ class SessionAction(base_action.BaseAction):
     def logout(self):
         raise NotImplementedError('You cannot logout from a generic session action.')
 
+    def setup(self):
+        super().setup()
+        # keep what is needed to rebuild the session if this action is retried after tear down
+        self._retry_state = (dict(self.session_values), self.session_key, self.get_session_cookies())
+
+    def prepare_retry(self):
+        super().prepare_retry()
+        session_values, session_key, session_cookies = self._retry_state
+        self.session = requests.Session()
+        if session_cookies:
+            self.session.cookies.update(session_cookies)
+        self.session_values = session_values
+        self.session_key = session_key
+
     def tear_down(self):
+        if self.abandoned:
+            # a retry may already be using the rebuilt session
+            return
         self.session.close()
         self.session = None
+        # the hedge session shares the adapters just closed
+        self._hedge_session = None
         self.session_values.clear()
         self.session_key = None
         super().tear_down()
@@ -80,45 +123,342 @@ class SessionAction(base_action.BaseAction):
         else:
             return {}
 
+    def _cache_namespace(self) -> str | None:
+        # None when responses must not be cached: a logged in session without a user to keep its entries apart
+        # would otherwise share the anonymous namespace with every other such session
+        if self.http_cache is None:
+            return None
+        if (self.usr is None or not self.usr.username) and (self.session_key or len(self.session.cookies)):
+            return None
+        return http_cache.HttpCache.user_namespace(self.usr)
+
+    def get_host_limiter(self) -> host_limiter.HostLimiter:
+        return host_limiter.HostLimiterRegistry.get_limiter(self.base_url)
+
+    def throttle_delay(self) -> float:
+        return self.get_host_limiter().delay_hint()
+
+    def _send_request(self, op_type: UrlOperation, url: str, headers: dict, payload: dict, neg_auth: bool,
+                      stream: bool = False, session: requests.Session = None):
+        if session is None:
+            session = self.session
+        if op_type == SessionAction.UrlOperation.GET:
+            if neg_auth:
+                return session.get(self.base_url + url, headers=headers, auth=HttpNegotiateAuth(),
+                                   timeout=self.request_timeout, stream=stream)
+            return session.get(self.base_url + url, headers=headers, timeout=self.request_timeout, stream=stream)
+        elif op_type == SessionAction.UrlOperation.POST:
+            if neg_auth:
+                return session.post(self.base_url + url, headers=headers, data=payload,
+                                    auth=HttpNegotiateAuth(), timeout=self.request_timeout, stream=stream)
+            return session.post(self.base_url + url, headers=headers, data=payload,
+                                timeout=self.request_timeout, stream=stream)
+        raise ValueError('Unknown op_type sent to function.')
+
+    def _send_attempt(self, limiter: host_limiter.HostLimiter, op_type: UrlOperation, url: str, headers: dict,
+                      payload: dict, neg_auth: bool, stream: bool = False, session: requests.Session = None):
+        # the caller has acquired a limiter slot; it is released once the response headers are in
+        started = time.monotonic()
+        success = False
+        try:
+            r = self._send_request(op_type, url, headers, payload, neg_auth, stream=stream, session=session)
+            # 5xx and 429 responses mean the host is struggling and shrink its concurrency limit
+            success = r.status_code < 500 and r.status_code != 429
+            return r
+        finally:
+            limiter.release(time.monotonic() - started, success)
+
+    def _get_hedge_session(self) -> requests.Session:
+        # a requests session is not thread-safe, so hedges go out on a second session kept for the action. it
+        # shares the adapters, so hedges reuse the same connection pools, and takes on the rest of the action's
+        # session as it is now: headers, auth and tls settings may have changed since the last hedge
+        if self._hedge_session is None:
+            self._hedge_session = requests.Session()
+        hedge_session = self._hedge_session
+        for name in ('headers', 'auth', 'proxies', 'hooks', 'params', 'verify', 'cert', 'adapters', 'stream',
+                     'trust_env', 'max_redirects'):
+            setattr(hedge_session, name, getattr(self.session, name))
+        hedge_session.cookies = self.session.cookies.copy()
+        return hedge_session
+
+    @classmethod
+    def _get_hedge_executor(cls) -> concurrent.futures.ThreadPoolExecutor:
+        with SessionAction._hedge_executor_lock:
+            if SessionAction._hedge_executor is None:
+                SessionAction._hedge_executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=dispatcher_consts.HEDGE_MAX_THREADS, thread_name_prefix='dispatcher-hedge')
+            return SessionAction._hedge_executor
+
+    @staticmethod
+    def _close_attempt(future: concurrent.futures.Future):
+        if not future.cancelled() and future.exception() is None:
+            future.result().close()
+
+    def _hedged_request(self, limiter: host_limiter.HostLimiter, op_type: UrlOperation, url: str, headers: dict,
+                        payload: dict, neg_auth: bool):
+        delay = self.hedge_delay
+        if delay is None:
+            delay = limiter.latency_percentile(self.hedge_percentile)
+        if delay is None:
+            # not enough samples yet to know what a slow request looks like for this host
+            return self._send_attempt(limiter, op_type, url, headers, payload, neg_auth)
+
+        # attempts stream so the losing one can be closed without reading its body
+        executor = self._get_hedge_executor()
+        primary = executor.submit(self._send_attempt, limiter, op_type, url, headers, payload, neg_auth, True)
+        try:
+            r = primary.result(timeout=delay)
+            r.content
+            return r
+        except concurrent.futures.TimeoutError:
+            pass
+        if not limiter.try_hedge():
+            r = primary.result()
+            r.content
+            return r
+        self.logger.debug(f'{self.base_url + url}: no response after {delay:.3f} sec, sending a hedged request')
+        # try_hedge() took a limiter slot for the hedge, which its attempt releases the same way the primary's does
+        hedge_session = self._get_hedge_session()
+        hedged = executor.submit(self._send_attempt, limiter, op_type, url, headers, payload, neg_auth, True,
+                                 hedge_session)
+
+        # only a successful response wins the race; an error response is kept in case the other attempt fails too
+        winner: concurrent.futures.Future = None
+        failed: concurrent.futures.Future = None
+        error: BaseException = None
+        pending = {primary, hedged}
+        while pending and winner is None:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = error or future.exception()
+                elif winner is None and future.result().status_code < 400:
+                    winner = future
+                elif winner is None and failed is None:
+                    failed = future
+                else:
+                    future.result().close()
+        for future in pending:
+            # the loser is still waiting on the server; close its response whenever it arrives
+            future.add_done_callback(self._close_attempt)
+        if winner is None:
+            winner = failed
+        elif failed is not None:
+            failed.result().close()
+        if winner is None:
+            raise error
+        if winner is hedged and winner is not failed:
+            limiter.record_hedge_win()
+        r = winner.result()
+        r.content
+        if winner is hedged:
+            # keep whatever cookies the server set on the hedge
+            self.session.cookies.update(hedge_session.cookies)
+        return r
+
+    def _limited_request(self, op_type: UrlOperation, url: str, headers: dict, payload: dict, neg_auth: bool):
+        limiter = self.get_host_limiter()
+        limiter.acquire()
+        try:
+            if self.hedge and op_type == SessionAction.UrlOperation.GET:
+                return self._hedged_request(limiter, op_type, url, headers, payload, neg_auth)
+            return self._send_attempt(limiter, op_type, url, headers, payload, neg_auth)
+        except requests.exceptions.Timeout as err:
+            self.error_flags = self.error_flags | SessionAction.ErrorFlags.CON_ERROR | SessionAction.ErrorFlags.TIMEOUT
+            self.logger.warning(f'{self.base_url + url}: {err}')
+            return None
+        except requests.exceptions.ConnectionError as err:
+            self.error_flags = self.error_flags | SessionAction.ErrorFlags.CON_ERROR
+            self.logger.exception(err)
+            return None
+
     def url_request(self, op_type: UrlOperation, url: str, headers: dict, payload: dict,
                     neg_auth: bool = False, verbose_debug: bool = False):
         if headers is None:
             headers = {}
         if payload is None:
             payload = {}
-        try:
-            if op_type == SessionAction.UrlOperation.GET:
-                if neg_auth:
-                    r = self.session.get(self.base_url + url, headers=headers, auth=HttpNegotiateAuth())
-                else:
-                    r = self.session.get(self.base_url + url, headers=headers)
-            elif op_type == SessionAction.UrlOperation.POST:
-                if neg_auth:
-                    r = self.session.post(self.base_url + url, headers=headers, data=payload, auth=HttpNegotiateAuth())
-                else:
-                    r = self.session.post(self.base_url + url, headers=headers, data=payload)
-            else:
-                raise ValueError('Unknown op_type sent to function.')
-            if verbose_debug:
-                self.logger.debug(f'{r.request.method} {r.request.url}')
-                self.logger.debug(f'...Headers: {r.request.headers}')
-                self.logger.debug(f'...Status code: {r.status_code}')
-            if r.status_code == 400:
-                self.logger.warning(f'{r.text}')
-                self.error_flags = self.error_flags | SessionAction.ErrorFlags.SERVER_ERROR
-                return None
-            elif r.status_code > 400:
-                self.logger.warning(f'{r.request.method} {r.request.url}: status code {r.status_code}')
-                self.error_flags = self.error_flags | SessionAction.ErrorFlags.SERVER_ERROR
-                return None
+        namespace = self._cache_namespace() if op_type == SessionAction.UrlOperation.GET else None
+        if namespace is not None:
+            r = self.http_cache.get(namespace, self.base_url + url, headers,
+                                    lambda request_headers: self._limited_request(op_type, url, request_headers,
+                                                                                  payload, neg_auth))
+        else:
+            r = self._limited_request(op_type, url, headers, payload, neg_auth)
+        if r is None:
+            return None
 
-        except requests.exceptions.ConnectionError as err:
-            self.error_flags = self.error_flags | SessionAction.ErrorFlags.CON_ERROR
-            self.logger.exception(err)
+        if verbose_debug:
+            self.logger.debug(f'{r.request.method} {r.request.url}')
+            self.logger.debug(f'...Headers: {r.request.headers}')
+            self.logger.debug(f'...Status code: {r.status_code}')
+        if r.status_code == 400:
+            self.logger.warning(f'{r.text}')
+            self.error_flags = self.error_flags | SessionAction.ErrorFlags.SERVER_ERROR
+            return None
+        elif r.status_code > 400:
+            self.logger.warning(f'{r.request.method} {r.request.url}: status code {r.status_code}')
+            self.error_flags = self.error_flags | SessionAction.ErrorFlags.SERVER_ERROR
             return None
 
         return r
 
+    def url_download(self, url: str, destination: str = None, callback: typing.Callable[[bytes], typing.Any] = None,
+                     headers: dict = None, payload: dict = None, op_type: UrlOperation = UrlOperation.GET,
+                     neg_auth: bool = False, chunk_size: int = dispatcher_consts.DOWNLOAD_CHUNK_SIZE,
+                     max_resumes: int = dispatcher_consts.DOWNLOAD_MAX_RESUMES) -> int | None:
+        # streams the body to destination (through a .part file renamed on completion) or to callback in
+        # chunks, so the body is never held in memory; returns the number of bytes received or None on error
+        if (destination is None) == (callback is None):
+            raise ValueError('url_download requires exactly one of destination or callback.')
+        headers = dict(headers) if headers else {}
+        part_path: pathlib.Path = None
+        validator_path: pathlib.Path = None
+        # strong etag or last-modified of the body being received; a resume is only sent with it as If-Range, so
+        # a resource that changed in between comes back whole instead of being appended to the old bytes
+        validator: str = None
+        offset = 0
+        if destination is not None:
+            part_path = pathlib.Path(f'{destination}{dispatcher_consts.DOWNLOAD_PART_SUFFIX}')
+            validator_path = pathlib.Path(f'{destination}{dispatcher_consts.DOWNLOAD_VALIDATOR_SUFFIX}')
+            # a partial file left behind by an earlier attempt is resumed instead of fetched again, as long as it
+            # is known which version of the resource it holds
+            if part_path.exists() and validator_path.exists():
+                validator = validator_path.read_text().strip() or None
+                if validator is not None:
+                    offset = part_path.stat().st_size
+            sink = open(part_path, 'ab')
+            if not offset:
+                sink.truncate(0)
+            write = sink.write
+        else:
+            sink = None
+            write = callback
+        resumes = 0
+        self._download_ticked = 0.0
+        try:
+            while True:
+                request_headers = dict(headers)
+                if offset:
+                    request_headers['Range'] = f'bytes={offset}-'
+                    request_headers['If-Range'] = validator
+                limiter = self.get_host_limiter()
+                limiter.acquire()
+                started = time.monotonic()
+                latency: float = None
+                success = False
+                try:
+                    r = self._send_request(op_type, url, request_headers, payload, neg_auth, stream=True)
+                    # the slot is held for the whole body but the limiter only sees the time to the headers
+                    latency = time.monotonic() - started
+                    with r:
+                        success = r.status_code < 500 and r.status_code != 429
+                        if offset and r.status_code == 416:
+                            # nothing left past the offset, which only means the download is complete if the
+                            # resource is exactly as long as what has been received
+                            if self._range_total(r) == offset:
+                                break
+                            if sink is None:
+                                self.logger.warning(f'{self.base_url + url}: resource changed while downloading, '
+                                                    f'unable to resume the download')
+                                self.error_flags = self.error_flags | SessionAction.ErrorFlags.SERVER_ERROR
+                                return None
+                            self.logger.warning(f'{self.base_url + url}: resource changed while downloading, '
+                                                f'starting over')
+                            sink.truncate(0)
+                            offset = 0
+                            continue
+                        if r.status_code >= 400:
+                            self.logger.warning(f'{r.request.method} {r.request.url}: status code {r.status_code}')
+                            self.error_flags = self.error_flags | SessionAction.ErrorFlags.SERVER_ERROR
+                            return None
+                        if offset and r.status_code != 206:
+                            if sink is None:
+                                self.logger.warning(f'{self.base_url + url}: server sent the whole body again, '
+                                                    f'unable to resume the download')
+                                self.error_flags = self.error_flags | SessionAction.ErrorFlags.CON_ERROR
+                                return None
+                            # the range was ignored, or If-Range did not match because the resource changed
+                            sink.truncate(0)
+                            offset = 0
+                        if not offset:
+                            validator = self._download_validator(r)
+                            if validator_path is not None:
+                                if validator is not None:
+                                    validator_path.write_text(validator)
+                                else:
+                                    validator_path.unlink(missing_ok=True)
+                        total = self._download_total(r, offset)
+                        for chunk in r.iter_content(chunk_size=chunk_size):
+                            if not chunk:
+                                continue
+                            write(chunk)
+                            offset += len(chunk)
+                            self._download_progress(offset, total)
+                    break
+                except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError,
+                        requests.exceptions.Timeout) as err:
+                    success = False
+                    # only a body that broke off mid-transfer is resumed; connect failures go to the retry policy
+                    if latency is not None and resumes < max_resumes and (validator is not None or sink is not None):
+                        resumes += 1
+                        if validator is None:
+                            # nothing to tell whether the resource is still the same; fetch it whole again
+                            sink.truncate(0)
+                            offset = 0
+                        self.logger.warning(f'{self.base_url + url}: {err}; resuming at byte {offset:,} '
+                                            f'({resumes}/{max_resumes})')
+                        continue
+                    self.error_flags = self.error_flags | SessionAction.ErrorFlags.CON_ERROR
+                    if isinstance(err, requests.exceptions.Timeout):
+                        self.error_flags = self.error_flags | SessionAction.ErrorFlags.TIMEOUT
+                    self.logger.warning(f'{self.base_url + url}: {err}')
+                    return None
+                finally:
+                    limiter.release(time.monotonic() - started if latency is None else latency, success)
+        finally:
+            if sink is not None:
+                sink.close()
+        if part_path is not None:
+            os.replace(part_path, destination)
+            validator_path.unlink(missing_ok=True)
+        self.tick(f'Downloaded {offset:,} bytes', msg_only=True)
+        return offset
+
+    @staticmethod
+    def _download_validator(r: requests.Response) -> str | None:
+        # If-Range takes a strong etag or a date, never a weak etag
+        etag = r.headers.get('ETag', '')
+        if etag and not etag.startswith('W/'):
+            return etag
+        return r.headers.get('Last-Modified', None)
+
+    @staticmethod
+    def _range_total(r: requests.Response) -> int | None:
+        # Content-Range: bytes <start>-<end>/<total>, or bytes */<total> on a 416
+        total = r.headers.get('Content-Range', '').rpartition('/')[2]
+        return int(total) if total.isdigit() else None
+
+    @staticmethod
+    def _download_total(r: requests.Response, offset: int) -> int | None:
+        if r.status_code == 206:
+            return SessionAction._range_total(r)
+        length = r.headers.get('Content-Length', '')
+        return offset + int(length) if length.isdigit() else None
+
+    def _download_progress(self, done: int, total: int | None):
+        now = time.monotonic()
+        if now - self._download_ticked < dispatcher_consts.DOWNLOAD_TICK_INTERVAL:
+            return
+        self._download_ticked = now
+        if total:
+            # the download drives the progress bar unless the action counts its own ticks
+            if self.total_ticks == 0:
+                self.pct_complete = min(100, int(done / total * 100))
+            self.tick(f'Downloaded {done / 2 ** 20:,.1f} of {total / 2 ** 20:,.1f} MB', msg_only=True)
+        else:
+            self.tick(f'Downloaded {done / 2 ** 20:,.1f} MB', msg_only=True)
+
 
 class LoginAction(SessionAction):
 
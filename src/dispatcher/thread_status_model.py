@@ -17,12 +17,15 @@ class ThreadStatusModel(QtCore.QAbstractTableModel):
         self.thread_status_dict = thread_status_dict
         self.thread_action_dict = thread_action_dict
         self._has_series_thread = kwargs.get("has_series_thread", True)
+        self.lane_waiting_dict: dict[typing.Hashable, typing.Sized] = kwargs.get(
+            "lane_waiting_dict", {}
+        )
 
     def rowCount(self, parent: QtCore.QModelIndex = QtCore.QModelIndex()) -> int:
         return len(self.thread_status_dict)
 
     def columnCount(self, parent: QtCore.QModelIndex = QtCore.QModelIndex()) -> int:
-        return 3
+        return 4
 
     def headerData(
         self,
@@ -41,6 +44,8 @@ class ThreadStatusModel(QtCore.QAbstractTableModel):
                 return "Status"
             if section == 2:
                 return "Current Action"
+            if section == 3:
+                return "Lane"
         if role == QtCore.Qt.ItemDataRole.TextAlignmentRole:
             return QtCore.Qt.AlignmentFlag.AlignCenter
 
@@ -64,6 +69,14 @@ class ThreadStatusModel(QtCore.QAbstractTableModel):
                 if not action:
                     return ""
                 return action.short_description
+            elif index.column() == 3:
+                action = self.thread_action_dict.get(worker_id, None)
+                if not action or action.serialization_key is None:
+                    return ""
+                waiting = len(self.lane_waiting_dict.get(action.serialization_key, ()))
+                if waiting:
+                    return f"{action.serialization_key} (+{waiting} waiting)"
+                return str(action.serialization_key)
             return None
 
         elif role == dispatcher_consts.THREAD_STATUS_ROLE and index.column() == 1:
@@ -96,7 +109,16 @@ class ThreadStatusModel(QtCore.QAbstractTableModel):
         except ValueError:
             return
         mdl_idx = self.createIndex(dict_idx, 2)
-        self.dataChanged.emit(mdl_idx, mdl_idx)
+        lane_idx = self.createIndex(dict_idx, 3)
+        self.dataChanged.emit(mdl_idx, lane_idx)
+
+    @QtCore.pyqtSlot()
+    def on_lane_status_update(self):
+        if not self.thread_action_dict:
+            return
+        top = self.createIndex(0, 3)
+        bottom = self.createIndex(len(self.thread_action_dict) - 1, 3)
+        self.dataChanged.emit(top, bottom)
 
 
 class ThreadStatusDelegate(QtWidgets.QStyledItemDelegate):
@@ -0,0 +1,92 @@
+import heapq
+import itertools
+import threading
+import time
+import typing
+
+from dispatcher import base_action
+
+
+class TimerEntry:
+
+    def __init__(self, due: float, callback: typing.Callable[[], typing.Any],
+                 action: base_action.BaseAction = None):
+        self.due: float = due
+        self.callback: typing.Callable[[], typing.Any] = callback
+        self.action: base_action.BaseAction = action
+        self.cancelled: bool = False
+
+
+class TimerQueue:
+
+    def __init__(self):
+        self._heap: list[tuple[float, int, TimerEntry]] = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def schedule(self, delay: float, callback: typing.Callable[[], typing.Any],
+                 action: base_action.BaseAction = None) -> TimerEntry:
+        entry = TimerEntry(time.monotonic() + max(delay, 0.0), callback, action)
+        with self._lock:
+            heapq.heappush(self._heap, (entry.due, next(self._counter), entry))
+        return entry
+
+    def next_due(self) -> float | None:
+        with self._lock:
+            self._drop_cancelled()
+            if not self._heap:
+                return None
+            return self._heap[0][0]
+
+    def pop_due(self, now: float = None) -> list[TimerEntry]:
+        if now is None:
+            now = time.monotonic()
+        due: list[TimerEntry] = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                _, _, entry = heapq.heappop(self._heap)
+                if not entry.cancelled:
+                    due.append(entry)
+        return due
+
+    def clear(self):
+        with self._lock:
+            for _, _, entry in self._heap:
+                entry.cancelled = True
+            self._heap.clear()
+
+    def qsize(self) -> int:
+        with self._lock:
+            return len(self._heap)
+
+    def entries(self) -> list[TimerEntry]:
+        with self._lock:
+            return [entry for _, _, entry in sorted(self._heap) if not entry.cancelled]
+
+    def _drop_cancelled(self):
+        while self._heap and self._heap[0][2].cancelled:
+            heapq.heappop(self._heap)
+
+
+class RecurringSchedule:
+
+    def __init__(self, action_factory: typing.Callable[[], base_action.BaseAction], interval: float,
+                 count: int = None):
+        if interval <= 0:
+            raise ValueError('A recurring schedule requires a positive interval.')
+        self.action_factory: typing.Callable[[], base_action.BaseAction] = action_factory
+        self.interval: float = interval
+        self.remaining: int = count
+        self.runs: int = 0
+        self.next_due: float = 0.0
+        self.cancelled: bool = False
+        self.entry: TimerEntry = None
+
+    @property
+    def finished(self) -> bool:
+        return self.cancelled or (self.remaining is not None and self.remaining <= 0)
+
+    def cancel(self):
+        self.cancelled = True
+        if self.entry:
+            self.entry.cancelled = True
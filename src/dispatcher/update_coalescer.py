@@ -0,0 +1,93 @@
+from PyQt6 import QtCore
+
+import functools
+import logging
+import threading
+import weakref
+
+from dispatcher import base_action
+from dispatcher import dispatcher_consts
+
+
+class UpdateCoalescer(QtCore.QObject):
+
+    logger = logging.getLogger('dispatcher.update_coalescer')
+
+    # carries a signal and its arguments from the coordinator thread; object arguments keep the actions alive
+    # until they are delivered, a QObject argument would cross as a bare pointer
+    _signal_forward = QtCore.pyqtSignal(object, object)
+
+    def __init__(self, actions_signal: QtCore.pyqtBoundSignal, **kwargs):
+        # lives on the GUI thread: everything it emits reaches GUI receivers through direct calls
+        parent = kwargs.get('parent', None)
+        super().__init__(parent=parent)
+        self.actions_signal: QtCore.pyqtBoundSignal = actions_signal
+        self.interval_ms: int = kwargs.get('interval_ms', dispatcher_consts.GUI_UPDATE_INTERVAL_MS)
+        # actions are marked from worker threads as well as the coordinator, so both tables share a lock
+        self._lock = threading.Lock()
+        self._dirty_actions: dict[int, base_action.BaseAction] = {}
+        # display signals raised since the last flush, keyed by signature and arguments so repeats collapse
+        self._pending: dict[tuple, tuple[QtCore.pyqtBoundSignal, tuple]] = {}
+        # actions already hooked up; weak so finished actions can still be collected
+        self._watched: weakref.WeakValueDictionary[int, base_action.BaseAction] = weakref.WeakValueDictionary()
+        self._signal_forward.connect(self._on_forward)
+        self._timer = QtCore.QTimer(self)
+        self._timer.timeout.connect(self.flush)
+        self.received_count: int = 0
+        self.emitted_count: int = 0
+
+    def start(self):
+        self._timer.start(self.interval_ms)
+
+    def stop(self):
+        self._timer.stop()
+        self.flush()
+
+    def watch(self, action: base_action.BaseAction):
+        if self._watched.get(action.id, None) is action:
+            return
+        self._watched[action.id] = action
+        # direct connections run in the emitting thread and only mark the action; nothing is posted per tick.
+        # the connection holds a weak reference, otherwise the action would keep itself alive through it
+        mark = functools.partial(self._mark_ref, weakref.ref(action))
+        action.signal_action_started.connect(mark, type=QtCore.Qt.ConnectionType.DirectConnection)
+        action.signal_action_tick.connect(mark, type=QtCore.Qt.ConnectionType.DirectConnection)
+        action.signal_action_finished.connect(mark, type=QtCore.Qt.ConnectionType.DirectConnection)
+        self.mark_action(action)
+
+    def _mark_ref(self, ref: weakref.ref):
+        action = ref()
+        if action is not None:
+            self.mark_action(action)
+
+    def mark_action(self, action: base_action.BaseAction):
+        with self._lock:
+            self._dirty_actions[action.id] = action
+            self.received_count += 1
+
+    def defer(self, signal: QtCore.pyqtBoundSignal, *args):
+        # display-only signals; the receivers re-read the current state, so only the latest of each matters
+        with self._lock:
+            self._pending[(signal.signal, args)] = (signal, args)
+            self.received_count += 1
+
+    def forward(self, signal: QtCore.pyqtBoundSignal, *args):
+        # structural signals (new actions, finalized actions, state changes) go out right away and in order
+        self._signal_forward.emit(signal, args)
+
+    @QtCore.pyqtSlot(object, object)
+    def _on_forward(self, signal: QtCore.pyqtBoundSignal, args: tuple):
+        signal.emit(*args)
+
+    @QtCore.pyqtSlot()
+    def flush(self):
+        with self._lock:
+            actions = list(self._dirty_actions.values())
+            pending = list(self._pending.values())
+            self._dirty_actions.clear()
+            self._pending.clear()
+        for signal, args in pending:
+            signal.emit(*args)
+        if actions:
+            self.actions_signal.emit(actions)
+        self.emitted_count += len(pending) + (1 if actions else 0)
@@ -1,12 +1,19 @@
 from PyQt6 import QtCore
-from dispatcher.base_action import BaseAction
 
 
 class WorkerSignals(QtCore.QObject):
 
     worker_started = QtCore.pyqtSignal(int)
     worker_shutdown = QtCore.pyqtSignal(int)
+    worker_retired = QtCore.pyqtSignal(int)
     worker_paused = QtCore.pyqtSignal(int)
     worker_resumed = QtCore.pyqtSignal(int)
-    worker_starting_action = QtCore.pyqtSignal(int, BaseAction)
-    worker_done_with_action = QtCore.pyqtSignal(int, BaseAction)
+    # actions are passed as python objects: a queued QObject argument is only a pointer, and an action nobody
+    # else references could be collected before the dispatcher's slot runs
+    worker_starting_action = QtCore.pyqtSignal(int, object)
+    worker_done_with_action = QtCore.pyqtSignal(int, object)
+    worker_deferred_action = QtCore.pyqtSignal(int, object, float)
+    worker_discarded_action = QtCore.pyqtSignal(int, object)
+    # micro-batches: the list of actions taken together, then the finished ones and any handed back unrun
+    worker_starting_batch = QtCore.pyqtSignal(int, object)
+    worker_done_with_batch = QtCore.pyqtSignal(int, object, object)
@@ -0,0 +1,81 @@
+import argparse
+import json
+import pathlib
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from dispatcher import aux_action
+
+
+FORMATS = {
+    'csv': (aux_action.DataframeCsvAction, '.csv'),
+    'parquet': (aux_action.DataframeParquetAction, '.parquet'),
+    'feather': (aux_action.DataframeFeatherAction, '.feather'),
+    'excel': (aux_action.DataframeExcelAction, '.xlsx'),
+}
+
+
+def make_frame(num_rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'id': np.arange(num_rows, dtype=np.int64),
+        'value': rng.normal(size=num_rows),
+        'count': rng.integers(0, 1000, size=num_rows),
+        'category': pd.Categorical(rng.choice(['alpha', 'beta', 'gamma', 'delta'], size=num_rows)),
+        'timestamp': pd.date_range('2020-01-01', periods=num_rows, freq='s'),
+    })
+    df.loc[::97, 'value'] = np.nan
+    return df
+
+
+def run_one(fmt: str, num_rows: int, out_dir: str):
+    # runs in its own process so ru_maxrss reflects a single export
+    df = make_frame(num_rows)
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    action_cls, suffix = FORMATS[fmt]
+    path = pathlib.Path(out_dir) / f'export{suffix}'
+    kwargs = {'streaming': True} if fmt == 'excel' else {}
+    action = action_cls(df, str(path), **kwargs)
+    start = time.perf_counter()
+    action.do_work()
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({'format': fmt, 'seconds': elapsed, 'peak_mb': peak_kb / 1024,
+                      'delta_mb': (peak_kb - baseline_kb) / 1024, 'size_mb': path.stat().st_size / 2 ** 20,
+                      'status': action.action_status.name}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare export time and peak memory across formats.')
+    parser.add_argument('--rows', type=int, default=5_000_000)
+    # excel is left out by default; at 5M rows it spills over several sheets and takes minutes
+    parser.add_argument('--formats', nargs='+', default=['csv', 'parquet', 'feather'], choices=list(FORMATS))
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--out-dir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_one(args.child, args.rows, args.out_dir)
+        return
+
+    print(f'{"format":<10}{"seconds":>10}{"peak MB":>10}{"delta MB":>10}{"file MB":>10}')
+    for fmt in args.formats:
+        with tempfile.TemporaryDirectory() as out_dir:
+            proc = subprocess.run([sys.executable, __file__, '--child', fmt, '--rows', str(args.rows),
+                                   '--out-dir', out_dir], capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f'{fmt:<10}  failed: {proc.stderr.strip().splitlines()[-1] if proc.stderr else proc.returncode}')
+            continue
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(f'{fmt:<10}{result["seconds"]:>10.2f}{result["peak_mb"]:>10.0f}{result["delta_mb"]:>10.0f}'
+              f'{result["size_mb"]:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
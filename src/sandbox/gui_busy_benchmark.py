@@ -0,0 +1,202 @@
+import argparse
+import functools
+import json
+import os
+import subprocess
+import sys
+import time
+
+from PyQt6 import QtCore, QtWidgets
+
+from dispatcher import action_dispatcher
+from dispatcher import action_future
+from dispatcher import action_manager
+from dispatcher import base_action
+from dispatcher import dispatcher_consts
+
+
+MODES = ['gui', 'coordinator']
+
+
+class TickingAction(base_action.BaseAction):
+
+    def __init__(self, num_ticks: int, tick_sleep: float, **kwargs):
+        super().__init__(**kwargs)
+        self.num_ticks: int = num_ticks
+        self.tick_sleep: float = tick_sleep
+        self.total_ticks = num_ticks
+
+    @property
+    def description(self):
+        return f'Ticking action {self.id}'
+
+    @property
+    def short_description(self):
+        return f'Tick {self.id}'
+
+    def do_work(self):
+        for step in range(self.num_ticks):
+            time.sleep(self.tick_sleep)
+            self.tick(f'Step {step + 1}/{self.num_ticks}')
+        self.payload = self.num_ticks
+        self.action_status = dispatcher_consts.ActionStatus.COMPLETE
+
+
+class FanOutAction(base_action.BaseAction):
+
+    def __init__(self, num_children: int, num_ticks: int, tick_sleep: float, **kwargs):
+        super().__init__(**kwargs)
+        self.num_children: int = num_children
+        self.num_ticks: int = num_ticks
+        self.tick_sleep: float = tick_sleep
+
+    @property
+    def description(self):
+        return f'Fan out job {self.id}'
+
+    @property
+    def short_description(self):
+        return f'Job {self.id}'
+
+    def dispatch(self):
+        return [TickingAction(self.num_ticks, self.tick_sleep) for _ in range(self.num_children)]
+
+    def process_children(self):
+        self.payload = sum(child.payload or 0 for child in self.child_actions)
+        super().process_children()
+
+
+class Heartbeat(QtCore.QObject):
+
+    # a 10 ms timer on the GUI thread; how late it fires is what a user feels as input lag
+    def __init__(self, interval_ms: int = 10):
+        super().__init__()
+        self.interval: float = interval_ms / 1000
+        self.lags: list[float] = []
+        self._last: float = time.perf_counter()
+        self._timer = QtCore.QTimer(self)
+        self._timer.setTimerType(QtCore.Qt.TimerType.PreciseTimer)
+        self._timer.timeout.connect(self.on_timeout)
+        self._timer.start(interval_ms)
+
+    @QtCore.pyqtSlot()
+    def on_timeout(self):
+        now = time.perf_counter()
+        self.lags.append(max(0.0, now - self._last - self.interval))
+        self._last = now
+
+
+class Finished(QtCore.QObject):
+
+    # futures resolve on the dispatcher's thread; this carries the last one back to the GUI thread
+    signal_done = QtCore.pyqtSignal()
+
+
+def run_one(mode: str, args: argparse.Namespace):
+    app = QtWidgets.QApplication(sys.argv)
+    dispatcher = action_dispatcher.ActionDispatcher(num_parallel_threads=args.threads,
+                                                    coordinator_thread=(mode == 'coordinator'))
+    model = action_manager.ActionStatusModel()
+    view = QtWidgets.QTreeView()
+    view.setModel(model)
+    view.resize(800, 600)
+    view.show()
+
+    data_changed = [0]
+    model.dataChanged.connect(lambda *_: data_changed.__setitem__(0, data_changed[0] + 1))
+    model.rowsInserted.connect(view.expand)
+
+    def watch(action: base_action.BaseAction):
+        # how an application wires each action straight to the model
+        action.signal_action_started.connect(functools.partial(model.update_action_status, action))
+        action.signal_action_tick.connect(functools.partial(model.on_action_tick, action))
+        action.signal_action_finished.connect(functools.partial(model.update_action_status, action))
+
+    if dispatcher.coalescer is None:
+        dispatcher.signal_dispatcher_created_actions.connect(
+            lambda parent, children: [watch(child) for child in children])
+    else:
+        dispatcher.signal_actions_changed.connect(model.on_actions_changed)
+    dispatcher.signal_dispatcher_created_actions.connect(model.add_actions)
+
+    finished = Finished()
+    finished.signal_done.connect(app.quit)
+    futures: list[action_future.ActionFuture] = []
+    result: dict = {}
+
+    def start():
+        dispatcher.start_dispatcher()
+        result['cpu_start'] = time.thread_time()
+        result['wall_start'] = time.perf_counter()
+        for _ in range(args.jobs):
+            job = FanOutAction(args.children, args.ticks, args.tick_sleep)
+            model.add_action(job)
+            if dispatcher.coalescer is None:
+                watch(job)
+            futures.append(dispatcher.dispatch_action(job))
+        remaining = [len(futures)]
+
+        def on_done(_):
+            remaining[0] -= 1
+            if not remaining[0]:
+                finished.signal_done.emit()
+
+        for future in futures:
+            future.add_done_callback(on_done)
+
+    QtCore.QTimer.singleShot(0, start)
+    heartbeat = Heartbeat()
+    app.exec()
+    gui_cpu = time.thread_time() - result['cpu_start']
+    wall = time.perf_counter() - result['wall_start']
+    if dispatcher.coordinator is not None:
+        dispatcher.stop_coordinator()
+    else:
+        dispatcher.stop_dispatcher()
+
+    lags = sorted(heartbeat.lags) or [0.0]
+    print(json.dumps({
+        'mode': mode,
+        'wall': wall,
+        'gui_cpu': gui_cpu,
+        'busy_pct': 100 * gui_cpu / wall if wall else 0.0,
+        'lag_p99_ms': 1000 * lags[int(0.99 * (len(lags) - 1))],
+        'lag_max_ms': 1000 * lags[-1],
+        'data_changed': data_changed[0],
+        'complete': all(f.done() and f.exception() is None for f in futures),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare GUI-thread busy time with and without the coordinator.')
+    parser.add_argument('--jobs', type=int, default=10)
+    parser.add_argument('--children', type=int, default=200)
+    parser.add_argument('--ticks', type=int, default=20)
+    parser.add_argument('--tick-sleep', type=float, default=0.001)
+    parser.add_argument('--threads', type=int, default=dispatcher_consts.NUM_PARALLEL_THREADS)
+    parser.add_argument('--modes', nargs='+', default=MODES, choices=MODES)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_one(args.child, args)
+        return
+
+    print(f'{"mode":<13}{"wall s":>9}{"GUI cpu s":>11}{"busy %":>8}{"lag p99":>9}{"lag max":>9}{"updates":>10}')
+    for mode in args.modes:
+        # each mode runs in its own process so thread pools and Qt state start clean
+        command = [sys.executable, __file__, '--child', mode, '--jobs', str(args.jobs), '--children',
+                   str(args.children), '--ticks', str(args.ticks), '--tick-sleep', str(args.tick_sleep),
+                   '--threads', str(args.threads)]
+        proc = subprocess.run(command, capture_output=True, text=True, env=dict(os.environ))
+        if proc.returncode != 0:
+            print(f'{mode:<13}  failed: {proc.stderr.strip().splitlines()[-1] if proc.stderr else proc.returncode}')
+            continue
+        r = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(f'{r["mode"]:<13}{r["wall"]:>9.2f}{r["gui_cpu"]:>11.2f}{r["busy_pct"]:>8.1f}'
+              f'{r["lag_p99_ms"]:>9.1f}{r["lag_max_ms"]:>9.1f}{r["data_changed"]:>10}'
+              f'{"" if r["complete"] else "  (incomplete)"}')
+
+
+if __name__ == '__main__':
+    main()
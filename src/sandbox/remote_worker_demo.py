@@ -0,0 +1,189 @@
+import argparse
+import collections
+import math
+import os
+import pathlib
+import secrets
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from PyQt6 import QtCore
+
+from dispatcher import action_dispatcher
+from dispatcher import action_tracer
+from dispatcher import base_action
+from dispatcher import dispatcher_consts
+from dispatcher import remote_worker
+
+
+class PrimeRangeAction(base_action.BaseAction):
+
+    remote_capable = True
+
+    def __init__(self, start: int, stop: int, **kwargs):
+        super().__init__(**kwargs)
+        self.start: int = start
+        self.stop: int = stop
+        self.total_ticks = 10
+
+    @property
+    def description(self):
+        return f'{self.id:4} Primes in [{self.start:,}, {self.stop:,})'
+
+    @property
+    def short_description(self):
+        return f'{self.id:4}: Primes from {self.start:,}'
+
+    def remote_args(self):
+        return (self.start, self.stop), {}
+
+    def do_work(self):
+        primes = []
+        step = max(1, (self.stop - self.start) // self.total_ticks)
+        for block in range(self.start, self.stop, step):
+            for n in range(max(block, 2), min(block + step, self.stop)):
+                if all(n % d for d in range(2, math.isqrt(n) + 1)):
+                    primes.append(n)
+            self.tick(f'{len(primes):,} primes so far')
+        self.payload = pd.DataFrame({'prime': np.array(primes, dtype='int64')})
+        self.action_status = dispatcher_consts.ActionStatus.COMPLETE
+
+
+class PrimeJob(base_action.BaseAction):
+
+    incremental_reduce = True
+
+    def __init__(self, limit: int, chunk: int, **kwargs):
+        super().__init__(**kwargs)
+        self.limit: int = limit
+        self.chunk: int = chunk
+        self.accumulator = 0
+        self.ran_on: collections.Counter = collections.Counter()
+
+    @property
+    def description(self):
+        return f'{self.id:4} Count primes below {self.limit:,}'
+
+    @property
+    def short_description(self):
+        return f'{self.id:4}: Primes below {self.limit:,}'
+
+    def dispatch(self):
+        return [PrimeRangeAction(start, min(start + self.chunk, self.limit))
+                for start in range(0, self.limit, self.chunk)]
+
+    def reduce_child(self, child: base_action.BaseAction):
+        self.ran_on[child.remote_node or 'local'] += 1
+        if child.payload is not None:
+            self.accumulator += len(child.payload)
+
+    def process_children(self):
+        self.payload = self.accumulator
+        super().process_children()
+
+
+class Finished(QtCore.QObject):
+
+    signal_done = QtCore.pyqtSignal()
+
+
+def reference_count(limit: int) -> int:
+    sieve = np.ones(limit, dtype=bool)
+    sieve[:2] = False
+    for n in range(2, math.isqrt(limit) + 1):
+        if sieve[n]:
+            sieve[n * n::n] = False
+    return int(sieve.sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a job on several local worker processes over a unix socket.')
+    parser.add_argument('--nodes', type=int, default=3)
+    parser.add_argument('--slots', type=int, default=2)
+    parser.add_argument('--limit', type=int, default=1_000_000)
+    parser.add_argument('--chunk', type=int, default=25_000)
+    parser.add_argument('--threads', type=int, default=1, help='local threads working next to the nodes')
+    parser.add_argument('--fail', choices=['none', 'kill', 'stop'], default='stop',
+                        help='kill a node, or freeze it so it misses its heartbeats, partway through the job')
+    parser.add_argument('--trace', help='write a chrome trace of the run to this file')
+    args = parser.parse_args()
+
+    app = QtCore.QCoreApplication(sys.argv)
+    authkey = secrets.token_hex(16)
+    socket_path = str(pathlib.Path(tempfile.mkdtemp(prefix='dispatcher_demo_')) / 'dispatcher.sock')
+    tracer = action_tracer.ActionTracer() if args.trace else None
+    dispatcher = action_dispatcher.ActionDispatcher(num_parallel_threads=args.threads, tracer=tracer)
+    server = remote_worker.RemoteWorkerServer(dispatcher, socket_path, authkey=authkey, node_timeout=3.0)
+    server.signals.node_returned_actions.connect(
+        lambda name, actions: print(f'  node {name} lost, {len(actions)} leased action(s) re-queued'))
+    server.start()
+
+    # the nodes import this script by name to rebuild its actions
+    env = dict(os.environ)
+    env[dispatcher_consts.REMOTE_AUTHKEY_ENV] = authkey
+    env['PYTHONPATH'] = os.pathsep.join([str(pathlib.Path(__file__).parent.parent), str(pathlib.Path(__file__).parent),
+                                         env.get('PYTHONPATH', '')])
+    nodes = [subprocess.Popen([sys.executable, '-m', 'dispatcher.remote_worker', socket_path, '--slots',
+                               str(args.slots), '--name', f'node{i}', '--shared-memory'],
+                              env=env, stderr=subprocess.DEVNULL)
+             for i in range(args.nodes)]
+
+    job = PrimeJob(args.limit, args.chunk)
+    finished = Finished()
+    finished.signal_done.connect(app.quit)
+    started = {}
+
+    def start():
+        dispatcher.start_dispatcher()
+        started['wall'] = time.perf_counter()
+        dispatcher.dispatch_action(job).add_done_callback(lambda _: finished.signal_done.emit())
+        if args.fail != 'none':
+            QtCore.QTimer.singleShot(1500, fail_a_node)
+
+    connected = []
+
+    def on_node_connected(name: str):
+        # start once every node is there so the first leases spread over all of them
+        print(f'  node {name} connected')
+        connected.append(name)
+        if len(connected) == args.nodes:
+            start()
+
+    def fail_a_node():
+        if args.fail == 'kill':
+            print(f'  killing node0 (pid {nodes[0].pid})')
+            nodes[0].kill()
+        elif args.fail == 'stop':
+            print(f'  freezing node0 (pid {nodes[0].pid}); it stops sending heartbeats')
+            os.kill(nodes[0].pid, signal.SIGSTOP)
+
+    server.signals.node_connected.connect(on_node_connected)
+    app.exec()
+    wall = time.perf_counter() - started['wall']
+
+    server.stop()
+    dispatcher.stop_dispatcher()
+    for node in nodes:
+        if args.fail == 'stop' and node is nodes[0]:
+            os.kill(node.pid, signal.SIGCONT)
+        try:
+            node.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            node.kill()
+
+    expected = reference_count(args.limit)
+    print(f'{len(job.child_actions)} actions in {wall:.2f} s, status {dispatcher_consts.ActionStatus(job.action_status).name}')
+    for name, count in sorted(job.ran_on.items()):
+        print(f'  {name:<8}{count:>5}')
+    print(f'primes below {args.limit:,}: {job.payload:,} ({"correct" if job.payload == expected else f"expected {expected:,}"})')
+    if tracer is not None:
+        print(f'{tracer.export(args.trace):,} trace events written to {args.trace}')
+
+
+if __name__ == '__main__':
+    main()
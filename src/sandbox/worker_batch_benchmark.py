@@ -0,0 +1,135 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from PyQt6 import QtCore
+
+from dispatcher import action_dispatcher
+from dispatcher import base_action
+from dispatcher import dispatcher_consts
+
+
+class TinyAction(base_action.BaseAction):
+
+    batchable = True
+
+    def __init__(self, value: int, **kwargs):
+        super().__init__(**kwargs)
+        self.value: int = value
+
+    @property
+    def description(self):
+        return f'Tiny action {self.id}'
+
+    @property
+    def short_description(self):
+        return f'Tiny {self.id}'
+
+    def do_work(self):
+        self.payload = self.value * self.value
+        self.action_status = dispatcher_consts.ActionStatus.COMPLETE
+
+
+class TinyFanOut(base_action.BaseAction):
+
+    incremental_reduce = True
+
+    def __init__(self, num_children: int, **kwargs):
+        super().__init__(**kwargs)
+        self.num_children: int = num_children
+        self.accumulator = 0
+
+    @property
+    def description(self):
+        return f'Tiny fan out {self.id}'
+
+    @property
+    def short_description(self):
+        return f'Fan out {self.id}'
+
+    def dispatch(self):
+        return [TinyAction(i) for i in range(self.num_children)]
+
+    def reduce_child(self, child: base_action.BaseAction):
+        self.accumulator += child.payload or 0
+
+    def process_children(self):
+        self.payload = self.accumulator
+        super().process_children()
+
+
+class Finished(QtCore.QObject):
+
+    # the job's future resolves on the dispatcher's thread; this carries it back to the event loop
+    signal_done = QtCore.pyqtSignal()
+
+
+def run_one(batch_size: int, args: argparse.Namespace):
+    app = QtCore.QCoreApplication(sys.argv)
+    dispatcher = action_dispatcher.ActionDispatcher(num_parallel_threads=args.threads,
+                                                    worker_batch_size=batch_size,
+                                                    coordinator_thread=args.coordinator)
+    finished = Finished()
+    finished.signal_done.connect(app.quit)
+    result: dict = {}
+
+    def start():
+        dispatcher.start_dispatcher()
+        job = TinyFanOut(args.actions)
+        result['start'] = time.perf_counter()
+        future = dispatcher.dispatch_action(job)
+        future.add_done_callback(lambda _: finished.signal_done.emit())
+        result['future'] = future
+
+    QtCore.QTimer.singleShot(0, start)
+    app.exec()
+    wall = time.perf_counter() - result['start']
+    future = result['future']
+    if dispatcher.coordinator is not None:
+        dispatcher.stop_coordinator()
+    else:
+        dispatcher.stop_dispatcher()
+
+    expected = sum(i * i for i in range(args.actions))
+    print(json.dumps({
+        'batch_size': batch_size,
+        'wall': wall,
+        'per_sec': args.actions / wall if wall else 0.0,
+        'correct': future.exception() is None and future.result() == expected,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare throughput of tiny actions at different worker batch sizes.')
+    parser.add_argument('--actions', type=int, default=20000)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4, 16, 64])
+    parser.add_argument('--coordinator', action='store_true')
+    parser.add_argument('--child', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_one(args.child, args)
+        return
+
+    print(f'{"batch":>6}{"wall s":>9}{"actions/s":>12}{"speedup":>9}')
+    baseline = None
+    for batch_size in args.batch_sizes:
+        # each batch size runs in its own process so thread pools and Qt state start clean
+        command = [sys.executable, __file__, '--child', str(batch_size), '--actions', str(args.actions),
+                   '--threads', str(args.threads)] + (['--coordinator'] if args.coordinator else [])
+        proc = subprocess.run(command, capture_output=True, text=True, env=dict(os.environ))
+        if proc.returncode != 0:
+            print(f'{batch_size:>6}  failed: {proc.stderr.strip().splitlines()[-1] if proc.stderr else proc.returncode}')
+            continue
+        r = json.loads(proc.stdout.strip().splitlines()[-1])
+        baseline = baseline or r['per_sec']
+        print(f'{r["batch_size"]:>6}{r["wall"]:>9.2f}{r["per_sec"]:>12.0f}{r["per_sec"] / baseline:>8.1f}x'
+              f'{"" if r["correct"] else "  (wrong result)"}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+import os
+import stat
+
+import pandas as pd
+import pytest
+
+from dispatcher import aux_action
+from dispatcher import dispatcher_consts
+
+
+@pytest.fixture
+def umask_027():
+    previous = os.umask(0o027)
+    yield
+    os.umask(previous)
+
+
+def export(path) -> aux_action.DataframeCsvAction:
+    action = aux_action.DataframeCsvAction(pd.DataFrame({'a': [1, 2, 3]}), str(path))
+    action.do_work()
+    return action
+
+
+@pytest.mark.skipif(os.name != 'posix', reason='file modes')
+def test_new_export_follows_the_umask(tmp_path, umask_027):
+    path = tmp_path / 'out.csv'
+    assert export(path).action_status == dispatcher_consts.ActionStatus.COMPLETE
+    assert stat.S_IMODE(path.stat().st_mode) == 0o640
+
+
+@pytest.mark.skipif(os.name != 'posix', reason='file modes')
+def test_export_keeps_the_mode_of_the_file_it_replaces(tmp_path, umask_027):
+    path = tmp_path / 'out.csv'
+    path.write_text('old')
+    path.chmod(0o664)
+    export(path)
+    assert stat.S_IMODE(path.stat().st_mode) == 0o664
+    assert path.read_text().splitlines()[0] == 'a'
+    assert [p.name for p in tmp_path.iterdir()] == ['out.csv']
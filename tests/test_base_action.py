@@ -0,0 +1,52 @@
+import threading
+
+from dispatcher import base_action
+from dispatcher import dispatcher_consts
+
+
+def run_on_thread(target):
+    thread = threading.Thread(target=target)
+    thread.start()
+    thread.join()
+
+
+def test_abandoned_run_cannot_change_the_action():
+    action = base_action.BaseAction()
+
+    def first_run():
+        action.begin_run(0)
+        action.setup()
+        action.abandon()
+        action.action_status = dispatcher_consts.ActionStatus.COMPLETE
+        action.payload = 'late'
+
+    run_on_thread(first_run)
+    assert action.action_status == dispatcher_consts.ActionStatus.IN_PROGRESS
+    assert action.payload is None
+
+
+def test_retry_on_the_same_thread_is_not_abandoned():
+    # pool threads are reused, so a retry may run on the thread of the run that was given up on
+    action = base_action.BaseAction()
+    action.begin_run(0)
+    action.setup()
+    action.abandon()
+    assert action.abandoned
+    action.prepare_retry()
+    action.begin_run(0)
+    assert not action.abandoned
+    action.setup()
+    action.payload = 'retry'
+    action.action_status = dispatcher_consts.ActionStatus.COMPLETE
+    assert action.payload == 'retry'
+    assert action.action_status == dispatcher_consts.ActionStatus.COMPLETE
+
+
+def test_other_threads_are_not_abandoned():
+    action = base_action.BaseAction()
+    action.begin_run(0)
+    action.setup()
+    action.abandon()
+    seen = []
+    run_on_thread(lambda: seen.append(action.abandoned))
+    assert seen == [False]
@@ -0,0 +1,72 @@
+import requests
+
+from dispatcher import base_user
+from dispatcher import session_action
+from dispatcher.http_cache import HttpCache
+
+
+URL = 'https://example.com/data'
+
+
+def make_response(cache_control: str = 'max-age=60') -> requests.Response:
+    r = requests.Response()
+    r.status_code = 200
+    r._content = b'body'
+    r.headers = requests.structures.CaseInsensitiveDict({'Cache-Control': cache_control, 'ETag': '"1"'})
+    return r
+
+
+class Origin:
+
+    def __init__(self, cache_control: str = 'max-age=60'):
+        self.cache_control = cache_control
+        self.calls = 0
+
+    def __call__(self, headers: dict) -> requests.Response:
+        self.calls += 1
+        return make_response(self.cache_control)
+
+
+def fetch_twice(cache: HttpCache, namespace: str, origin: Origin, headers: dict = None) -> int:
+    for _ in range(2):
+        cache.get(namespace, URL, headers or {}, origin)
+    return origin.calls
+
+
+def test_fresh_response_is_served_from_the_cache(tmp_path):
+    assert fetch_twice(HttpCache(tmp_path), HttpCache.ANONYMOUS_NAMESPACE, Origin()) == 1
+
+
+def test_usernames_differing_by_case_get_their_own_namespace():
+    assert (HttpCache.user_namespace(base_user.BaseUser(username='Alice'))
+            != HttpCache.user_namespace(base_user.BaseUser(username='alice')))
+
+
+def test_private_response_is_kept_for_a_user_only(tmp_path):
+    cache = HttpCache(tmp_path)
+    user_namespace = HttpCache.user_namespace(base_user.BaseUser(username='alice'))
+    assert fetch_twice(cache, HttpCache.ANONYMOUS_NAMESPACE, Origin('private, max-age=60')) == 2
+    assert fetch_twice(cache, user_namespace, Origin('private, max-age=60')) == 1
+
+
+def test_no_store_response_is_not_kept(tmp_path):
+    assert fetch_twice(HttpCache(tmp_path), HttpCache.ANONYMOUS_NAMESPACE, Origin('no-store')) == 2
+
+
+def test_anonymous_request_with_credentials_bypasses_the_cache(tmp_path):
+    cache = HttpCache(tmp_path)
+    origin = Origin()
+    assert fetch_twice(cache, HttpCache.ANONYMOUS_NAMESPACE, origin, {'Authorization': 'Bearer token'}) == 2
+    assert cache.stats()['entries'] == 0
+
+
+def test_logged_in_session_without_user_is_not_cached(tmp_path):
+    cache = HttpCache(tmp_path)
+    assert session_action.SessionAction(http_cache=cache)._cache_namespace() == HttpCache.ANONYMOUS_NAMESPACE
+    action = session_action.SessionAction(http_cache=cache, session_cookies={'sid': 'abc'})
+    assert action._cache_namespace() is None
+    action = session_action.SessionAction(http_cache=cache, session_key='key')
+    assert action._cache_namespace() is None
+    action = session_action.SessionAction(http_cache=cache, session_key='key',
+                                          usr=base_user.BaseUser(username='alice'))
+    assert action._cache_namespace() == HttpCache.user_namespace(action.usr)
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+from dispatcher.payload_store import PayloadStore
+
+
+def make_store(tmp_path) -> PayloadStore:
+    return PayloadStore(budget_bytes=1, spill_threshold=1, spill_dir=tmp_path)
+
+
+def test_array_spills_and_comes_back_mapped(tmp_path):
+    store = make_store(tmp_path)
+    entry = store.put(np.arange(1000))
+    entry.spill()
+    assert not entry.resident
+    assert entry.path.suffix == '.npy'
+    assert np.array_equal(entry.get(), np.arange(1000))
+    assert not entry.resident
+
+
+def test_changes_to_a_paged_in_pickle_survive_the_next_spill(tmp_path):
+    store = make_store(tmp_path)
+    entry = store.put({'rows': list(range(1000))})
+    entry.spill()
+    assert entry.path.suffix == '.pkl'
+    entry.get()['rows'].append('changed')
+    entry.spill()
+    assert entry.get()['rows'][-1] == 'changed'
+
+
+def test_paged_in_pickle_drops_its_file(tmp_path):
+    store = make_store(tmp_path)
+    entry = store.put({'rows': list(range(1000))})
+    entry.spill()
+    path = entry.path
+    entry.get()
+    assert entry.resident
+    assert entry.path is None
+    assert not path.exists()
+
+
+def test_release_removes_the_spilled_file(tmp_path):
+    store = make_store(tmp_path)
+    entry = store.put({'rows': list(range(1000))})
+    entry.spill()
+    path = entry.path
+    entry.release()
+    assert not path.exists()
+    assert entry.get() is None
+
+
+def test_paged_in_dataframe_can_be_edited_in_place(tmp_path):
+    store = make_store(tmp_path)
+    entry = store.put(pd.DataFrame({'a': np.arange(1000), 'b': np.arange(1000.0), 's': ['x'] * 1000}))
+    entry.spill()
+    assert entry.path.suffix == '.frame'
+    frame = entry.get()
+    frame.loc[0, 'a'] = 5
+    frame.iloc[1, 1] = 7.5
+    frame.loc[2, 's'] = 'y'
+    # the edits live in the resident copy and are written out on the next spill
+    entry.spill()
+    frame = entry.get()
+    assert (frame.loc[0, 'a'], frame.loc[1, 'b'], frame.loc[2, 's']) == (5, 7.5, 'y')
@@ -0,0 +1,105 @@
+import pytest
+
+from dispatcher import base_action
+from dispatcher.resource_admission import ResourceAdmission
+
+
+def make_action(mem: float) -> base_action.BaseAction:
+    return base_action.BaseAction(resource_costs={'mem': mem})
+
+
+def test_admits_while_capacity_allows():
+    admission = ResourceAdmission({'mem': 10})
+    a, b = make_action(6), make_action(6)
+    assert admission.submit(a) == [a]
+    assert admission.submit(b) == []
+    assert admission.holds(a)
+    assert admission.is_waiting(b)
+    assert admission.get_usage() == {'mem': (6, 10)}
+
+
+def test_release_admits_waiting_actions():
+    admission = ResourceAdmission({'mem': 10})
+    a, b, c = make_action(6), make_action(6), make_action(3)
+    admission.submit(a)
+    admission.submit(b)
+    admission.submit(c)
+    # c backfills around the blocked b
+    assert admission.holds(c)
+    assert admission.release(a) == [b]
+    assert admission.get_usage() == {'mem': (9, 10)}
+    assert admission.waiting_count() == 0
+
+
+def test_submit_returns_every_admitted_action():
+    admission = ResourceAdmission({'mem': 10})
+    a, b, c, d = make_action(10), make_action(10), make_action(1), make_action(1)
+    assert admission.submit(a) == [a]
+    assert admission.submit(b) == []
+    assert admission.submit(c) == []
+    # raising the capacity lets the waiting actions through
+    assert admission.set_capacity('mem', 30) == [b, c]
+    assert admission.submit(d) == [d]
+    assert all(admission.holds(action) for action in (a, b, c, d))
+    assert admission.get_usage() == {'mem': (22, 30)}
+    assert admission.waiting_count() == 0
+
+
+def test_submit_admits_waiting_actions_ahead_of_the_new_one():
+    admission = ResourceAdmission({'mem': 10})
+    a, b, c = make_action(10), make_action(5), make_action(5)
+    admission.submit(a)
+    admission.submit(b)
+    admission.set_capacity('mem', 20)
+    assert admission.holds(b)
+    admission.release(a)
+    assert admission.submit(c) == [c]
+    assert admission.get_usage() == {'mem': (10, 20)}
+
+
+def test_lowering_capacity_admits_nothing():
+    admission = ResourceAdmission({'mem': 10})
+    a, b = make_action(5), make_action(5)
+    admission.submit(a)
+    assert admission.set_capacity('mem', 4) == []
+    assert admission.submit(b) == []
+    assert admission.release(a) == [b]
+
+
+def test_removing_a_starving_waiter_admits_the_actions_behind_it():
+    # with no starvation allowance the oldest blocked action stops any backfilling
+    admission = ResourceAdmission({'mem': 10}, starvation_time=-1.0)
+    a, b, c = make_action(8), make_action(5), make_action(1)
+    admission.submit(a)
+    assert admission.submit(b) == []
+    assert admission.submit(c) == []
+    # b is withdrawn, e.g. cancelled while waiting
+    assert admission.release(b) == [c]
+    assert not admission.is_waiting(b)
+    assert admission.get_usage() == {'mem': (9, 10)}
+
+
+def test_cancelled_waiters_are_dropped():
+    admission = ResourceAdmission({'mem': 10})
+    a, b = make_action(10), make_action(5)
+    admission.submit(a)
+    admission.submit(b)
+    b.cancel_token.cancel()
+    assert admission.release(a) == []
+    assert admission.waiting_count() == 0
+    assert admission.get_usage() == {'mem': (0, 10)}
+
+
+def test_oversized_costs_are_clamped_to_capacity():
+    admission = ResourceAdmission({'mem': 10})
+    a, b = make_action(50), make_action(1)
+    assert admission.submit(a) == [a]
+    assert admission.get_usage() == {'mem': (10, 10)}
+    assert admission.submit(b) == []
+    assert admission.release(a) == [b]
+
+
+@pytest.mark.parametrize('costs', [{}, {'mem': 0}, {'other': 5}])
+def test_actions_without_limited_costs_skip_admission(costs):
+    admission = ResourceAdmission({'mem': 10})
+    assert not admission.needs_admission(base_action.BaseAction(resource_costs=costs))